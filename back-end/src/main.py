@@ -16,10 +16,10 @@
 
 import os
 import ctypes
-import pickle
 import logging
 from sys import exit
 from argparse import ArgumentParser, Namespace
+from utils.scoring_engine.shared.shared_journal import ScoringJournal
 
 
 def init_argparse() -> ArgumentParser:
@@ -88,7 +88,13 @@ def init_argparse() -> ArgumentParser:
     )
 
     parser.add_argument(
-        "-i", "--interval", type=int, help="Length of scoring engine interval."
+        "-i",
+        "--interval",
+        type=int,
+        help=(
+            "Default number of seconds between scoring each category. Cheap"
+            " categories are scored more often and expensive ones less often."
+        ),
     )
 
     parser.add_argument(
@@ -98,6 +104,55 @@ def init_argparse() -> ArgumentParser:
         action="store_false",
     )
 
+    parser.add_argument(
+        "-e",
+        "--event-driven",
+        help=(
+            "(Linux only) Rescore files, configuration files and challenge questions"
+            " as soon as they change instead of waiting for the next interval."
+        ),
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--fsync-interval",
+        type=int,
+        default=10,
+        help=(
+            "Flush the saved scoring engine to disk every N saves. 1 flushes every"
+            " save, 0 never flushes. Defaults to 10."
+        ),
+    )
+
+    parser.add_argument(
+        "--collector-threads",
+        type=int,
+        default=4,
+        help=(
+            "Number of threads used to collect system state for scoring"
+            " concurrently. 1 collects one category at a time. Defaults to 4."
+        ),
+    )
+
+    parser.add_argument(
+        "--adaptive",
+        help=(
+            "Score less often while the results stay the same, up to 8 times the"
+            " normal period, and return to normal as soon as anything changes."
+        ),
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "-a",
+        "--asyncio",
+        help=(
+            "Run the scoring engine on an asyncio event loop, with a time limit on"
+            " each collector."
+        ),
+        action="store_true",
+    )
+
     parser.add_argument(
         "-r",
         "--resume",
@@ -125,6 +180,11 @@ def init_generator_windows(args: Namespace):
         full_debug=args.full_debug,
         scoring_interval=scoring_interval,
         notifications=args.notifications,
+        event_driven=args.event_driven,
+        fsync_interval=args.fsync_interval,
+        collector_threads=args.collector_threads,
+        adaptive=args.adaptive,
+        asynchronous=args.asyncio,
     )
 
     return generator
@@ -147,6 +207,11 @@ def init_generator_linux(args: Namespace):
         full_debug=args.full_debug,
         scoring_interval=scoring_interval,
         notifications=args.notifications,
+        event_driven=args.event_driven,
+        fsync_interval=args.fsync_interval,
+        collector_threads=args.collector_threads,
+        adaptive=args.adaptive,
+        asynchronous=args.asyncio,
     )
 
     return generator
@@ -193,16 +258,17 @@ def resume_scoring():
         saved_path = os.path.join(os.environ["HOME"], ".darkblue")
 
     if os.path.exists(saved_path):
-        scoring_engine_path = os.path.join(saved_path, "dark_blue_scoring_engine.dat")
+        journal = ScoringJournal(directory=saved_path)
 
-        if os.path.exists(scoring_engine_path):
+        if os.path.exists(journal.image_path) or os.path.exists(
+            journal.backup_image_path
+        ):
 
             try:
-                with open(scoring_engine_path, "rb") as input_file:
-                    scoring_engine = pickle.load(input_file)
+                scoring_engine = ScoringJournal.load(directory=saved_path)
 
-                    if scoring_engine is not None:
-                        scoring_engine.start()
+                if scoring_engine is not None:
+                    scoring_engine.start()
             except Exception as e:
                 logging.critical(
                     "Could not resume scoring engine. Error message: {}".format(e)
@@ -18,7 +18,10 @@ import pwd
 import logging
 from subprocess import check_call
 from utils.generator.linux.generator_linux import LinuxGenerator
-from utils.scoring_engine.shared.shared_util import File, ChallengeQuestion
+from utils.scoring_engine.shared.shared_util import (
+    File,
+    ChallengeQuestion,
+)
 from utils.scoring_engine.linux.scoring_engine_linux import (
     User,
     Process,
@@ -344,7 +347,8 @@ def configure_config_files(generator: LinuxGenerator) -> None:
         # Strip out quotes.
         file["filepath"] = file["filepath"].strip("\"'")
 
-        if file["create"]:
+        # Only whole files are written, files checked by key are left as they are.
+        if file["create"] and file.get("key") is None:
 
             logging.debug(
                 "Attempting to modify configuration file '{}' to default value {}"
@@ -423,6 +427,7 @@ def make_config_file_object(generator: LinuxGenerator, file: str) -> None:
         negative_points=file["negative_points"],
         positive_message=file["positive_message"],
         negative_message=file["negative_message"],
+        key=file.get("key"),
     )
 
     generator.scoring_engine.config_files.append(new_file)
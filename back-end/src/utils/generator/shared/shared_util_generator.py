@@ -18,7 +18,14 @@ import json
 import logging
 from sys import exit
 from abc import abstractmethod
-from utils.scoring_engine.shared.shared_util import ChallengeQuestion, File
+from utils.scoring_engine.shared.shared_files import Blocklist, hash_file
+from utils.scoring_engine.shared.shared_util import (
+    File,
+    FilePattern,
+    FileHash,
+    BlocklistScan,
+    ChallengeQuestion,
+)
 
 
 class Generator:
@@ -32,6 +39,11 @@ class Generator:
         full_debug: bool = False,
         scoring_interval: int = 30,
         notifications: bool = True,
+        event_driven: bool = False,
+        fsync_interval: int = 10,
+        collector_threads: int = 4,
+        adaptive: bool = False,
+        asynchronous: bool = False,
     ) -> None:
         self.filepath = filepath
         self.debug = debug
@@ -43,6 +55,11 @@ class Generator:
         self.full_debug = full_debug
         self.scoring_interval = scoring_interval
         self.notifications = notifications
+        self.event_driven = event_driven
+        self.fsync_interval = fsync_interval
+        self.collector_threads = collector_threads
+        self.adaptive = adaptive
+        self.asynchronous = asynchronous
 
         self.readme_path = None
 
@@ -63,14 +80,19 @@ answer: [EXAMPLE ANSWER]
 
     def __str__(self) -> str:
         s = """
-        filepath:         {}
-        debug:            {}
-        generator_only:   {}
-        scoring_only:     {}
-        log_path:         {}
-        full_debug:       {}
-        scoring_interval: {}
-        notifications:    {}
+        filepath:          {}
+        debug:             {}
+        generator_only:    {}
+        scoring_only:      {}
+        log_path:          {}
+        full_debug:        {}
+        scoring_interval:  {}
+        notifications:     {}
+        event_driven:      {}
+        fsync_interval:    {}
+        collector_threads: {}
+        adaptive:          {}
+        asynchronous:      {}
         """.format(
             self.filepath,
             self.debug,
@@ -80,6 +102,11 @@ answer: [EXAMPLE ANSWER]
             self.full_debug,
             self.scoring_interval,
             self.notifications,
+            self.event_driven,
+            self.fsync_interval,
+            self.collector_threads,
+            self.adaptive,
+            self.asynchronous,
         )
         return s
 
@@ -151,6 +178,147 @@ answer: [EXAMPLE ANSWER]
                 " been correctly created."
             )
 
+    def create_file_patterns(self) -> None:
+        print("Creating file patterns...")
+        logging.info("Creating file patterns...")
+
+        # The files themselves are placed by the scenario, only the items are made.
+        for pattern in self.data.get("file_patterns", []):
+            if pattern["root"][0:8] == "$DESKTOP":
+                pattern["root"] = self.expand_desktop_path(
+                    original_path=pattern["root"]
+                )
+
+            self.make_file_pattern_object(pattern=pattern)
+
+    def make_file_pattern_object(self, pattern: dict) -> None:
+        if self.generator_only:
+            return
+
+        new_pattern = FilePattern(
+            root=pattern["root"],
+            patterns=pattern["patterns"],
+            exclude=pattern.get("exclude", []),
+            entry_id=self.scoring_engine.request_scoring_id(),
+            positive_points=pattern["positive_points"],
+            positive_message=pattern.get("positive_message"),
+        )
+
+        self.scoring_engine.file_patterns.append(new_pattern)
+
+    def create_file_hashes(self) -> None:
+        print("Creating file hashes...")
+        logging.info("Creating file hashes...")
+
+        for file in self.data.get("file_hashes", []):
+            if file["filepath"][0:8] == "$DESKTOP":
+                file["filepath"] = self.expand_desktop_path(
+                    original_path=file["filepath"]
+                )
+
+            # The file's current contents are the digest if none is given.
+            try:
+                current = hash_file(path=file["filepath"])
+            except FileNotFoundError:
+                current = None
+            except OSError as e:
+                logging.error(
+                    "Could not read {}. Error: {}".format(file["filepath"], e)
+                )
+                current = None
+
+            if file.get("sha256") is None:
+                if current is None:
+                    self.scoring_engine.register_generator_message(
+                        message="Could not hash file at path: {}".format(
+                            file["filepath"]
+                        )
+                    )
+                    continue
+
+                file["sha256"] = current
+
+            self.make_file_hash_object(
+                file=file, initial=current == file["sha256"].lower()
+            )
+
+    def make_file_hash_object(self, file: dict, initial: bool) -> None:
+        if self.generator_only:
+            return
+
+        new_file = FileHash(
+            filepath=file["filepath"],
+            sha256=file["sha256"],
+            match=file["match"],
+            initial=initial,
+            entry_id=self.scoring_engine.request_scoring_id(),
+            positive_points=file["positive_points"],
+            negative_points=file["negative_points"],
+            positive_message=file.get("positive_message"),
+            negative_message=file.get("negative_message"),
+        )
+
+        self.scoring_engine.file_hashes.append(new_file)
+
+    def create_blocklist_scans(self) -> None:
+        print("Creating blocklist scans...")
+        logging.info("Creating blocklist scans...")
+
+        for scan in self.data.get("blocklist_scans", []):
+            try:
+                blocklist = Blocklist.load(path=scan["blocklist"])
+            except (OSError, ValueError) as e:
+                logging.error(
+                    "Could not load blocklist {}. Error: {}".format(
+                        scan["blocklist"], e
+                    )
+                )
+                self.scoring_engine.register_generator_message(
+                    message="Could not load blocklist: {}".format(scan["blocklist"])
+                )
+                continue
+
+            self.make_blocklist_scan_object(
+                scan=scan,
+                roots=self.expand_scan_roots(
+                    roots=scan.get("roots", ["$PATH", "$HOME"])
+                ),
+                blocklist=blocklist,
+            )
+
+    def expand_scan_roots(self, roots: list) -> list:
+        """Expand $PATH to the directories on the PATH and $HOME to the directories
+        holding the users' home directories."""
+
+        expanded = []
+
+        for root in roots:
+            if root == "$PATH":
+                expanded.extend(os.environ.get("PATH", "").split(os.pathsep))
+            elif root == "$HOME":
+                expanded.extend(self.expand_home_path())
+            else:
+                expanded.append(root)
+
+        return [root for root in dict.fromkeys(expanded) if root != ""]
+
+    def make_blocklist_scan_object(
+        self, scan: dict, roots: list, blocklist: Blocklist
+    ) -> None:
+        if self.generator_only:
+            return
+
+        new_scan = BlocklistScan(
+            name=scan.get("name", os.path.basename(scan["blocklist"])),
+            roots=roots,
+            blocklist=blocklist,
+            entry_id=self.scoring_engine.request_scoring_id(),
+            positive_points=scan["positive_points"],
+            positive_message=scan.get("positive_message"),
+        )
+
+        self.scoring_engine.blocklist_scans.append(new_scan)
+
     @abstractmethod
     def generate_image(self) -> None:
         ...
@@ -167,6 +335,10 @@ answer: [EXAMPLE ANSWER]
     def expand_desktop_path(self) -> str:
         ...
 
+    @abstractmethod
+    def expand_home_path(self) -> list:
+        ...
+
     @staticmethod
     def validate_file(file: File) -> bool:
         return False
@@ -21,7 +21,10 @@ import win32net
 import win32netcon
 import win32security
 from utils.generator.windows.generator_windows import WindowsGenerator
-from utils.scoring_engine.shared.shared_util import File, ChallengeQuestion
+from utils.scoring_engine.shared.shared_util import (
+    File,
+    ChallengeQuestion,
+)
 from utils.scoring_engine.windows.scoring_engine_windows import (
     User,
     Firewall,
@@ -15,9 +15,10 @@
 
 import logging
 from os import environ
-from os.path import join
+from os.path import join, dirname
 from utils.generator.shared.shared_util_generator import Generator
 from utils.scoring_engine.windows.util_windows import ScoringEngine
+from utils.scoring_engine.windows.scoring_engine_windows import AsyncScoringEngine
 
 
 class WindowsGenerator(Generator):
@@ -31,6 +32,11 @@ class WindowsGenerator(Generator):
         full_debug: bool = False,
         scoring_interval: int = 30,
         notifications: bool = True,
+        event_driven: bool = False,
+        fsync_interval: int = 10,
+        collector_threads: int = 4,
+        adaptive: bool = False,
+        asynchronous: bool = False,
     ) -> None:
 
         super().__init__(
@@ -42,16 +48,27 @@ class WindowsGenerator(Generator):
             full_debug=full_debug,
             scoring_interval=scoring_interval,
             notifications=notifications,
+            event_driven=event_driven,
+            fsync_interval=fsync_interval,
+            collector_threads=collector_threads,
+            adaptive=adaptive,
+            asynchronous=asynchronous,
         )
 
         self.initialize_data()
 
-        self.scoring_engine = ScoringEngine(
+        engine_class = AsyncScoringEngine if asynchronous else ScoringEngine
+
+        self.scoring_engine = engine_class(
             total_score=self.data["score"],
             scoring_interval=scoring_interval,
             debug=debug,
             debug_config=full_debug,
             notifications=notifications,
+            event_driven=event_driven,
+            fsync_interval=fsync_interval,
+            collector_threads=collector_threads,
+            adaptive=adaptive,
         )
 
         self.readme_path = join(self.scoring_engine.desktop_path, "readme.txt")
@@ -79,6 +96,9 @@ class WindowsGenerator(Generator):
 
         self.create_readme()
         create_filepaths(self)
+        self.create_file_patterns()
+        self.create_file_hashes()
+        self.create_blocklist_scans()
         create_question_files(self)
         create_users(self)
         configure_registry(self)
@@ -93,3 +113,7 @@ class WindowsGenerator(Generator):
         expanded_path = join(desktop_path, original_path[9:])
 
         return expanded_path
+
+    def expand_home_path(self) -> list:
+        # Every user's profile directory.
+        return [dirname(environ["USERPROFILE"])]
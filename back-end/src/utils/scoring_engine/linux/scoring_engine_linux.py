@@ -14,10 +14,28 @@
 # this program. If not, see <https://www.gnu.org/licenses/>.
 
 import os
-import pickle
+import time
 import logging
 from subprocess import Popen
-from utils.scoring_engine.shared.shared_util import ScorableItem, ScoringEngine
+from utils.scoring_engine.linux.watcher_linux import InotifyWatcher
+from utils.scoring_engine.linux.snapshot_linux import (
+    SystemSnapshot,
+    ConfigIndex,
+    DpkgStatusIndex,
+    ProcessTable,
+    AccountDatabase,
+)
+from utils.scoring_engine.shared.shared_util import (
+    AWARD,
+    REMOVE,
+    ScorableItem,
+    ScoringEngine,
+    ScoringCategory,
+    TransitionTable,
+    intern_string,
+)
+from utils.scoring_engine.shared.shared_async import AsyncScoringEngine
+from utils.scoring_engine.shared.shared_notifications import NotificationQueue
 
 
 class ScoringEngine(ScoringEngine):
@@ -28,6 +46,10 @@ class ScoringEngine(ScoringEngine):
         notifications: bool = False,
         debug: bool = False,
         debug_config: bool = False,
+        event_driven: bool = False,
+        fsync_interval: int = 10,
+        collector_threads: int = 4,
+        adaptive: bool = False,
     ) -> None:
 
         # OS specific data lists:
@@ -37,6 +59,11 @@ class ScoringEngine(ScoringEngine):
 
         # OS specific other:
         self.notification_queue = NotificationQueue()
+        self.package_index = DpkgStatusIndex()
+        self.config_index = ConfigIndex()
+        self.process_table = ProcessTable()
+        self.account_database = AccountDatabase()
+        self.watcher = None
         self.desktop_path = os.path.join(os.environ["HOME"], "Desktop")
         self.scoring_report_path = os.path.join(self.desktop_path, "scoringreport.html")
         self.dark_blue_save_path = os.path.join(os.getenv("HOME"), ".darkblue")
@@ -47,6 +74,10 @@ class ScoringEngine(ScoringEngine):
             notifications=notifications,
             debug=debug,
             debug_config=debug_config,
+            event_driven=event_driven,
+            fsync_interval=fsync_interval,
+            collector_threads=collector_threads,
+            adaptive=adaptive,
         )
 
     def __str__(self) -> str:
@@ -57,9 +88,7 @@ class ScoringEngine(ScoringEngine):
         )
         return s
 
-    def score(self) -> None:
-        print("Scoring...")
-
+    def scoring_categories(self) -> list:
         from utils.scoring_engine.linux.scoring_engine_util_linux import (
             score_users,
             score_packages,
@@ -70,76 +99,152 @@ class ScoringEngine(ScoringEngine):
         from utils.scoring_engine.shared.shared_util import (
             score_challenge_questions,
             score_files,
+            score_file_patterns,
+            score_file_hashes,
+            score_blocklist_scans,
         )
 
-        self.current_score = 0
-        self.scoring_messages = []
-        self.configuration_messages = []
+        # Files, configuration files and challenge questions are a stat or a small
+        # read each, as are file hashes unless the file changed. The package
+        # database and searching trees for file patterns or blocklisted files are
+        # the most expensive.
+        return [
+            ScoringCategory("users", self.users, score_users, self.scoring_interval),
+            ScoringCategory(
+                "packages", self.packages, score_packages, self.slow_period
+            ),
+            ScoringCategory(
+                "processes", self.processes, score_processes, self.scoring_interval
+            ),
+            ScoringCategory(
+                "config_files", self.config_files, score_config_files, self.fast_period
+            ),
+            ScoringCategory(
+                "challenge_questions",
+                self.challenge_questions,
+                score_challenge_questions,
+                self.fast_period,
+            ),
+            ScoringCategory("files", self.files, score_files, self.fast_period),
+            ScoringCategory(
+                "file_patterns",
+                self.file_patterns,
+                score_file_patterns,
+                self.slow_period,
+            ),
+            ScoringCategory(
+                "file_hashes", self.file_hashes, score_file_hashes, self.fast_period
+            ),
+            ScoringCategory(
+                "blocklist_scans",
+                self.blocklist_scans,
+                score_blocklist_scans,
+                self.slow_period,
+            ),
+        ]
+
+    def collect_snapshot(self, categories: set = None) -> SystemSnapshot:
+        return SystemSnapshot().collect(scoring_engine=self, categories=categories)
+
+    def wait(self, timeout: float) -> None:
+        """In event driven mode, rescore files, configuration files and challenge
+        questions as soon as they change while waiting for the next full cycle."""
+
+        if not self.event_driven:
+            super().wait(timeout=timeout)
+            return
+
+        if self.watcher is None or self.watcher.fd is None:
+            self.open_watcher()
+
+            # Inotify isn't available, fall back to polling.
+            if self.watcher is None:
+                super().wait(timeout=timeout)
+                return
+
+        deadline = time.monotonic() + timeout
+
+        while self.run:
+            remaining = deadline - time.monotonic()
 
-        score_users(self)
-        score_packages(self)
-        score_processes(self)
-        score_config_files(self)
+            if remaining <= 0:
+                break
 
-        score_challenge_questions(self)
-        score_files(self)
+            paths = self.watcher.read_changes(timeout=remaining)
 
-        if self.save_enabled:
-            self.save()
-        elif not self.save_enabled:
-            msg = """An error occurred saving scoring engine to disk.
-             Saving has been disabled and the scoring
-             engine CANNOT be resumed if terminated or the virtual machine
-             is powered down or restarted."""
-            self.register_config_message(message=msg)
+            if len(paths) > 0:
+                self.rescore_paths(paths=paths)
 
-        self.generate_report()
+                # A change ends any backoff, which brings the next cycle forward.
+                deadline = time.monotonic() + self.schedule.time_until_next()
 
-    def save(self, retry=False):
-        logging.debug("Attempting to save scoring engine image to disk.")
+    def open_watcher(self) -> None:
+        paths = [file.filepath for file in self.files]
+        paths += [file.path for file in self.config_files]
+        paths += [file.filepath for file in self.challenge_questions]
 
-        path = os.path.join(self.dark_blue_save_path, "dark_blue_scoring_engine.dat")
+        watcher = InotifyWatcher(paths=paths)
 
         try:
-            with open(path, "wb") as outfile:
-                pickle.dump(self, outfile, pickle.HIGHEST_PROTOCOL)
-        except pickle.PickleError:
-            logging.critical("PickleError occurred when saving scoring engine to disk.")
-        except FileNotFoundError:
-
-            if retry:
-                logging.fatal(
-                    "Could not locate directory {} during retried saving"
-                    " attempt. Saving will be disabled.".format(
-                        self.dark_blue_save_path
-                    )
+            watcher.open()
+        except (OSError, AttributeError) as e:
+            self.event_driven = False
+            self.register_config_message(
+                message=(
+                    "Could not watch files for changes, event driven scoring has"
+                    " been disabled. Error: {}".format(e)
                 )
-                self.save_enabled = False
-                return
-
-            logging.warning("Could not locate Dark Blue directory in Appdata Local.")
-            logging.debug(
-                "Attempting to create path: {}".format(self.dark_blue_save_path)
             )
-            os.makedirs(self.dark_blue_save_path)
-            logging.debug("Attemptign to retry saving...")
-            self.save(retry=True)
-        except Exception:
-            if retry:
-                logging.fatal(
-                    "Could not save scoring engine after retry."
-                    " Saving will be disabled."
-                )
-                self.save_enabled = False
-                return
-            else:
-                logging.fatal(
-                    "An unknown exception has occurred while saving scoring"
-                    " engine to disk. This error was not caught and"
-                    " saving will now be disabled."
-                )
-                self.save_enabled = False
-                return
+            return
+
+        self.watcher = watcher
+
+    def rescore_paths(self, paths: set) -> None:
+        """Rescore only the files, configuration files and challenge questions at the
+        given paths, then publish the new results."""
+
+        from utils.scoring_engine.linux.scoring_engine_util_linux import (
+            score_config_files,
+        )
+
+        from utils.scoring_engine.shared.shared_util import (
+            score_challenge_questions,
+            score_files,
+        )
+
+        files = [f for f in self.files if os.path.abspath(f.filepath) in paths]
+        config_files = [
+            f for f in self.config_files if os.path.abspath(f.path) in paths
+        ]
+        questions = [
+            f for f in self.challenge_questions if os.path.abspath(f.filepath) in paths
+        ]
+
+        logging.debug("Rescoring changed paths: {}".format(paths))
+
+        snapshot = SystemSnapshot()
+        snapshot.collect_files(
+            paths=[file.filepath for file in files], listings=self.directory_listings
+        )
+        snapshot.collect_config_files(
+            items=config_files, config_index=self.config_index
+        )
+        snapshot.collect_challenge_questions(
+            paths=[file.filepath for file in questions]
+        )
+
+        self.clear_results(items=files + config_files + questions)
+
+        score_config_files(self, snapshot, items=config_files)
+        score_challenge_questions(self, snapshot, items=questions)
+        score_files(self, snapshot, items=files)
+
+        self.tally_results()
+        print("Current score: {}".format(self.current_score))
+        self.publish_results()
+
+        # Something is happening on the system, even if it didn't change the score.
+        self.reset_backoff()
 
     def queue_notification(self, item: ScorableItem, positive: bool):
         if not self.notifications:
@@ -148,53 +253,94 @@ class ScoringEngine(ScoringEngine):
             self.notification_queue.issue_notification(item=item, positive=positive)
 
 
-class NotificationQueue:
-    def __init__(self, timeout: int = 2):
-        self.timeout = timeout
+class AsyncScoringEngine(AsyncScoringEngine, ScoringEngine):
+    """Linux scoring engine driven by an asyncio event loop. In event driven mode
+    the inotify watcher is read by the event loop, so changes are rescored even
+    while a full cycle is waiting on its collectors."""
 
-        self.positive_notifications = []
-        self.negative_notifications = []
+    async def collect_snapshot_async(self, categories: set = None) -> SystemSnapshot:
+        return await SystemSnapshot().collect_async(
+            scoring_engine=self, categories=categories
+        )
 
-    def issue_notification(self, item: ScorableItem, positive: bool):
+    def open_trigger_sources(self) -> None:
+        if not self.event_driven:
+            return
 
-        if positive:
-            if item.entry_id not in self.positive_notifications:
-                self.positive_notifications.append(item.entry_id)
+        if self.watcher is None or self.watcher.fd is None:
+            self.open_watcher()
 
-                if item.entry_id in self.negative_notifications:
-                    self.negative_notifications.remove(item.entry_id)
+            if self.watcher is None:
+                return
 
-                logging.debug(
-                    "Displaying notification for scoring ID: {}".format(item.entry_id)
-                )
+        self.loop.add_reader(self.watcher.fd, self.read_watcher)
 
-                self.display_notification(positive=True)
+    def close_trigger_sources(self) -> None:
+        if self.watcher is not None and self.watcher.fd is not None:
+            self.loop.remove_reader(self.watcher.fd)
 
-        else:
-            if item.entry_id not in self.negative_notifications:
-                self.negative_notifications.append(item.entry_id)
+    def read_watcher(self) -> None:
+        paths = self.watcher.read_changes(timeout=0)
 
-                if item in self.positive_notifications:
-                    self.positive_notifications.remove(item.entry_id)
+        if len(paths) == 0:
+            return
 
-                logging.debug(
-                    "Displaying notification for scoring ID: {}".format(item.entry_id)
-                )
-                self.display_notification(positive=False)
+        if self.scoring:
+            # The running cycle may have collected these paths before they changed,
+            # so run another full cycle once it's done.
+            self.trigger.set()
+            return
 
-    def display_notification(self, positive: bool = False):
-        message = ""
+        self.rescore_paths(paths=paths)
 
-        if positive:
-            message = "You have gained points!"
-        else:
-            message = "You have lost points."
 
-        # Subprocess call.
-        Popen('notify-send -t 1000 \"Dark Blue\" \"{}\"'.format(message), shell=True)
+class NotificationQueue(NotificationQueue):
+    def display_notification(self, message: str) -> None:
+        # Subprocess call, without a shell so the message is passed as is.
+        Popen(["notify-send", "-t", "1000", "Dark Blue", message])
 
 
 class User(ScorableItem):
+    __slots__ = ("name", "allowed", "is_sudo", "sudo_initial_state", "user_id")
+
+    # Keyed by whether the user is "missing", has a "different" ID or is "present".
+    transitions = TransitionTable(
+        attributes=("allowed",),
+        rules={
+            ("missing", True): (REMOVE, "User '{item.name}' has been removed."),
+            ("missing", False): (AWARD, "User '{item.name}' has been removed."),
+            ("different", True): (REMOVE, "User '{item.name}' has been removed."),
+            ("different", False): (REMOVE, "User '{item.name}' has been created."),
+        },
+    )
+
+    # Keyed by whether the user is in the sudoers group.
+    sudo_transitions = TransitionTable(
+        attributes=("allowed", "is_sudo", "sudo_initial_state"),
+        rules={
+            (True, True, True, False): (
+                AWARD,
+                "User '{item.name}' is in the sudoers group.",
+            ),
+            (True, True, False, False): (
+                REMOVE,
+                "User '{item.name}' is in the sudoers group.",
+            ),
+            (True, False, False, False): (
+                REMOVE,
+                "User '{item.name}' is in the sudoers group.",
+            ),
+            (False, True, False, True): (
+                AWARD,
+                "User '{item.name}' is not in the sudoers group.",
+            ),
+            (False, True, True, True): (
+                REMOVE,
+                "User '{item.name}' is not in the sudoers group.",
+            ),
+        },
+    )
+
     def __init__(
         self,
         name: str,
@@ -208,7 +354,7 @@ class User(ScorableItem):
         positive_message: str = None,
         negative_message: str = None,
     ) -> None:
-        self.name = name
+        self.name = intern_string(name)
         self.allowed = allowed
         self.is_sudo = is_sudo
         self.sudo_initial_state = sudo_initial_state
@@ -244,6 +390,19 @@ class User(ScorableItem):
 
 
 class Process(ScorableItem):
+    __slots__ = ("name", "default_state", "desired_state")
+
+    # Keyed by whether the process is running.
+    transitions = TransitionTable(
+        attributes=("default_state", "desired_state"),
+        rules={
+            (True, False, True): (AWARD, "Process '{item.name}' has been started."),
+            (True, False, False): (REMOVE, "Process '{item.name}' has been started."),
+            (False, True, True): (REMOVE, "Process '{item.name}' has been stopped."),
+            (False, True, False): (AWARD, "Process '{item.name}' has been stopped."),
+        },
+    )
+
     def __init__(
         self,
         name: str,
@@ -255,7 +414,7 @@ class Process(ScorableItem):
         positive_message: str = None,
         negative_message: str = None,
     ) -> None:
-        self.name = name
+        self.name = intern_string(name)
         self.default_state = default_state
         self.desired_state = desired_state
 
@@ -282,6 +441,19 @@ class Process(ScorableItem):
 
 
 class Package(ScorableItem):
+    __slots__ = ("name", "installed", "starting_state")
+
+    # Keyed by whether the package is installed.
+    transitions = TransitionTable(
+        attributes=("installed", "starting_state"),
+        rules={
+            (True, True, False): (AWARD, "Package '{item.name}' is installed."),
+            (True, False, False): (REMOVE, "Package '{item.name}' was installed."),
+            (False, True, True): (REMOVE, "Package '{item.name}' was uninstalled."),
+            (False, False, True): (AWARD, "Package '{item.name}' was uninstalled."),
+        },
+    )
+
     def __init__(
         self,
         name: str,
@@ -293,7 +465,7 @@ class Package(ScorableItem):
         positive_message: str = None,
         negative_message: str = None,
     ) -> None:
-        self.name = name
+        self.name = intern_string(name)
         self.installed = installed
         self.starting_state = starting_state
 
@@ -320,6 +492,20 @@ class Package(ScorableItem):
 
 
 class ConfigFile(ScorableItem):
+    """A configuration file whose contents, or the value of one key in it if key is
+    set, should match positive_value and not negative_value. Keys are matched
+    ignoring case, and values ignoring case and extra whitespace. A key that isn't
+    set has an empty value."""
+
+    __slots__ = (
+        "path",
+        "default_value",
+        "positive_value",
+        "negative_value",
+        "create",
+        "key",
+    )
+
     def __init__(
         self,
         path: str,
@@ -332,13 +518,15 @@ class ConfigFile(ScorableItem):
         negative_points: int,
         positive_message: str = None,
         negative_message: str = None,
+        key: str = None,
     ) -> None:
 
-        self.path = path
+        self.path = intern_string(path)
         self.default_value = default_value
         self.positive_value = positive_value
         self.negative_value = negative_value
         self.create = create
+        self.key = intern_string(key) if key else None
 
         ScorableItem.__init__(
             self,
@@ -352,16 +540,16 @@ class ConfigFile(ScorableItem):
     def __str__(self) -> str:
         s = """
         Class: ConfigFile
-        name:              {}
         path:              {}
+        key:               {}
         default_value:     {}
         positive_value:    {}
         negative_value:    {}
         create:            {}
         {}
         """.format(
-            self.name,
             self.path,
+            self.key,
             self.default_value,
             self.positive_value,
             self.negative_value,
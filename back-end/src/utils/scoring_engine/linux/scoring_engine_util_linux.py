@@ -13,11 +13,8 @@
 # You should have received a copy of the GNU General Public License along with
 # this program. If not, see <https://www.gnu.org/licenses/>.
 
-import pwd
-import psutil
 import logging
-import subprocess
-
+from utils.scoring_engine.linux.snapshot_linux import SystemSnapshot
 from utils.scoring_engine.linux.scoring_engine_linux import (
     ScoringEngine,
     User,
@@ -27,230 +24,109 @@ from utils.scoring_engine.linux.scoring_engine_linux import (
 )
 
 
-def score_users(scoring_engine: ScoringEngine) -> None:
+def score_users(scoring_engine: ScoringEngine, snapshot: SystemSnapshot) -> None:
 
     logging.info("Scoring users...")
 
-    sudoers = []
-    user_dict = {}
-    user_list = []
-
-    for u in pwd.getpwall():
-        user_dict[u[0]] = u[2]
+    # Nothing was collected if there is nothing to score.
+    if len(scoring_engine.users) == 0:
+        return
 
-    user_list = user_dict.keys()
+    if snapshot.users is None:
+        logging.critical("Could not enumerate users. Users will not be scored.")
+        return
 
-    output = subprocess.check_output(
-        "grep '^sudo:.*$' /etc/group | cut -d: -f4", shell=True
-    ).decode("utf-8")
+    user_dict = snapshot.users
+    sudoers = snapshot.sudoers
+    users = scoring_engine.users
 
-    for user in output.split(","):
-        sudoers.append(user.strip())
+    presence = []
 
     user: User
-    for user in scoring_engine.users:
-        # User is not in list.
-        if user.name not in user_list:
-            m = "User '{}' has been removed.".format(user.name)
-            # User is not allowed.
-
-            if user.allowed:
-                scoring_engine.remove_points(item=user, message=m)
-
-            elif not user.allowed:
-                scoring_engine.award_points(item=user, message=m)
-
-        # Else if user is in list.
-        elif user.name in user_list:
-
-            # User is allowed, check their ID.
-            if user.allowed and user.user_id != user_dict[user.name]:
-                scoring_engine.remove_points(
-                    item=user, message="User '{}' has been removed.".format(user.name)
-                )
-            # User is not allowed. Check to see if user created them.
-            elif not user.allowed and user.user_id != user_dict[user.name]:
-                scoring_engine.remove_points(
-                    item=user, message="User '{}' has been created.".format(user.name)
-                )
-
-        # Check admin status
-        if user.name in sudoers:
-            # User needed to be given sudo.
-            if user.allowed and user.is_sudo and not user.sudo_initial_state:
-                scoring_engine.award_points(
-                    item=user,
-                    message="User '{}' is in the sudoers group.".format(user.name),
-                )
-
-            # User needed sudo removed.
-            if not user.is_sudo and not user.sudo_initial_state:
-                scoring_engine.remove_points(
-                    item=user,
-                    message="User '{}' is in the sudoers group.".format(user.name),
-                )
-
-        elif user.name not in sudoers:
-            # User needed sudo removed.
-            if user.allowed and not user.is_sudo and user.sudo_initial_state:
-                scoring_engine.award_points(
-                    item=user,
-                    message="User '{}' is not in the sudoers group.".format(user.name),
-                )
+    for user in users:
+        if user.name not in user_dict:
+            presence.append("missing")
+        elif user.user_id != user_dict[user.name]:
+            presence.append("different")
+        else:
+            presence.append("present")
 
-            # User sudo permission removed.
-            if user.allowed and user.is_sudo and user.sudo_initial_state:
-                scoring_engine.remove_points(
-                    item=user,
-                    message="User '{}' is not in the sudoers group.".format(user.name),
-                )
+    User.transitions.score(scoring_engine, items=users, observed=presence)
+    User.sudo_transitions.score(
+        scoring_engine,
+        items=users,
+        observed=[user.name in sudoers for user in users],
+    )
 
 
-def score_processes(scoring_engine: ScoringEngine) -> None:
+def score_processes(scoring_engine: ScoringEngine, snapshot: SystemSnapshot) -> None:
 
     logging.info("Scoring processes...")
 
-    processes = psutil.process_iter()
-
-    process_list = []
+    # Nothing was collected if there is nothing to score.
+    if len(scoring_engine.processes) == 0:
+        return
 
-    for p in processes:
-        process_list.append(p.name())
+    if snapshot.processes is None:
+        logging.critical("Could not list processes. Processes will not be scored.")
+        return
 
-    process: Process
-    for process in scoring_engine.processes:
-        logging.debug("Scoring process '{}'".format(process.name))
-
-        logging.debug(
-            "TEMP DEBUG: process '{}' Desired: {} Default: {}".format(
-                process.name, process.desired_state, process.default_state
-            )
-        )
+    process_list = snapshot.processes
+    processes = scoring_engine.processes
 
-        # Process is running
-        if process.name in process_list:
+    Process.transitions.score(
+        scoring_engine,
+        items=processes,
+        observed=[process.name in process_list for process in processes],
+    )
 
-            logging.debug(
-                "TEMP DEBUG: process '{}' was found running.".format(process.name)
-            )
 
-            # Process should be running. (award)
-            if not process.default_state and process.desired_state:
-                scoring_engine.award_points(
-                    item=process,
-                    message="Process '{}' has been started.".format(process.name),
-                )
-
-            # Process should be stopped. (remove)
-            if not process.default_state and not process.desired_state:
-                scoring_engine.remove_points(
-                    item=process,
-                    message="Process '{}' has been started.".format(process.name),
-                )
-
-        # Else process is not running
-        elif process.name not in process_list:
-
-            logging.debug(
-                "TEMP DEBUG: process '{}' is not running.".format(process.name)
-            )
-
-            # Process should be running. (remove)
-            if process.default_state and process.desired_state:
-                scoring_engine.remove_points(
-                    item=process,
-                    message="Process '{}' has been stopped.".format(process.name),
-                )
-
-            # Process should be stopped. (award)
-            if process.default_state and not process.desired_state:
-                scoring_engine.award_points(
-                    item=process,
-                    message="Process '{}' has been stopped.".format(process.name),
-                )
-
-
-def score_packages(scoring_engine: ScoringEngine) -> None:
+def score_packages(scoring_engine: ScoringEngine, snapshot: SystemSnapshot) -> None:
     logging.info("Scoring packages...")
 
-    package: Package
-    for package in scoring_engine.packages:
-        # The awk command is included as it is because it needed to be a raw string.
-        # This was easier than fixing the problem.
-        command = "dpkg -l | grep {} | {}".format(package.name, r"awk '{print $2}'")
+    # Nothing was collected if there is nothing to score.
+    if len(scoring_engine.packages) == 0:
+        return
 
-        logging.debug(
-            "Searching for package '{}' with command: {}".format(package.name, command)
-        )
-
-        result = subprocess.check_output(command, shell=True).decode("utf-8").split()
+    if snapshot.packages is None:
+        logging.critical("Could not list packages. Packages will not be scored.")
+        return
 
-        found = False
+    packages = scoring_engine.packages
 
-        if package.name in result:
-            found = True
+    Package.transitions.score(
+        scoring_engine,
+        items=packages,
+        observed=[package.name in snapshot.packages for package in packages],
+    )
 
-        if found:
-            # Package needed to be installed.
-            if package.installed and not package.starting_state:
-                scoring_engine.award_points(
-                    item=package,
-                    message="Package '{}' is installed.".format(package.name),
-                )
-
-            # Package was wrongfully installed.
-            if not package.installed and not package.starting_state:
-                scoring_engine.remove_points(
-                    item=package,
-                    message="Package '{}' was installed.".format(package.name),
-                )
-
-        elif not found:
-            # Package was wrongfully uninstalled.
-            if package.installed and package.starting_state:
-                scoring_engine.remove_points(
-                    item=package,
-                    message="Package '{}' was uninstalled.".format(package.name),
-                )
-
-            # Package needed to be uninstalled.
-            if not package.installed and package.starting_state:
-                scoring_engine.award_points(
-                    item=package,
-                    message="Package '{}' was uninstalled.".format(package.name),
-                )
 
-
-def score_config_files(scoring_engine: ScoringEngine) -> None:
+def score_config_files(
+    scoring_engine: ScoringEngine, snapshot: SystemSnapshot, items: list = None
+) -> None:
     logging.info("Scoring configuration files...")
 
+    # Only the given configuration files are scored if a subset is specified.
+    if items is None:
+        items = scoring_engine.config_files
+
     file: ConfigFile
-    for file in scoring_engine.config_files:
+    for file in items:
 
-        content = None
         logging.debug(
             "TEMP DEBUG: Scoring configuration file at '{}'".format(file.path)
         )
 
-        try:
-            in_file = open(file.path, "r")
-            content = in_file.read().strip()
-            in_file.close()
-        except FileNotFoundError:
-            logging.warning(
-                "Could not open configuration file at '{}'".format(file.path)
-            )
-        except IOError:
-            logging.error(
-                "IOError occurred when reading file at path '{}'".format(file.path)
-            )
-        except Exception as e:
-            logging.error(
-                "An error occurred while reading configuration file '{}'. Error: {}"
-                .format(file.path, e)
+        content = snapshot.config_files.get(file.path)
+
+        if content is not None and file.key is not None:
+            score_config_setting(
+                scoring_engine=scoring_engine,
+                file=file,
+                value=snapshot.config_values[file.path].get(file.key.lower(), ""),
             )
 
-        if content is not None:
+        elif content is not None:
             logging.debug("Content: {} Filepath: {}".format(content, file.path))
 
             if content == file.default_value:
@@ -277,3 +153,37 @@ def score_config_files(scoring_engine: ScoringEngine) -> None:
             logging.error(
                 "No content was read from file at path '{}'".format(file.path)
             )
+
+
+def score_config_setting(
+    scoring_engine: ScoringEngine, file: ConfigFile, value: str
+) -> None:
+    """Score the value of the key checked by a configuration file item."""
+
+    logging.debug("Value: {} Key: {} Filepath: {}".format(value, file.key, file.path))
+
+    value = normalize_setting(value)
+
+    if value == normalize_setting(file.positive_value):
+        scoring_engine.award_points(
+            item=file,
+            message="'{}' {} matches positive value: {}".format(
+                file.path, file.key, file.positive_value or "(not set)"
+            ),
+        )
+    elif value == normalize_setting(file.negative_value):
+        scoring_engine.remove_points(
+            item=file,
+            message="'{}' {} matches negative value: {}".format(
+                file.path, file.key, file.negative_value or "(not set)"
+            ),
+        )
+
+
+def normalize_setting(value: str):
+    """Lowercase a setting and collapse its whitespace, so "Yes" matches "yes"."""
+
+    if value is None:
+        return None
+
+    return " ".join(value.split()).lower()
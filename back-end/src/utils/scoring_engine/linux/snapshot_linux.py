@@ -0,0 +1,760 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import re
+import logging
+import threading
+from functools import partial
+from utils.scoring_engine.shared.shared_files import modified_recently
+from utils.scoring_engine.shared.shared_util import ScoringEngine, SystemSnapshot
+
+
+class SystemSnapshot(SystemSnapshot):
+    """Linux system state for a single scoring cycle. Any collector that fails
+    leaves its field as None so the matching category is skipped instead of
+    being scored against an empty view of the system."""
+
+    def __init__(
+        self,
+        users: dict = None,
+        sudoers: frozenset = None,
+        processes: dict = None,
+        packages: frozenset = None,
+        config_files: dict = None,
+        config_values: dict = None,
+        files: dict = None,
+        question_responses: dict = None,
+    ) -> None:
+        # Maps user names to user IDs, and the names of users in any admin group.
+        self.users = users
+        self.sudoers = sudoers
+
+        # Maps process names to the number of running processes with that name.
+        self.processes = processes
+        self.packages = packages
+
+        # Maps a configuration file path to its stripped contents, or None if the
+        # file could not be read.
+        self.config_files = config_files if config_files is not None else {}
+
+        # Maps the path of each configuration file checked by key to its settings,
+        # as lowercased keys mapped to their values.
+        self.config_values = config_values if config_values is not None else {}
+
+        super().__init__(files=files, question_responses=question_responses)
+
+    def __str__(self) -> str:
+        s = """
+        Class: SystemSnapshot OS: Linux
+        users:        {}
+        sudoers:      {}
+        processes:    {}
+        packages:     {}
+        config_files: {}
+        {}
+        """.format(
+            None if self.users is None else len(self.users),
+            None if self.sudoers is None else len(self.sudoers),
+            None if self.processes is None else len(self.processes),
+            None if self.packages is None else len(self.packages),
+            len(self.config_files),
+            super().__str__(),
+        )
+        return s
+
+    def collectors(self, scoring_engine: ScoringEngine) -> list:
+        """Categories without any items are not collected."""
+
+        collectors = []
+
+        if len(scoring_engine.users) > 0:
+            collectors.append(
+                (
+                    "users",
+                    partial(
+                        self.collect_users,
+                        account_database=scoring_engine.account_database,
+                    ),
+                )
+            )
+
+        if len(scoring_engine.processes) > 0:
+            collectors.append(
+                (
+                    "processes",
+                    partial(
+                        self.collect_processes,
+                        process_table=scoring_engine.process_table,
+                    ),
+                )
+            )
+
+        if len(scoring_engine.packages) > 0:
+            collectors.append(
+                (
+                    "packages",
+                    partial(
+                        self.collect_packages,
+                        package_index=scoring_engine.package_index,
+                    ),
+                )
+            )
+
+        collectors.append(
+            (
+                "config_files",
+                partial(
+                    self.collect_config_files,
+                    items=scoring_engine.config_files,
+                    config_index=scoring_engine.config_index,
+                ),
+            )
+        )
+
+        return collectors + super().collectors(scoring_engine=scoring_engine)
+
+    def collect_users(self, account_database: "AccountDatabase") -> None:
+        try:
+            account_database.refresh()
+        except OSError as e:
+            logging.error("Could not read account databases. Error: {}".format(e))
+            return
+
+        self.users = account_database.users
+        self.sudoers = account_database.admins
+
+        signatures = (
+            account_database.passwd_signature,
+            account_database.group_signature,
+        )
+
+        # A database modified too recently to be told apart from a later write has
+        # no signature, and the users are rescored every cycle until it settles.
+        if None in signatures:
+            self.fingerprints["users"] = None
+        else:
+            self.fingerprints["users"] = signatures
+
+    def collect_processes(self, process_table: "ProcessTable") -> None:
+        try:
+            self.processes = process_table.refresh()
+            self.fingerprints["processes"] = process_table.generation
+        except OSError as e:
+            logging.error(
+                "Could not read process table at '{}'. Error: {}".format(
+                    process_table.proc_path, e
+                )
+            )
+
+    def collect_packages(self, package_index: "DpkgStatusIndex") -> None:
+        try:
+            self.packages = package_index.refresh()
+            self.fingerprints["packages"] = package_index.signature
+        except OSError as e:
+            logging.error(
+                "Could not read dpkg status database at '{}'. Error: {}".format(
+                    package_index.path, e
+                )
+            )
+
+    def collect_config_files(self, items: list, config_index: "ConfigIndex") -> None:
+        """Read each configuration file checked by items once, through the index
+        shared by every item checking the same file. Settings are only parsed for
+        files checked by key."""
+
+        contents = {}
+
+        for file in items:
+            path = file.path
+
+            if path not in contents:
+                contents[path] = self.read_config_file(
+                    path=path, config_index=config_index
+                )
+
+                if contents[path] is not None:
+                    self.config_files[path] = contents[path].content
+                else:
+                    self.config_files[path] = None
+
+            if file.key is not None and contents[path] is not None:
+                self.config_values[path] = contents[path].settings()
+
+        self.fingerprints["config_files"] = self.config_files
+
+    @staticmethod
+    def read_config_file(path: str, config_index: "ConfigIndex"):
+        try:
+            return config_index.read(path=path)
+        except FileNotFoundError:
+            logging.warning("Could not open configuration file at '{}'".format(path))
+        except IOError:
+            logging.error(
+                "IOError occurred when reading file at path '{}'".format(path)
+            )
+        except Exception as e:
+            logging.error(
+                "An error occurred while reading configuration file '{}'. Error: {}"
+                .format(path, e)
+            )
+
+        return None
+
+
+class ConfigIndex:
+    """Contents of configuration files, read once per change and shared by every
+    item checking the same file. A file is only read again when its inode, mtime or
+    size changes, so fifty checks against sshd_config cost one stat per cycle and
+    one read and parse whenever it is edited.
+
+    Files under /proc and /sys are read every time, their size and mtime say
+    nothing about their contents. Files modified within the last racy_window
+    seconds are read again on the next cycle."""
+
+    volatile_roots = ("/proc/", "/sys/")
+
+    def __init__(self, racy_window: float = 2) -> None:
+        self.racy_window = racy_window
+
+        # Maps paths to their ((inode, mtime, size), ConfigContents).
+        self.entries = {}
+
+        # The config_files collector and an event driven rescore may read at once.
+        self.lock = threading.Lock()
+
+    def __str__(self) -> str:
+        s = """
+        Class: ConfigIndex
+        racy_window: {}
+        entries:     {}
+        """.format(
+            self.racy_window, len(self.entries)
+        )
+        return s
+
+    def __getstate__(self) -> dict:
+        # Rebuilt on the first read, there is no need to save it.
+        return {"racy_window": self.racy_window}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(racy_window=state["racy_window"])
+
+    def read(self, path: str) -> "ConfigContents":
+        """The contents of the configuration file at path. Raises OSError."""
+
+        if path.startswith(self.volatile_roots):
+            with open(path, "r") as in_file:
+                return ConfigContents(path=path, content=in_file.read())
+
+        stat = os.stat(path)
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            cached = self.entries.get(path)
+
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        logging.debug("Reading configuration file at '{}'".format(path))
+
+        with open(path, "r") as in_file:
+            contents = ConfigContents(path=path, content=in_file.read())
+
+        if not modified_recently(mtime_ns=stat.st_mtime_ns, window=self.racy_window):
+            with self.lock:
+                self.entries[path] = (signature, contents)
+
+        return contents
+
+
+class ConfigContents:
+    """The stripped contents of a configuration file, and its settings, parsed the
+    first time an item checks a key in it."""
+
+    # sshd uses the first value given for each keyword and applies everything after
+    # the first Match block conditionally. Other files use the last value.
+    first_value_files = ("sshd_config", "ssh_config")
+
+    # "Key value", "Key=value" or "key = value".
+    setting_regex = re.compile(r"([^\s=]+)\s*(?:=\s*|\s+|$)(.*)")
+
+    def __init__(self, path: str, content: str) -> None:
+        self.path = path
+        self.content = content.strip()
+        self.parsed = None
+
+    def settings(self) -> dict:
+        """Map each lowercased key set in the file to its value."""
+
+        if self.parsed is not None:
+            return self.parsed
+
+        first_value = os.path.basename(self.path) in self.first_value_files
+        settings = {}
+
+        for line in self.content.splitlines():
+            line = line.strip()
+
+            if line == "" or line.startswith(("#", ";")):
+                continue
+
+            match = self.setting_regex.match(line)
+
+            if match is None:
+                continue
+
+            key = match.group(1).lower()
+
+            if first_value:
+                if key == "match":
+                    break
+
+                if key in settings:
+                    continue
+
+            settings[key] = match.group(2).strip()
+
+        self.parsed = settings
+        return settings
+
+
+class DpkgStatusIndex:
+    """Index of installed packages built by parsing the dpkg status database
+    directly. The database is only parsed again when its inode, mtime or size
+    changes, so a cycle without any dpkg transaction costs a single stat. A
+    database modified within the last racy_window seconds is parsed again on the
+    next cycle, since a write in the same clock tick wouldn't change its mtime."""
+
+    # Package states where the package's files are present on the system.
+    installed_states = {
+        "installed",
+        "unpacked",
+        "half-configured",
+        "triggers-awaited",
+        "triggers-pending",
+    }
+
+    def __init__(
+        self, path: str = "/var/lib/dpkg/status", racy_window: float = 2
+    ) -> None:
+        self.path = path
+        self.racy_window = racy_window
+
+        # Maps package names to their dpkg status, e.g. "install ok installed".
+        self.packages = {}
+        self.installed = frozenset()
+        self.signature = None
+
+    def __str__(self) -> str:
+        s = """
+        Class: DpkgStatusIndex
+        path:      {}
+        packages:  {}
+        installed: {}
+        """.format(
+            self.path, len(self.packages), len(self.installed)
+        )
+        return s
+
+    def __getstate__(self) -> dict:
+        # The index is rebuilt on the first refresh, there is no need to save it
+        # with the scoring engine.
+        return {"path": self.path, "racy_window": self.racy_window}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def refresh(self) -> frozenset:
+        """Return the names of installed packages, parsing the status database
+        again only if it changed since the last refresh."""
+
+        stat = os.stat(self.path)
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        if signature != self.signature:
+            logging.debug("Parsing dpkg status database at '{}'".format(self.path))
+            self.parse()
+
+            # A database parsed right after a change is parsed again next time.
+            if modified_recently(mtime_ns=stat.st_mtime_ns, window=self.racy_window):
+                self.signature = None
+            else:
+                self.signature = signature
+
+        return self.installed
+
+    def parse(self) -> None:
+        packages = {}
+        installed = set()
+
+        with open(self.path, "r", encoding="utf-8", errors="replace") as in_file:
+            data = in_file.read()
+
+        # Each package is a stanza of "Field: value" lines separated by a blank line.
+        for stanza in data.split("\n\n"):
+            name = status = architecture = None
+
+            for line in stanza.splitlines():
+                if line.startswith("Package:"):
+                    name = line[8:].strip()
+                elif line.startswith("Status:"):
+                    status = line[7:].strip()
+                elif line.startswith("Architecture:"):
+                    architecture = line[13:].strip()
+
+            if name is None or status is None:
+                continue
+
+            names = [name]
+
+            # Multiarch packages can also be referred to as name:arch.
+            if architecture is not None:
+                names.append("{}:{}".format(name, architecture))
+
+            for key in names:
+                # Keep an installed architecture over one that was removed.
+                if key not in installed:
+                    packages[key] = status
+
+            if status.split()[-1] in self.installed_states:
+                installed.update(names)
+
+        self.packages = packages
+        self.installed = frozenset(installed)
+
+
+class ProcessTable:
+    """Process names read from /proc, cached by pid and start time. Each refresh
+    reads the small /proc/<pid>/stat file of every pid, and only looks up the full
+    name of processes that were not seen on a previous refresh. A pid that was
+    reused by a new process has a different start time, so it is counted as the
+    old process exiting and the new one starting.
+
+    Processes whose entries can't be read, such as those of other users on a /proc
+    mounted with hidepid, are left out."""
+
+    def __init__(self, proc_path: str = "/proc", read_cmdline: bool = True) -> None:
+        self.proc_path = proc_path
+
+        # Kernel process names are truncated to 15 characters. When set, the full
+        # name is recovered from the command line the same way psutil does.
+        self.read_cmdline = read_cmdline
+
+        # Maps pids to their (start time, process name), and process names to
+        # running process counts.
+        self.names = {}
+        self.counts = {}
+
+        # Incremented whenever a process starts or exits.
+        self.generation = 0
+
+    def __str__(self) -> str:
+        s = """
+        Class: ProcessTable
+        proc_path:    {}
+        read_cmdline: {}
+        processes:    {}
+        names:        {}
+        """.format(
+            self.proc_path, self.read_cmdline, len(self.names), len(self.counts)
+        )
+        return s
+
+    def __getstate__(self) -> dict:
+        # Pids are meaningless after a restart, so the cache is never saved.
+        return {"proc_path": self.proc_path, "read_cmdline": self.read_cmdline}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def refresh(self) -> dict:
+        """Update the table from /proc and return the name to count index."""
+
+        # Maps each running pid to its (start time, short name).
+        running = {}
+
+        for entry in os.listdir(self.proc_path):
+            if not entry.isdigit():
+                continue
+
+            pid = int(entry)
+            stat = self.read_stat(pid=pid)
+
+            if stat is not None:
+                running[pid] = stat
+
+        exited = [
+            pid
+            for pid, (start_time, _) in self.names.items()
+            if pid not in running or running[pid][0] != start_time
+        ]
+
+        for pid in exited:
+            _, name = self.names.pop(pid)
+            self.counts[name] -= 1
+
+            if self.counts[name] == 0:
+                del self.counts[name]
+
+        started = running.keys() - self.names.keys()
+
+        for pid in started:
+            start_time, name = running[pid]
+            name = self.read_name(pid=pid, name=name)
+
+            # The process exited before its full name could be read.
+            if name is None:
+                continue
+
+            self.names[pid] = (start_time, name)
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+        if len(exited) > 0 or len(started) > 0:
+            self.generation += 1
+
+        return self.counts
+
+    def read_stat(self, pid: int):
+        """The (start time, short name) of the process with the given pid, or None
+        if it exited or can't be read."""
+
+        stat_path = os.path.join(self.proc_path, str(pid), "stat")
+
+        try:
+            with open(stat_path, "rb") as in_file:
+                data = in_file.read().decode("utf-8", "replace")
+        except OSError:
+            return None
+
+        # "pid (name) state ppid ...", the name may itself contain spaces and
+        # parentheses. The start time is the 22nd field.
+        name_start = data.find("(")
+        name_end = data.rfind(")")
+        fields = data[name_end + 2 :].split()
+
+        if name_start == -1 or len(fields) < 20:
+            logging.debug("Malformed stat for process {}: {}".format(pid, data))
+            return None
+
+        return (fields[19], data[name_start + 1 : name_end])
+
+    def read_name(self, pid: int, name: str):
+        """The full name of the process with the given pid, given its short name
+        from stat. Returns None if it exited or can't be read."""
+
+        if not self.read_cmdline or len(name) < 15:
+            return name
+
+        process_path = os.path.join(self.proc_path, str(pid))
+
+        try:
+            with open(os.path.join(process_path, "cmdline"), "rb") as in_file:
+                cmdline = in_file.read().decode("utf-8", "replace").split("\0")
+        except (FileNotFoundError, ProcessLookupError):
+            return None
+        except OSError:
+            # Same as psutil, fall back to the truncated name.
+            return name
+
+        # Kernel threads have an empty command line.
+        extended_name = os.path.basename(cmdline[0])
+
+        if extended_name.startswith(name):
+            name = extended_name
+
+        return name
+
+
+class AccountDatabase:
+    """Users and groups parsed directly from /etc/passwd and /etc/group. Each file
+    is only parsed again when its inode, mtime or size changes, so unchanged
+    account databases cost a single stat each per cycle. A file modified within the
+    last racy_window seconds is parsed again on the next cycle."""
+
+    def __init__(
+        self,
+        passwd_path: str = "/etc/passwd",
+        group_path: str = "/etc/group",
+        admin_groups: tuple = ("sudo", "wheel", "admin"),
+        racy_window: float = 2,
+    ) -> None:
+        self.passwd_path = passwd_path
+        self.group_path = group_path
+        self.racy_window = racy_window
+
+        # Membership in any of these groups grants administrative privileges.
+        # Groups that don't exist on the system are ignored.
+        self.admin_groups = admin_groups
+
+        # Maps user names to user IDs and primary group IDs.
+        self.users = {}
+        self.primary_groups = {}
+
+        # Maps group names to group IDs and to the set of their members.
+        self.group_ids = {}
+        self.groups = {}
+
+        # Names of every user in any of the admin groups.
+        self.admins = frozenset()
+
+        self.passwd_signature = None
+        self.group_signature = None
+
+    def __str__(self) -> str:
+        s = """
+        Class: AccountDatabase
+        passwd_path:  {}
+        group_path:   {}
+        admin_groups: {}
+        users:        {}
+        groups:       {}
+        admins:       {}
+        """.format(
+            self.passwd_path,
+            self.group_path,
+            self.admin_groups,
+            len(self.users),
+            len(self.groups),
+            sorted(self.admins),
+        )
+        return s
+
+    def __getstate__(self) -> dict:
+        # The parsed files are cheap to rebuild and may be stale after a restart.
+        return {
+            "passwd_path": self.passwd_path,
+            "group_path": self.group_path,
+            "admin_groups": self.admin_groups,
+            "racy_window": self.racy_window,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    def signature(self, path: str):
+        """The inode, mtime and size of the file at path, or None if it was modified
+        too recently for them to tell it apart from a later write."""
+
+        stat = os.stat(path)
+
+        if modified_recently(mtime_ns=stat.st_mtime_ns, window=self.racy_window):
+            return None
+
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def refresh(self) -> None:
+        """Parse either account database again if it changed since the last
+        refresh."""
+
+        changed = False
+
+        passwd_signature = self.signature(path=self.passwd_path)
+
+        if passwd_signature is None or passwd_signature != self.passwd_signature:
+            self.parse_passwd()
+            self.passwd_signature = passwd_signature
+            changed = True
+
+        group_signature = self.signature(path=self.group_path)
+
+        if group_signature is None or group_signature != self.group_signature:
+            self.parse_group()
+            self.group_signature = group_signature
+            changed = True
+
+        if changed:
+            self.admins = self.members(groups=self.admin_groups)
+
+    def members(self, groups: tuple) -> frozenset:
+        """Return the names of users in any of the given groups, including users
+        that have one of the groups as their primary group."""
+
+        gids = set()
+        members = set()
+
+        for group in groups:
+            if group in self.groups:
+                gids.add(self.group_ids[group])
+                members.update(self.groups[group])
+
+        for name, gid in self.primary_groups.items():
+            if gid in gids:
+                members.add(name)
+
+        return frozenset(members)
+
+    def parse_passwd(self) -> None:
+        users = {}
+        primary_groups = {}
+
+        # name:password:uid:gid:gecos:home:shell
+        for fields in self.read_entries(path=self.passwd_path, field_count=7):
+            try:
+                users[fields[0]] = int(fields[2])
+                primary_groups[fields[0]] = int(fields[3])
+            except ValueError:
+                logging.warning(
+                    "Skipping malformed entry for user '{}' in {}".format(
+                        fields[0], self.passwd_path
+                    )
+                )
+
+        self.users = users
+        self.primary_groups = primary_groups
+
+    def parse_group(self) -> None:
+        group_ids = {}
+        groups = {}
+
+        # name:password:gid:member,member
+        for fields in self.read_entries(path=self.group_path, field_count=4):
+            try:
+                group_ids[fields[0]] = int(fields[2])
+            except ValueError:
+                logging.warning(
+                    "Skipping malformed entry for group '{}' in {}".format(
+                        fields[0], self.group_path
+                    )
+                )
+                continue
+
+            groups[fields[0]] = frozenset(
+                member.strip() for member in fields[3].split(",") if member.strip()
+            )
+
+        self.group_ids = group_ids
+        self.groups = groups
+
+    @staticmethod
+    def read_entries(path: str, field_count: int) -> list:
+        entries = []
+
+        with open(path, "r", encoding="utf-8", errors="replace") as in_file:
+            for line in in_file:
+                line = line.strip()
+
+                # Skip blank lines, comments and NIS compat entries.
+                if line == "" or line[0] in "#+-":
+                    continue
+
+                fields = line.split(":")
+
+                if len(fields) < field_count:
+                    continue
+
+                entries.append(fields)
+
+        return entries
@@ -0,0 +1,224 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+import ctypes
+import struct
+import select
+import logging
+
+# Event flags from <sys/inotify.h>.
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+
+# struct inotify_event { int wd; uint32_t mask; uint32_t cookie; uint32_t len; }
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """Watches the parent directories of a set of paths with Linux inotify and
+    reports which of the paths may have changed.
+
+    Directories are watched instead of the paths themselves so that files being
+    created, deleted or replaced are caught as well as modifications. If a
+    parent directory doesn't exist yet, its nearest existing ancestor is watched
+    until it is created. Pseudo filesystems such as /proc and /sys don't
+    generate inotify events, paths on them are never reported."""
+
+    def __init__(self, paths: list, settle_time: float = 0.1) -> None:
+        self.paths = set(os.path.abspath(path) for path in paths)
+
+        # Time to keep reading after the first event so a burst of events, like an
+        # editor saving a file, is handled as a single change.
+        self.settle_time = settle_time
+
+        self.fd = None
+        self.libc = None
+
+        # Maps watch descriptors to the watched directory, and back.
+        self.watches = {}
+        self.directories = {}
+
+    def __str__(self) -> str:
+        s = """
+        Class: InotifyWatcher
+        paths:       {}
+        directories: {}
+        settle_time: {}
+        """.format(
+            len(self.paths), sorted(self.directories), self.settle_time
+        )
+        return s
+
+    def __getstate__(self) -> dict:
+        # File descriptors don't survive a restart, the watcher is opened again
+        # when scoring resumes.
+        return {"paths": self.paths, "settle_time": self.settle_time}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(paths=state["paths"], settle_time=state["settle_time"])
+
+    def open(self) -> None:
+        """Create the inotify instance and add watches for every path. Raises
+        OSError if inotify is not available."""
+
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        self.fd = fd
+        self.sync()
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+
+        self.fd = None
+        self.watches = {}
+        self.directories = {}
+
+    def sync(self) -> None:
+        """Make sure the closest existing directory of every path is watched. Called
+        after every batch of events, since creating or removing directories changes
+        which directories need watching."""
+
+        for path in self.paths:
+            directory = os.path.dirname(path)
+
+            while not os.path.isdir(directory) and directory != os.path.dirname(
+                directory
+            ):
+                directory = os.path.dirname(directory)
+
+            if directory in self.directories:
+                continue
+
+            wd = self.libc.inotify_add_watch(
+                self.fd, os.fsencode(directory), WATCH_MASK
+            )
+
+            if wd < 0:
+                logging.warning(
+                    "Could not watch directory '{}' for changes. Error: {}".format(
+                        directory, os.strerror(ctypes.get_errno())
+                    )
+                )
+                continue
+
+            self.watches[wd] = directory
+            self.directories[directory] = wd
+
+    def read_changes(self, timeout: float) -> set:
+        """Wait up to timeout seconds for events and return the watched paths that
+        may have changed. Returns an empty set if the timeout expired."""
+
+        readable, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+
+        if not readable:
+            return set()
+
+        changed = set()
+        deadline = time.monotonic() + self.settle_time
+
+        while True:
+            changed.update(self.read_events())
+
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0 or not select.select([self.fd], [], [], remaining)[0]:
+                break
+
+        self.sync()
+
+        # Events were lost, assume everything changed.
+        if None in changed:
+            return set(self.paths)
+
+        # Match every watched path at or below a changed path, so events for a
+        # directory that was created or removed cover the files inside of it.
+        paths = set()
+
+        for path in self.paths:
+            for changed_path in changed:
+                if path == changed_path or path.startswith(changed_path + os.sep):
+                    paths.add(path)
+                    break
+
+        return paths
+
+    def read_events(self) -> set:
+        """Read pending events and return the paths they refer to. None is included
+        if the kernel's event queue overflowed."""
+
+        changed = set()
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                logging.warning("Inotify event queue overflowed.")
+                changed.add(None)
+                continue
+
+            directory = self.watches.get(wd)
+
+            if directory is None:
+                continue
+
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                # The directory itself went away, its watch is gone.
+                changed.add(directory)
+                self.watches.pop(wd, None)
+                self.directories.pop(directory, None)
+            elif name:
+                changed.add(os.path.join(directory, os.fsdecode(name)))
+
+        return changed
@@ -0,0 +1,158 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+import logging
+from abc import abstractmethod
+from utils.scoring_engine.shared.shared_util import ScoringEngine, SystemSnapshot
+
+
+class AsyncScoringEngine(ScoringEngine):
+    """Scoring engine driven by an asyncio event loop instead of sleeping between
+    cycles.
+
+    Collectors run as asyncio tasks, each within its time budget, so waiting on one
+    subprocess or system call overlaps with the others. A full cycle runs every
+    scoring interval, or as soon as a rescore is requested by a trigger source.
+    The OS specific engines combine this class with their own scoring engine."""
+
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+
+        # The event loop only exists while the engine is running.
+        state.pop("loop", None)
+        state.pop("trigger", None)
+        state.pop("rescheduled", None)
+        state.pop("scoring", None)
+
+        return state
+
+    def start(self):
+        """Starts the scoring engine on a new event loop, which will score on the
+        given scoring interval."""
+
+        print("Starting scoring engine...")
+
+        if self.debug_config:
+            self.debug_configuration()
+
+        asyncio.run(self.run_async())
+
+    async def run_async(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.trigger = asyncio.Event()
+        self.rescheduled = asyncio.Event()
+        self.scoring = False
+
+        self.open_trigger_sources()
+
+        requested = False
+
+        try:
+            while self.run:
+                await self.score_async(
+                    categories=self.due_categories(everything=requested)
+                )
+                print("Current score: {}".format(self.current_score))
+                requested = await self.wait_async()
+
+                if requested:
+                    self.reset_backoff()
+        finally:
+            self.close_trigger_sources()
+
+    async def score_async(self, categories: set = None) -> None:
+        print("Scoring...")
+
+        self.configuration_messages = []
+        self.scoring = True
+
+        try:
+            snapshot = await self.collect_snapshot_async(categories=categories)
+            self.score_snapshot(snapshot=snapshot, categories=categories)
+        finally:
+            self.scoring = False
+
+    async def wait_async(self) -> bool:
+        """Wait until the next category is due, or until a full rescore is
+        requested. The next due time is looked up again whenever the schedule is
+        brought forward in the meantime. Returns whether a rescore was requested."""
+
+        logging.debug("Waiting for the next cycle...")
+
+        while True:
+            self.rescheduled.clear()
+
+            waiters = [
+                asyncio.ensure_future(self.trigger.wait()),
+                asyncio.ensure_future(self.rescheduled.wait()),
+            ]
+
+            await asyncio.wait(
+                waiters,
+                timeout=self.schedule.time_until_next(),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+
+            for waiter in waiters:
+                waiter.cancel()
+
+            if self.trigger.is_set():
+                self.trigger.clear()
+                return True
+
+            if not self.rescheduled.is_set():
+                return False
+
+    def reset_backoff(self) -> None:
+        super().reset_backoff()
+
+        # Changes rescored while waiting end the backoff, wake wait_async() so it
+        # waits for the tightened schedule instead.
+        self.rescheduled.set()
+
+    def request_rescore(self) -> None:
+        """Start a full cycle as soon as possible. Safe to call from any thread."""
+        self.loop.call_soon_threadsafe(self.trigger.set)
+
+    def open_trigger_sources(self) -> None:
+        """Register any sources of rescore requests with the event loop, overridden
+        by engines that have them."""
+
+    def close_trigger_sources(self) -> None:
+        """Unregister the sources added by open_trigger_sources()."""
+
+    @abstractmethod
+    async def collect_snapshot_async(self, categories: set = None) -> SystemSnapshot:
+        ...
+
+
+async def run_subprocess(*args: str) -> str:
+    """Run a command without a shell and return its output. The process is killed
+    if the task running it is cancelled, such as when a collector times out."""
+
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+
+    try:
+        output, _ = await process.communicate()
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+
+    return output.decode(errors="replace")
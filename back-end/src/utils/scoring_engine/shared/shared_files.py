@@ -0,0 +1,558 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import re
+import time
+import fnmatch
+import bisect
+import hashlib
+import logging
+import threading
+from array import array
+from typing import NamedTuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class FileState(NamedTuple):
+    """What a stat of a file reports about it, enough to tell a file that was
+    replaced or modified apart from the one that was there before."""
+
+    inode: int
+    size: int
+    mtime: int
+
+
+class DirectoryListings:
+    """Answers which of a set of paths exist by reading each parent directory once,
+    instead of checking every path on its own.
+
+    Listings are cached by the modification time of their directory, which
+    changes whenever an entry is created, deleted or renamed, so a directory is
+    only read again once its contents have changed. Directories modified within
+    the last racy_window seconds are always read again, since a change in the
+    same clock tick as the cached listing wouldn't change the modification time.
+
+    Only existing paths are stat'ed, so watching many paths that are supposed to be
+    deleted costs a stat of each directory and, if it changed, a read of it."""
+
+    def __init__(self, racy_window: float = 2) -> None:
+        self.racy_window = racy_window
+
+        # Maps directories to their (modification time, set of entry names), names
+        # are normalized with os.path.normcase().
+        self.listings = {}
+
+        # Listings may be used by a cycle and an event driven rescore at once.
+        self.lock = threading.Lock()
+
+    def __str__(self) -> str:
+        s = """
+        Class: DirectoryListings
+        racy_window: {}
+        listings:    {}
+        """.format(
+            self.racy_window, len(self.listings)
+        )
+        return s
+
+    def __getstate__(self) -> dict:
+        # Listings are only valid for the running system.
+        return {"racy_window": self.racy_window}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(racy_window=state["racy_window"])
+
+    def stat_paths(self, paths: list) -> dict:
+        """Map each path to its FileState, or None if it doesn't exist."""
+
+        # Group the paths by their parent directory.
+        directories = {}
+
+        for path in dict.fromkeys(paths):
+            directory, name = os.path.split(os.path.abspath(path))
+            directories.setdefault(directory, []).append((path, name))
+
+        states = {}
+
+        for directory, entries in directories.items():
+            names = self.list_directory(directory=directory)
+
+            for path, name in entries:
+                # The root directory has no name in its parent.
+                if names is not None and name != "":
+                    if os.path.normcase(name) not in names:
+                        states[path] = None
+                        continue
+
+                states[path] = stat_file(path=path)
+
+        return states
+
+    def list_directory(self, directory: str):
+        """The normalized names of the entries in directory, from the cache if the
+        directory hasn't changed. Returns None if the directory can be searched but
+        not listed, in which case each path has to be stat'ed."""
+
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            # Nothing in a directory that doesn't exist exists either.
+            return frozenset()
+
+        with self.lock:
+            cached = self.listings.get(directory)
+
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        try:
+            with os.scandir(directory) as entries:
+                names = frozenset(os.path.normcase(entry.name) for entry in entries)
+        except OSError as e:
+            logging.debug(
+                "Could not list directory '{}'. Error: {}".format(directory, e)
+            )
+            return None
+
+        # A listing read while the directory may still change within the same
+        # modification time isn't cached.
+        if not modified_recently(mtime_ns=mtime, window=self.racy_window):
+            with self.lock:
+                self.listings[directory] = (mtime, names)
+
+        return names
+
+
+def stat_file(path: str):
+    """The FileState of the file at path, following symbolic links, or None if it
+    doesn't exist."""
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return FileState(inode=stat.st_ino, size=stat.st_size, mtime=stat.st_mtime_ns)
+
+
+def modified_recently(mtime_ns: int, window: float) -> bool:
+    """Whether a modification time is within the last window seconds, too recent
+    to tell apart from a write in the same clock tick. Whatever was read from such
+    a file or directory mustn't be cached."""
+
+    return time.time_ns() - mtime_ns <= window * 1e9
+
+
+class HashCache:
+    """Streams files through SHA-256 and remembers each digest along with the
+    device, inode, modification time and size of the file it was computed from, so
+    a file is only read again once it changed. Large binaries cost a stat per
+    cycle instead of a full read.
+
+    Digests of files modified within the last racy_window seconds aren't kept,
+    since a write in the same clock tick wouldn't change the modification time."""
+
+    def __init__(self, chunk_size: int = 1 << 20, racy_window: float = 2) -> None:
+        self.chunk_size = chunk_size
+        self.racy_window = racy_window
+
+        # Maps paths to ((device, inode, modification time, size), hex digest).
+        self.digests = {}
+
+        # Digests may be requested by several collectors at once.
+        self.lock = threading.Lock()
+
+    def __str__(self) -> str:
+        s = """
+        Class: HashCache
+        chunk_size:  {}
+        racy_window: {}
+        digests:     {}
+        """.format(
+            self.chunk_size, self.racy_window, len(self.digests)
+        )
+        return s
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def digest(self, path: str, stat: os.stat_result = None):
+        """The hex SHA-256 digest of the file at path, or None if it doesn't exist.
+        Raises OSError if it exists but can't be read. stat saves a call if the
+        caller already has the file's stat."""
+
+        if stat is None:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                with self.lock:
+                    self.digests.pop(path, None)
+                return None
+
+        key = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            cached = self.digests.get(path)
+
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        digest = hash_file(path=path, chunk_size=self.chunk_size)
+
+        # The file may have been written to while it was read, in which case the
+        # digest is used for this cycle only.
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return digest
+
+        if (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size) != key:
+            return digest
+
+        if not modified_recently(mtime_ns=stat.st_mtime_ns, window=self.racy_window):
+            with self.lock:
+                self.digests[path] = (key, digest)
+
+        return digest
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """The hex SHA-256 digest of the file at path, read chunk_size bytes at a time.
+    Raises OSError."""
+
+    sha256 = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+
+    with open(path, "rb") as in_file:
+        while True:
+            size = in_file.readinto(buffer)
+
+            if not size:
+                break
+
+            sha256.update(view[:size])
+
+    return sha256.hexdigest()
+
+
+class TreeIndex:
+    """Finds every file under root whose name matches one of patterns, by walking
+    the tree on a pool of threads with one os.scandir per directory.
+
+    The index remembers, for each directory, its modification time, its
+    subdirectories and its matching files. Walking again only reads directories
+    whose modification time changed, the rest cost a single stat. Subdirectories
+    whose name matches one of exclude are pruned from the walk, as are symbolic
+    links to directories, which could otherwise form a loop.
+
+    Patterns are globs matched against file names, ignoring case. A pattern
+    without wildcards is an extension, so "mp3", ".mp3" and "tar.gz" match every
+    file ending in that extension. A dotted pattern without a leading dot, such as
+    "tar.gz" or "notes.txt", also matches a file with exactly that name."""
+
+    def __init__(
+        self,
+        root: str,
+        patterns: tuple,
+        exclude: tuple = (),
+        threads: int = 4,
+        racy_window: float = 2,
+    ) -> None:
+        self.root = root
+        self.patterns = patterns
+        self.exclude = exclude
+        self.threads = threads
+        self.racy_window = racy_window
+
+        self.matcher = compile_patterns(patterns=patterns)
+        self.excluder = compile_patterns(patterns=exclude, extensions=False)
+
+        # Maps each directory found by the last walk to its (modification time,
+        # subdirectory names, matching file names). The modification time is None
+        # if the directory has to be read again next time.
+        self.directories = {}
+
+    def __str__(self) -> str:
+        s = """
+        Class: TreeIndex
+        root:        {}
+        patterns:    {}
+        exclude:     {}
+        threads:     {}
+        directories: {}
+        """.format(
+            self.root,
+            self.patterns,
+            self.exclude,
+            self.threads,
+            len(self.directories),
+        )
+        return s
+
+    def walk(self):
+        """Return the sorted paths of every matching file under root, or None if
+        root can't be read."""
+
+        directories = {}
+        matches = []
+
+        with ThreadPoolExecutor(
+            max_workers=self.threads, thread_name_prefix="walker"
+        ) as executor:
+            pending = {executor.submit(self.visit, self.root)}
+
+            while len(pending) > 0:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    directory, listing = future.result()
+
+                    if listing is None:
+                        continue
+
+                    directories[directory] = listing
+                    _, subdirectories, names = listing
+
+                    for name in names:
+                        matches.append(os.path.join(directory, name))
+
+                    for name in subdirectories:
+                        pending.add(
+                            executor.submit(self.visit, os.path.join(directory, name))
+                        )
+
+        # Directories that are gone are dropped from the index.
+        self.directories = directories
+
+        if self.root not in directories:
+            return None
+
+        return tuple(sorted(matches))
+
+    def visit(self, directory: str) -> tuple:
+        """Return the directory and its listing, read again only if it changed, or
+        None if it can't be read."""
+
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return directory, None
+
+        cached = self.directories.get(directory)
+
+        if cached is not None and cached[0] == mtime:
+            return directory, cached
+
+        subdirectories = []
+        names = []
+
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        is_directory = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+
+                    name = entry.name.lower()
+
+                    if is_directory:
+                        if self.excluder is None or not self.excluder.match(name):
+                            subdirectories.append(entry.name)
+                    elif self.matcher is not None and self.matcher.match(name):
+                        names.append(entry.name)
+        except OSError as e:
+            logging.debug(
+                "Could not list directory '{}'. Error: {}".format(directory, e)
+            )
+            return directory, None
+
+        # A listing read right after a change is read again next time.
+        if modified_recently(mtime_ns=mtime, window=self.racy_window):
+            mtime = None
+
+        return directory, (mtime, tuple(subdirectories), tuple(names))
+
+
+def compile_patterns(patterns: tuple, extensions: bool = True):
+    """Compile globs into one case insensitive regular expression, or None if there
+    are no patterns. Patterns without wildcards are expanded to extensions if
+    extensions is set, see TreeIndex."""
+
+    expressions = []
+
+    for pattern in patterns:
+        pattern = pattern.strip().lower()
+
+        if pattern == "":
+            continue
+
+        if extensions and not any(character in pattern for character in "*?["):
+            extension = pattern.lstrip(".")
+
+            # An extension, with or without the dot, of one or more parts.
+            expressions.append(fnmatch.translate("*." + extension))
+
+            # A name such as "notes.txt" also matches itself.
+            if extension == pattern and "." in pattern:
+                expressions.append(fnmatch.translate(pattern))
+
+            continue
+
+        expressions.append(fnmatch.translate(pattern))
+
+    if len(expressions) == 0:
+        return None
+
+    return re.compile("|".join(expressions))
+
+
+class Blocklist:
+    """A large set of SHA-256 digests of known bad files, kept compact.
+
+    Digests are stored as a sorted array of their first 64 bits, which are
+    effectively unique at any realistic size, behind a Bloom filter so that most
+    files that aren't listed are rejected without a search. The Bloom filter
+    indexes are taken straight from the digest, which is already uniformly
+    distributed. 100,000 digests take under a megabyte.
+
+    If the blocklist records the size of each file, only files of a listed size
+    are hashed. Files larger than max_size are never hashed."""
+
+    def __init__(
+        self,
+        digests: list,
+        sizes: list = None,
+        max_size: int = 64 << 20,
+        bits_per_digest: int = 10,
+        probes: int = 7,
+    ) -> None:
+        prefixes = sorted({int(digest[:16], 16) for digest in digests})
+
+        self.prefixes = array("Q", prefixes)
+        self.sizes = array("Q", sorted(set(sizes))) if sizes else None
+        self.max_size = max_size
+        self.probes = probes
+
+        self.bit_count = max(64, len(prefixes) * bits_per_digest)
+        self.bits = bytearray((self.bit_count + 7) // 8)
+
+        # Same as bit_indexes(), inlined since this runs for every digest.
+        bits = self.bits
+        bit_count = self.bit_count
+
+        for digest in digests:
+            index = int(digest[16:32], 16)
+            step = int(digest[32:48], 16) | 1
+
+            for _ in range(probes):
+                index %= bit_count
+                bits[index >> 3] |= 1 << (index & 7)
+                index += step
+
+    def __str__(self) -> str:
+        s = """
+        Class: Blocklist
+        digests:  {}
+        sizes:    {}
+        max_size: {}
+        bits:     {}
+        """.format(
+            len(self.prefixes),
+            len(self.sizes) if self.sizes is not None else None,
+            self.max_size,
+            self.bit_count,
+        )
+        return s
+
+    def __len__(self) -> int:
+        return len(self.prefixes)
+
+    @classmethod
+    def parse(cls, lines: list, **kwargs) -> "Blocklist":
+        """Build a blocklist from lines of a hex SHA-256 digest, optionally followed
+        by the size of the file in bytes. Blank lines and lines starting with # are
+        skipped. Sizes are only used if every line has one. Raises ValueError."""
+
+        digests = []
+        sizes = []
+
+        for line in lines:
+            fields = line.split()
+
+            if len(fields) == 0 or fields[0].startswith("#"):
+                continue
+
+            digest = fields[0].lower()
+
+            if len(digest) != 64:
+                raise ValueError("Not a SHA-256 digest: '{}'".format(fields[0]))
+
+            int(digest, 16)
+            digests.append(digest)
+
+            if len(fields) > 1 and sizes is not None:
+                sizes.append(int(fields[1]))
+            else:
+                sizes = None
+
+        return cls(digests=digests, sizes=sizes, **kwargs)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "Blocklist":
+        """Parse the blocklist file at path. Raises OSError and ValueError."""
+
+        with open(path, "r", encoding="utf-8") as in_file:
+            return cls.parse(lines=in_file, **kwargs)
+
+    def bit_indexes(self, digest: str):
+        """The Bloom filter bits for a digest, by double hashing with two 64 bit
+        slices of it."""
+
+        first = int(digest[16:32], 16)
+        second = int(digest[32:48], 16) | 1
+
+        for probe in range(self.probes):
+            yield (first + probe * second) % self.bit_count
+
+    def may_match_size(self, size: int) -> bool:
+        """Whether a file of size bytes could be on the blocklist."""
+
+        if size > self.max_size or size == 0:
+            return False
+
+        if self.sizes is None:
+            return True
+
+        index = bisect.bisect_left(self.sizes, size)
+        return index < len(self.sizes) and self.sizes[index] == size
+
+    def __contains__(self, digest: str) -> bool:
+        for index in self.bit_indexes(digest=digest):
+            if not self.bits[index >> 3] & (1 << (index & 7)):
+                return False
+
+        prefix = int(digest[:16], 16)
+        index = bisect.bisect_left(self.prefixes, prefix)
+
+        return index < len(self.prefixes) and self.prefixes[index] == prefix
@@ -0,0 +1,328 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import pickle
+import logging
+
+
+class ScoringJournal:
+    """Persists a scoring engine as a full image, written once, followed by a
+    journal of the results that changed on each save after it.
+
+    The journal starts with the generation of the image it belongs to, so a
+    journal left over from an older image is never replayed on top of a newer
+    one. Every compact_interval records the image is rewritten and the journal
+    started over, which keeps resuming fast.
+
+    Images are written to a temporary file and renamed over the old one, which is
+    kept as a backup along with its journal, so a machine going down mid-write
+    never leaves only a truncated image behind. Writes are flushed to disk every
+    fsync_interval saves, 0 disables flushing. Images are always flushed unless
+    flushing is disabled, since they are written rarely.
+
+    Images start with image_header, which changes whenever the scoring engine
+    changes in a way older images can't be loaded into. Images without it, such
+    as those pickled directly by earlier versions, are refused."""
+
+    image_name = "dark_blue_scoring_engine.dat"
+    journal_name = "dark_blue_scoring_engine.journal"
+    image_header = b"DARKBLUE IMAGE 1\n"
+
+    def __init__(
+        self, directory: str, compact_interval: int = 100, fsync_interval: int = 10
+    ) -> None:
+        self.directory = directory
+        self.image_path = os.path.join(directory, self.image_name)
+        self.journal_path = os.path.join(directory, self.journal_name)
+        self.backup_image_path = self.image_path + ".bak"
+        self.backup_journal_path = self.journal_path + ".bak"
+        self.compact_interval = compact_interval
+        self.fsync_interval = fsync_interval
+
+        # Writes since the journal was last flushed to disk.
+        self.unsynced = 0
+
+        # Records appended since the image was last written.
+        self.records = 0
+
+        # The results as of the last save, or None if the image hasn't been written
+        # by this process yet.
+        self.persisted = None
+
+    def __str__(self) -> str:
+        s = """
+        Class: ScoringJournal
+        directory:        {}
+        compact_interval: {}
+        fsync_interval:   {}
+        records:          {}
+        """.format(
+            self.directory, self.compact_interval, self.fsync_interval, self.records
+        )
+        return s
+
+    def save(self, scoring_engine) -> None:
+        """Append the results that changed since the last save, or write a new image
+        if there is none yet or the journal is due for compaction. Raises OSError
+        and pickle.PickleError."""
+
+        state = self.journal_state(scoring_engine=scoring_engine)
+
+        if self.persisted is None or self.records >= self.compact_interval:
+            self.compact(scoring_engine=scoring_engine)
+        else:
+            record = self.diff(state=state)
+
+            if len(record) == 0:
+                return
+
+            with open(self.journal_path, "ab") as outfile:
+                pickle.dump(record, outfile, pickle.HIGHEST_PROTOCOL)
+
+                if self.sync_due():
+                    self.flush(outfile=outfile)
+
+            self.records += 1
+
+        self.persisted = state
+
+    def compact(self, scoring_engine) -> None:
+        """Write a full image of the scoring engine and start a new, empty journal."""
+
+        logging.debug("Writing scoring engine image to disk.")
+
+        sync = self.fsync_interval > 0
+        scoring_engine.journal_generation += 1
+
+        self.replace(
+            path=self.image_path,
+            backup_path=self.backup_image_path,
+            data=scoring_engine,
+            sync=sync,
+            header=self.image_header,
+        )
+        self.replace(
+            path=self.journal_path,
+            backup_path=self.backup_journal_path,
+            data={"generation": scoring_engine.journal_generation},
+            sync=sync,
+        )
+
+        self.records = 0
+        self.unsynced = 0
+
+    def replace(
+        self, path: str, backup_path: str, data, sync: bool, header: bytes = b""
+    ) -> None:
+        """Pickle data, after header, to a temporary file and rename it over path,
+        keeping the current file at path as the backup."""
+
+        temp_path = path + ".tmp"
+
+        with open(temp_path, "wb") as outfile:
+            outfile.write(header)
+            pickle.dump(data, outfile, pickle.HIGHEST_PROTOCOL)
+
+            if sync:
+                self.flush(outfile=outfile)
+
+        if os.path.exists(path):
+            os.replace(path, backup_path)
+
+        os.replace(temp_path, path)
+
+        if sync:
+            self.sync_directory()
+
+    def sync_due(self) -> bool:
+        """Count a write and return whether it should be flushed to disk."""
+
+        if self.fsync_interval <= 0:
+            return False
+
+        self.unsynced += 1
+
+        if self.unsynced < self.fsync_interval:
+            return False
+
+        self.unsynced = 0
+        return True
+
+    @staticmethod
+    def flush(outfile) -> None:
+        outfile.flush()
+        os.fsync(outfile.fileno())
+
+    def sync_directory(self) -> None:
+        """Flush the renames in the save directory to disk. Windows can't open
+        directories, NTFS journals renames on its own."""
+
+        if os.name != "posix":
+            return
+
+        fd = os.open(self.directory, os.O_RDONLY)
+
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def journal_state(scoring_engine) -> dict:
+        """The parts of the scoring engine that change while scoring."""
+
+        return {
+            "item_results": {
+                entry_id: tuple(results)
+                for entry_id, results in scoring_engine.item_results.items()
+            },
+            "current_score": scoring_engine.current_score,
+            "scoring_engine_messages": tuple(scoring_engine.scoring_engine_messages),
+            "generator_messages": tuple(scoring_engine.generator_messages),
+        }
+
+    def diff(self, state: dict) -> dict:
+        """Build a journal record of what changed between the last save and state.
+        Items whose results were cleared are recorded as None."""
+
+        record = {}
+        item_results = {}
+
+        for entry_id, results in state["item_results"].items():
+            if self.persisted["item_results"].get(entry_id) != results:
+                item_results[entry_id] = results
+
+        for entry_id in self.persisted["item_results"]:
+            if entry_id not in state["item_results"]:
+                item_results[entry_id] = None
+
+        if len(item_results) > 0:
+            record["item_results"] = item_results
+
+        for key in ("current_score", "scoring_engine_messages", "generator_messages"):
+            if state[key] != self.persisted[key]:
+                record[key] = state[key]
+
+        return record
+
+    @classmethod
+    def load(cls, directory: str):
+        """Load the scoring engine image in directory and replay its journal. Falls
+        back to the backup image if the current one can't be loaded. If neither
+        can, raises the error from loading the current image, or from loading the
+        backup if there is no current image."""
+
+        journal = cls(directory=directory)
+        errors = []
+
+        for image_path in (journal.image_path, journal.backup_image_path):
+            try:
+                scoring_engine = journal.read_image(path=image_path)
+            except Exception as e:
+                logging.warning(
+                    "Could not load scoring engine image '{}'. Error: {}".format(
+                        image_path, e
+                    )
+                )
+                errors.append(e)
+                continue
+
+            journal.replay(scoring_engine=scoring_engine)
+            return scoring_engine
+
+        error, backup_error = errors
+
+        if isinstance(error, FileNotFoundError):
+            raise backup_error
+
+        raise error
+
+    def read_image(self, path: str):
+        """Unpickle the scoring engine image at path. Raises ValueError if it wasn't
+        written with the current image_header."""
+
+        with open(path, "rb") as input_file:
+            header = input_file.read(len(self.image_header))
+
+            if header != self.image_header:
+                raise ValueError(
+                    "Incompatible saved image '{}', it was saved by a different"
+                    " version of Dark Blue and can't be resumed.".format(path)
+                )
+
+            return pickle.load(input_file)
+
+    def replay(self, scoring_engine) -> None:
+        """Apply the records of the journal that belongs to the scoring engine's
+        image, if there is one."""
+
+        generation = scoring_engine.journal_generation
+        records = []
+
+        for journal_path in (self.journal_path, self.backup_journal_path):
+            try:
+                records = self.read_records(path=journal_path)
+            except OSError:
+                continue
+
+            if len(records) > 0 and records[0].get("generation") == generation:
+                break
+
+            records = []
+
+        if len(records) == 0:
+            logging.debug("No journal to replay for the scoring engine image.")
+            return
+
+        for record in records[1:]:
+            for entry_id, results in record.get("item_results", {}).items():
+                if results is None:
+                    scoring_engine.item_results.pop(entry_id, None)
+                else:
+                    scoring_engine.item_results[entry_id] = list(results)
+
+            if "current_score" in record:
+                scoring_engine.current_score = record["current_score"]
+
+            for key in ("scoring_engine_messages", "generator_messages"):
+                if key in record:
+                    setattr(scoring_engine, key, list(record[key]))
+
+        logging.debug("Replayed {} journal records.".format(len(records) - 1))
+
+        scoring_engine.tally_results()
+
+    @staticmethod
+    def read_records(path: str) -> list:
+        """Read every complete record in the journal at path. A record cut short by
+        the machine going down mid-write ends the journal."""
+
+        records = []
+
+        with open(path, "rb") as input_file:
+            while True:
+                try:
+                    records.append(pickle.load(input_file))
+                except EOFError:
+                    break
+                except (pickle.UnpicklingError, ValueError, IndexError) as e:
+                    logging.warning(
+                        "Scoring journal ends in an incomplete record."
+                        " Error: {}".format(e)
+                    )
+                    break
+
+        return records
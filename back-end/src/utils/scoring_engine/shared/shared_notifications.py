@@ -0,0 +1,200 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+import time
+import queue
+import logging
+import threading
+from abc import abstractmethod
+
+
+class NotificationQueue:
+    """Collects the items gained and lost during a scoring cycle and displays a
+    single notification summarizing them, at most once every min_interval
+    seconds. Changes made while notifications are rate limited are included in
+    the next summary. The OS specific queues display the notification.
+
+    Summaries are displayed by a background thread, so a slow notification daemon
+    never delays scoring. If max_pending summaries are already waiting to be
+    displayed, they are collapsed into one."""
+
+    def __init__(
+        self, timeout: int = 2, min_interval: float = 10, max_pending: int = 4
+    ) -> None:
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self.max_pending = max_pending
+
+        # Maps scoring IDs to True if the item was last reported as gained, or
+        # False if it was last reported as lost.
+        self.states = {}
+
+        # Maps the scoring IDs of items gained and lost since the last summary to
+        # their points.
+        self.gained = {}
+        self.lost = {}
+
+        self.last_display = 0.0
+
+        # Summaries waiting to be displayed, as (points gained, items gained, points
+        # lost, items lost), and the thread displaying them.
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.dispatcher = None
+
+    def __str__(self) -> str:
+        s = """
+        Class: NotificationQueue
+        timeout:      {}
+        min_interval: {}
+        states:       {}
+        gained:       {}
+        lost:         {}
+        """.format(
+            self.timeout,
+            self.min_interval,
+            len(self.states),
+            len(self.gained),
+            len(self.lost),
+        )
+        return s
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+
+        # Monotonic time doesn't carry over to a new process.
+        state["last_display"] = 0.0
+
+        # Summaries that weren't displayed yet are dropped along with the thread.
+        del state["pending"]
+        del state["dispatcher"]
+
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.pending = queue.Queue(maxsize=self.max_pending)
+        self.dispatcher = None
+
+    def issue_notification(self, item, positive: bool) -> None:
+        """Record that points were awarded or removed for the item. Only changes
+        from what was last reported are included in the summary."""
+
+        if self.states.get(item.entry_id) == positive:
+            return
+
+        self.states[item.entry_id] = positive
+
+        # An item that changes back before the summary is displayed cancels out.
+        if positive:
+            if self.lost.pop(item.entry_id, None) is None:
+                self.gained[item.entry_id] = item.positive_points
+        else:
+            if self.gained.pop(item.entry_id, None) is None:
+                self.lost[item.entry_id] = item.negative_points
+
+    def flush(self) -> None:
+        """Queue a summary of the changes since the last one to be displayed, unless
+        a summary was queued less than min_interval seconds ago."""
+
+        if len(self.gained) == 0 and len(self.lost) == 0:
+            return
+
+        now = time.monotonic()
+
+        if now - self.last_display < self.min_interval:
+            return
+
+        summary = (
+            sum(self.gained.values()),
+            len(self.gained),
+            sum(self.lost.values()),
+            len(self.lost),
+        )
+
+        self.gained = {}
+        self.lost = {}
+        self.last_display = now
+
+        self.post(summary=summary)
+
+    def post(self, summary: tuple) -> None:
+        """Hand a summary to the dispatcher thread without waiting on it."""
+
+        if self.dispatcher is None or not self.dispatcher.is_alive():
+            self.dispatcher = threading.Thread(
+                target=self.dispatch, name="notifications", daemon=True
+            )
+            self.dispatcher.start()
+
+        while True:
+            try:
+                self.pending.put_nowait(summary)
+                return
+            except queue.Full:
+                pass
+
+            # Nothing has been displayed for a while, fold everything waiting into
+            # this summary.
+            logging.debug("Notification queue is full, collapsing summaries.")
+
+            while True:
+                try:
+                    waiting = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+
+                summary = tuple(a + b for a, b in zip(summary, waiting))
+
+    def dispatch(self) -> None:
+        while True:
+            summary = self.pending.get()
+            message = self.summary(*summary)
+
+            logging.debug("Displaying notification: {}".format(message))
+
+            try:
+                self.display_notification(message=message)
+            except Exception as e:
+                logging.error("Could not display notification. Error: {}".format(e))
+
+    @staticmethod
+    def summary(
+        points_gained: int, items_gained: int, points_lost: int, items_lost: int
+    ) -> str:
+        parts = []
+
+        if items_gained > 0:
+            parts.append(
+                "gained {} ({})".format(
+                    plural(points_gained, "point"), plural(items_gained, "item")
+                )
+            )
+
+        if items_lost > 0:
+            parts.append(
+                "lost {} ({})".format(
+                    plural(points_lost, "point"), plural(items_lost, "item")
+                )
+            )
+
+        return "You {}.".format(" and ".join(parts))
+
+    @abstractmethod
+    def display_notification(self, message: str) -> None:
+        ...
+
+
+def plural(count: int, noun: str) -> str:
+    return "{} {}{}".format(count, noun, "" if count == 1 else "s")
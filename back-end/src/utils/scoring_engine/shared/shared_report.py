@@ -0,0 +1,172 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+from html import escape
+from html.parser import HTMLParser
+
+
+class ReportTemplate:
+    """The scoring report template, split once into static chunks around the
+    contents of the elements that change every cycle. Rendering joins the chunks
+    with the new contents of each slot, so the template is never parsed again."""
+
+    # IDs of the elements whose contents are replaced when rendering.
+    slot_ids = (
+        "score",
+        "timestamp",
+        "scoring_messages",
+        "configuration_messages",
+        "generator_messages",
+    )
+
+    def __init__(self, source: str) -> None:
+        # Static chunks of the template, with one slot between each pair.
+        self.chunks = []
+        self.slots = []
+
+        finder = SlotFinder(slot_ids=self.slot_ids)
+        finder.feed(source)
+        finder.close()
+
+        missing = set(self.slot_ids) - set(finder.slots)
+
+        if len(missing) > 0:
+            raise ValueError(
+                "Scoring report template is missing elements: {}".format(
+                    ", ".join(sorted(missing))
+                )
+            )
+
+        # Convert (line, column) positions into offsets into the source. The parser
+        # only counts "\n" as a line break.
+        line_offsets = [0]
+
+        for line in source.split("\n"):
+            line_offsets.append(line_offsets[-1] + len(line) + 1)
+
+        offset = 0
+
+        for slot_id, (start, end) in sorted(
+            finder.slots.items(), key=lambda slot: slot[1][0]
+        ):
+            start = line_offsets[start[0] - 1] + start[1]
+            end = line_offsets[end[0] - 1] + end[1]
+
+            self.chunks.append(source[offset:start])
+            self.slots.append(slot_id)
+            offset = end
+
+        self.chunks.append(source[offset:])
+
+    def __str__(self) -> str:
+        s = """
+        Class: ReportTemplate
+        chunks: {}
+        slots:  {}
+        """.format(
+            len(self.chunks), self.slots
+        )
+        return s
+
+    @classmethod
+    def load(cls, path: str) -> "ReportTemplate":
+        with open(path, "r", encoding="utf-8") as in_file:
+            return cls(source=in_file.read())
+
+    def render(self, values: dict) -> str:
+        """Render the report, values maps each slot ID to its new inner HTML."""
+
+        pieces = [self.chunks[0]]
+
+        for index, slot_id in enumerate(self.slots):
+            pieces.append(values[slot_id])
+            pieces.append(self.chunks[index + 1])
+
+        return "".join(pieces)
+
+    @staticmethod
+    def render_text(text: str) -> str:
+        return escape(text, quote=False)
+
+    @staticmethod
+    def render_list(messages: list, negative: list) -> str:
+        """Render a list of messages as list items, negative holds a flag for each
+        message that marks it in red."""
+
+        items = []
+
+        for message, is_negative in zip(messages, negative):
+            if is_negative:
+                items.append(
+                    '<li style="color: red;">{}</li>'.format(
+                        escape(message, quote=False)
+                    )
+                )
+            else:
+                items.append("<li>{}</li>".format(escape(message, quote=False)))
+
+        return "".join(items)
+
+
+class SlotFinder(HTMLParser):
+    """Finds the (line, column) positions where the contents of each slot element
+    start and end."""
+
+    def __init__(self, slot_ids: tuple) -> None:
+        super().__init__(convert_charrefs=False)
+        self.slot_ids = slot_ids
+
+        # Maps slot IDs to the start and end positions of their contents.
+        self.slots = {}
+
+        # The slot currently being searched for its end tag, its tag name, the
+        # start position of its contents and how deeply the tag is nested.
+        self.current = None
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if self.current is not None:
+            if tag == self.current[1]:
+                self.current[3] += 1
+            return
+
+        element_id = dict(attrs).get("id")
+
+        if element_id in self.slot_ids:
+            text = self.get_starttag_text()
+            line, column = self.getpos()
+
+            # The contents start right after the start tag, which may itself span
+            # several lines.
+            if "\n" in text:
+                start = (line + text.count("\n"), len(text) - text.rfind("\n") - 1)
+            else:
+                start = (line, column + len(text))
+
+            self.current = [element_id, tag, start, 0]
+
+    def handle_startendtag(self, tag: str, attrs: list) -> None:
+        # Self closing tags have no contents to replace.
+        pass
+
+    def handle_endtag(self, tag: str) -> None:
+        if self.current is None or tag != self.current[1]:
+            return
+
+        if self.current[3] > 0:
+            self.current[3] -= 1
+            return
+
+        self.slots[self.current[0]] = (self.current[2], self.getpos())
+        self.current = None
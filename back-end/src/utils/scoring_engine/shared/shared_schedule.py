@@ -0,0 +1,102 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+import time
+import heapq
+import random
+
+
+class ScoringSchedule:
+    """Tracks when each scoring category is next due, in a priority queue ordered
+    by due time. Every time a category is scored it is rescheduled one period
+    later, plus a random jitter so categories with the same period, and engines
+    started at the same time, drift apart instead of all running at once."""
+
+    def __init__(self, window: float = 0.5) -> None:
+        # Categories due within window seconds of each other are scored together,
+        # so jitter doesn't split them into separate cycles.
+        self.window = window
+
+        # Heap of (due time, category name), with due times from time.monotonic().
+        self.queue = []
+
+        # Maps category names to their (period, jitter).
+        self.periods = {}
+
+    def __str__(self) -> str:
+        s = """
+        Class: ScoringSchedule
+        periods: {}
+        """.format(
+            self.periods
+        )
+        return s
+
+    def sync(self, categories: list) -> None:
+        """Update the schedule from the scoring engine's categories. Categories that
+        weren't scheduled yet are due immediately."""
+
+        now = time.monotonic()
+
+        for category in categories:
+            if category.name not in self.periods:
+                heapq.heappush(self.queue, (now, category.name))
+
+            self.periods[category.name] = (category.period, category.jitter)
+
+    def pop_due(self, everything: bool = False, scale: float = 1) -> set:
+        """Return the names of every category that is due, or of every category if
+        everything is set, and schedule their next run scale periods from now."""
+
+        now = time.monotonic()
+        due = set()
+
+        while len(self.queue) > 0 and (
+            everything or self.queue[0][0] <= now + self.window
+        ):
+            _, name = heapq.heappop(self.queue)
+            due.add(name)
+
+        for name in due:
+            period, jitter = self.periods[name]
+            period *= scale
+
+            heapq.heappush(
+                self.queue, (now + period + random.uniform(0, period * jitter), name)
+            )
+
+        return due
+
+    def tighten(self) -> None:
+        """Bring every category due later than one unscaled period from now forward
+        to that time."""
+
+        now = time.monotonic()
+        queue = []
+
+        for due, name in self.queue:
+            period, _ = self.periods[name]
+            queue.append((min(due, now + period), name))
+
+        heapq.heapify(queue)
+        self.queue = queue
+
+    def time_until_next(self) -> float:
+        """Seconds until the next category is due."""
+
+        if len(self.queue) == 0:
+            return 0
+
+        return max(self.queue[0][0] - time.monotonic(), 0)
@@ -17,16 +17,46 @@ import re
 import os
 import sys
 import time
+import queue
+import asyncio
+import pickle
+import hashlib
 import logging
-from shutil import copyfile
-from bs4 import BeautifulSoup
+import threading
+import collections
+from typing import Callable
+from functools import partial
 from datetime import datetime
 from abc import abstractmethod
+from utils.scoring_engine.shared.shared_files import (
+    Blocklist,
+    HashCache,
+    TreeIndex,
+    DirectoryListings,
+)
+from utils.scoring_engine.shared.shared_report import ReportTemplate
+from utils.scoring_engine.shared.shared_journal import ScoringJournal
+from utils.scoring_engine.shared.shared_schedule import ScoringSchedule
 
 
 class ScorableItem:
     """Class that defines an entry on the system that can be scored, contains all
-    points and scoring message information."""
+    points and scoring message information.
+
+    Items use slots, since scenarios can hold thousands of them and every one is
+    kept in memory and pickled with the scoring engine. Subclasses declare their
+    own attributes in __slots__. Names and messages are interned, so the many
+    items sharing a message hold, and pickle, a single copy of it."""
+
+    __slots__ = (
+        "entry_id",
+        "positive_points",
+        "negative_points",
+        "positive_message",
+        "negative_message",
+        "positive_result",
+        "negative_result",
+    )
 
     def __init__(
         self,
@@ -39,8 +69,63 @@ class ScorableItem:
         self.entry_id = entry_id
         self.positive_points = positive_points
         self.negative_points = negative_points
-        self.positive_message = positive_message
-        self.negative_message = negative_message
+        self.positive_message = intern_string(positive_message)
+        self.negative_message = intern_string(negative_message)
+
+        # The last rendered result for awarding and removing points, as the message
+        # it was rendered from and the result. Items with their own messages are
+        # rendered up front.
+        self.positive_result = None
+        self.negative_result = None
+
+        if positive_message:
+            self.scoring_result(positive=True)
+
+        if negative_message:
+            self.scoring_result(positive=False)
+
+    def __getstate__(self) -> dict:
+        return {
+            name: getattr(self, name)
+            for cls in type(self).__mro__
+            for name in getattr(cls, "__slots__", ())
+            if hasattr(self, name)
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        # Items have no __dict__ for the default __setstate__ to update.
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def scoring_result(self, positive: bool, message: str = None) -> tuple:
+        """The (points, scoring message, negative) result recorded when points are
+        awarded or removed for the item. The item's own message is preferred over
+        the given one. Results are only rendered again when the message changes, so
+        every cycle records the same strings."""
+
+        if positive:
+            own_message, cached = self.positive_message, self.positive_result
+        else:
+            own_message, cached = self.negative_message, self.negative_result
+
+        if own_message is not None and (message is None or own_message != ""):
+            message = own_message
+        elif message is None:
+            message = "Unspecified message."
+
+        if cached is not None and cached[0] == message:
+            return cached[1]
+
+        if positive:
+            scoring_message = "[+{}] {}".format(self.positive_points, message)
+            result = (self.positive_points, sys.intern(scoring_message), False)
+            self.positive_result = (message, result)
+        else:
+            scoring_message = "[-{}] {}".format(self.negative_points, message)
+            result = (-self.negative_points, sys.intern(scoring_message), True)
+            self.negative_result = (message, result)
+
+        return result
 
     def __str__(self) -> str:
         s = """
@@ -59,6 +144,111 @@ class ScorableItem:
         return s
 
 
+class ScoringCategory:
+    """A group of ScorableItems of the same type and the function that scores them.
+    Categories are scored, and their messages reported, in the order the scoring
+    engine lists them.
+
+    Each category is scored every period seconds, delayed by up to jitter times
+    the period."""
+
+    def __init__(
+        self,
+        name: str,
+        items: list,
+        score_function: Callable,
+        period: float,
+        jitter: float = 0.1,
+    ) -> None:
+        self.name = name
+        self.items = items
+        self.score_function = score_function
+        self.period = period
+        self.jitter = jitter
+
+    def __str__(self) -> str:
+        s = """
+        Class: ScoringCategory
+        name:           {}
+        items:          {}
+        score_function: {}
+        period:         {}
+        jitter:         {}""".format(
+            self.name,
+            len(self.items),
+            self.score_function.__name__,
+            self.period,
+            self.jitter,
+        )
+        return s
+
+
+def intern_string(value):
+    """Intern value if it is a string, so equal strings share one object."""
+
+    if isinstance(value, str):
+        return sys.intern(value)
+
+    return value
+
+
+# Actions of a TransitionTable rule.
+AWARD = "award"
+REMOVE = "remove"
+
+
+class TransitionTable:
+    """Declares how a type of ScorableItem is scored. Rules map the state observed
+    on the system, followed by the values of the item's attributes, to an action
+    and the scoring message for it. States without a rule score nothing.
+
+    Attribute values are passed through convert before the lookup, so tables with
+    boolean attributes match any truthy value. Messages are formatted with the
+    item."""
+
+    def __init__(
+        self, attributes: tuple, rules: dict, convert: Callable = bool
+    ) -> None:
+        self.attributes = attributes
+        self.rules = rules
+        self.convert = convert
+
+    def __str__(self) -> str:
+        s = """
+        Class: TransitionTable
+        attributes: {}
+        rules:      {}""".format(
+            self.attributes,
+            len(self.rules),
+        )
+        return s
+
+    def score(self, scoring_engine, items: list, observed: list) -> None:
+        """Score each item against the state observed for it, observed holds one
+        state per item in the same order."""
+
+        attributes = self.attributes
+        convert = self.convert
+        rules = self.rules
+
+        for item, state in zip(items, observed):
+            key = (state,) + tuple(
+                convert(getattr(item, attribute)) for attribute in attributes
+            )
+            rule = rules.get(key)
+
+            if rule is None:
+                continue
+
+            action, message = rule
+            message = message.format(item=item)
+
+            if action == AWARD:
+                scoring_engine.award_points(item=item, message=message)
+            else:
+                scoring_engine.remove_points(item=item, message=message)
+
+
 class ScoringEngine:
     def __init__(
         self,
@@ -67,6 +257,10 @@ class ScoringEngine:
         notifications: bool = False,
         debug: bool = False,
         debug_config: bool = False,
+        event_driven: bool = False,
+        fsync_interval: int = 10,
+        collector_threads: int = 4,
+        adaptive: bool = False,
     ) -> None:
         # Arguments:
         self.total_score = total_score
@@ -74,6 +268,10 @@ class ScoringEngine:
         self.notifications = notifications
         self.debug = debug
         self.debug_config = debug_config
+        self.event_driven = event_driven
+        self.fsync_interval = fsync_interval
+        self.collector_threads = collector_threads
+        self.adaptive = adaptive
 
         # Flags:
         self.run = True
@@ -90,28 +288,131 @@ class ScoringEngine:
         self.challenge_questions = []
         self.scoring_engine_messages = []
 
+        # Whether each scoring message removed points, for the scoring report.
+        self.negative_messages = []
+
+        # Maps the scoring ID of each item to the (points, message, negative) results
+        # it was awarded or removed. The current score and scoring messages are tallied
+        # from this so single items can be rescored without a full cycle.
+        self.item_results = {}
+
+        # Maps category names to the fingerprint of the state they were last
+        # scored against. Categories whose fingerprint hasn't changed keep their
+        # previous results instead of being rescored.
+        self.category_fingerprints = {}
+
+        # Directory listings of the watched files, kept between cycles.
+        self.directory_listings = DirectoryListings()
+
+        # Items matching files by pattern, and the index of each tree they search
+        # keyed by FilePattern.index_key.
+        self.file_patterns = []
+        self.tree_indexes = {}
+
+        # Items checking file contents against a digest, and the digests of the
+        # files they check, kept between cycles but not saved with the image.
+        self.file_hashes = []
+        self.hash_cache = HashCache()
+
+        # Items scanning trees for files on a blocklist, sharing the tree indexes
+        # and digests above.
+        self.blocklist_scans = []
+
+        # Seconds each collector may take before its category keeps its previous
+        # results for the cycle, overridden per category name by collector_timeouts.
+        self.collector_timeout = 20
+        self.collector_timeouts = {}
+
+        # Names of the collectors currently running, which may include collectors
+        # abandoned by an earlier cycle that haven't returned yet.
+        self.busy_collectors = set()
+
+        # Cheap categories are scored every fast_period seconds and expensive ones
+        # every slow_period seconds, the rest every scoring_interval seconds.
+        self.fast_period = min(5, scoring_interval)
+        self.slow_period = max(60, scoring_interval)
+        self.schedule = ScoringSchedule()
+
+        # In adaptive mode, periods are multiplied by backoff, which doubles for
+        # every full scoring interval the results don't change up to backoff_limit,
+        # and drops back to 1 as soon as they do. The interval is counted from the
+        # monotonic time in backoff_since.
+        self.backoff = 1
+        self.backoff_limit = 8
+        self.backoff_since = None
+
         # Persistent generator list.
         self.generator_messages = []
 
+        # Scoring report template, loaded on the first report.
+        self.report_template = None
+
+        # Digest of the last published results. The engine is only saved and the
+        # report only rewritten when the results change, apart from refreshing the
+        # report's timestamp every heartbeat_interval seconds.
+        self.published_digest = None
+        self.report_time = 0.0
+        self.heartbeat_interval = 300
+
+        # Journal the engine is saved to, opened on the first save. The generation
+        # identifies the last full image written, so its journal can be matched.
+        self.journal = None
+        self.journal_generation = 0
+
     def __str__(self) -> str:
         s = """
         Class: ScoringEngine OS: Generic
-        total_score:      {}
-        scoring_interval: {}
-        notifications:    {}
-        debug:            {}
-        debug_config:     {}
+        total_score:       {}
+        scoring_interval:  {}
+        notifications:     {}
+        debug:             {}
+        debug_config:      {}
+        event_driven:      {}
+        fsync_interval:    {}
+        collector_threads: {}
+        adaptive:          {}
         """.format(
             self.total_score,
             self.scoring_interval,
             self.notifications,
             self.debug,
             self.debug_config,
+            self.event_driven,
+            self.fsync_interval,
+            self.collector_threads,
+            self.adaptive,
         )
         return s
 
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+
+        # Fingerprints describe the running system, so every category is rescored
+        # once after the scoring engine is resumed.
+        state["category_fingerprints"] = {}
+        state["busy_collectors"] = set()
+        state["tree_indexes"] = {}
+
+        # Digests are read again as items need them, the saved image doesn't grow
+        # with every file a blocklist scan hashed.
+        state["hash_cache"] = HashCache(
+            chunk_size=self.hash_cache.chunk_size,
+            racy_window=self.hash_cache.racy_window,
+        )
+
+        # Due times are only meaningful to the running process.
+        state["schedule"] = ScoringSchedule()
+        state["backoff_since"] = None
+
+        # Publish once after resuming, so the report reflects the resumed engine.
+        state["published_digest"] = None
+        state["journal"] = None
+
+        return state
+
     def start(self):
-        """Starts the scoring engine, which will score on the given scoring interval."""
+        """Starts the scoring engine, which will score each category whenever it is
+        due according to its period."""
 
         print("Starting scoring engine...")
 
@@ -119,41 +420,260 @@ class ScoringEngine:
             self.debug_configuration()
 
         while self.run:
-            self.score()
+            self.score(categories=self.due_categories())
             print("Current score: {}".format(self.current_score))
-            logging.debug("Sleeping...")
-            time.sleep(self.scoring_interval)
+            self.wait(timeout=self.schedule.time_until_next())
+
+    def due_categories(self, everything: bool = False) -> set:
+        """Names of the categories that are due to be scored, or of every category
+        if everything is set."""
+
+        self.schedule.sync(categories=self.scoring_categories())
+        return self.schedule.pop_due(everything=everything, scale=self.backoff)
+
+    def score(self, categories: set = None) -> None:
+        """Score the named categories, or every category if None, reusing the
+        previous results of categories whose input hasn't changed since they were
+        last scored."""
+
+        print("Scoring...")
+
+        self.configuration_messages = []
+
+        # Gather everything the categories need once, up front.
+        snapshot = self.collect_snapshot(categories=categories)
+        self.score_snapshot(snapshot=snapshot, categories=categories)
+
+    def score_snapshot(
+        self, snapshot: "SystemSnapshot", categories: set = None
+    ) -> None:
+        """Score the named categories, or every category if None, against the given
+        snapshot and publish the results. Other categories keep their results."""
+
+        for category in self.scoring_categories():
+            if categories is not None and category.name not in categories:
+                continue
+
+            if category.name in snapshot.timed_out:
+                # Keep the results from the last time the category was collected.
+                self.register_config_message(
+                    message=self.collector_warning(name=category.name)
+                )
+                continue
+
+            # The collector finished in time, it is no longer reported as slow.
+            self.clear_config_message(
+                message=self.collector_warning(name=category.name)
+            )
+
+            fingerprint = snapshot.fingerprints.get(category.name)
+
+            if (
+                fingerprint is not None
+                and fingerprint == self.category_fingerprints.get(category.name)
+            ):
+                logging.debug("Category '{}' is unchanged.".format(category.name))
+                continue
+
+            self.clear_results(items=category.items)
+            category.score_function(self, snapshot)
+            self.category_fingerprints[category.name] = fingerprint
+
+        self.tally_results()
+        self.publish_results()
+
+    def collector_budget(self, name: str) -> float:
+        """Seconds the collector for the named category may take."""
+        return self.collector_timeouts.get(name, self.collector_timeout)
+
+    def collector_warning(self, name: str) -> str:
+        """The configuration message shown while the collector for the named
+        category goes over its budget."""
+
+        return (
+            "Collecting '{}' took longer than {} seconds, its results from the last"
+            " complete cycle are shown.".format(name, self.collector_budget(name))
+        )
+
+    def wait(self, timeout: float) -> None:
+        """Wait until the next full scoring cycle. Overridden by engines that can
+        rescore items as changes happen in the meantime."""
+        logging.debug("Sleeping...")
+        time.sleep(timeout)
+
+    def clear_results(self, items: list) -> None:
+        """Forget previous results for the given items before they are rescored."""
+        for item in items:
+            self.item_results.pop(item.entry_id, None)
+
+    def tally_results(self) -> None:
+        """Rebuild the current score and scoring messages from the per-item results,
+        in category order."""
+
+        current_score = 0
+        scoring_messages = []
+        negative_messages = []
+
+        for category in self.scoring_categories():
+            item: ScorableItem
+            for item in category.items:
+                for points, message, negative in self.item_results.get(
+                    item.entry_id, ()
+                ):
+                    current_score += points
+                    scoring_messages.append(message)
+                    negative_messages.append(negative)
+
+        self.current_score = current_score
+        self.scoring_messages = scoring_messages
+        self.negative_messages = negative_messages
+
+    def publish_results(self) -> None:
+        """Save the scoring engine and write the scoring report, if the results have
+        changed since they were last published. Otherwise the report is only
+        rewritten once the heartbeat interval has passed, to refresh its timestamp."""
+
+        # Changes from this cycle are summarized in a single notification.
+        if self.notifications:
+            self.notification_queue.flush()
+
+        if not self.save_enabled:
+            msg = """An error occurred saving scoring engine to disk.
+             Saving has been disabled and the scoring
+             engine CANNOT be resumed if terminated or the virtual machine
+             is powered down or restarted."""
+            self.register_config_message(message=msg)
+
+        digest = self.results_digest()
+
+        if digest == self.published_digest:
+            self.back_off()
+
+            if time.time() - self.report_time >= self.heartbeat_interval:
+                logging.debug("Results unchanged, refreshing report timestamp.")
+                self.generate_report()
+            else:
+                logging.debug("Results unchanged, skipping save and report.")
+            return
+
+        self.published_digest = digest
+        self.reset_backoff()
+
+        if self.save_enabled:
+            self.save()
+
+        self.generate_report()
+
+    def save(self, retry=False):
+        """Save the scoring engine to disk. Only the first save writes the whole
+        engine, later saves append the results that changed to its journal."""
+        logging.debug("Attempting to save scoring engine to disk.")
+
+        if self.journal is None:
+            self.journal = ScoringJournal(
+                directory=self.dark_blue_save_path, fsync_interval=self.fsync_interval
+            )
+
+        try:
+            self.journal.save(scoring_engine=self)
+        except pickle.PickleError:
+            logging.critical("PickleError occurred when saving scoring engine to disk.")
+        except FileNotFoundError:
+
+            if retry:
+                logging.fatal(
+                    "Could not locate directory {} during retried saving"
+                    " attempt. Saving will be disabled.".format(
+                        self.dark_blue_save_path
+                    )
+                )
+                self.save_enabled = False
+                return
+
+            logging.warning("Could not locate Dark Blue save directory.")
+            logging.debug(
+                "Attempting to create path: {}".format(self.dark_blue_save_path)
+            )
+            os.makedirs(self.dark_blue_save_path)
+            logging.debug("Attempting to retry saving...")
+            self.save(retry=True)
+        except Exception:
+            if retry:
+                logging.fatal(
+                    "Could not save scoring engine after retry."
+                    " Saving will be disabled."
+                )
+                self.save_enabled = False
+                return
+            else:
+                logging.fatal(
+                    "An unknown exception has occurred while saving scoring"
+                    " engine to disk. This error was not caught and"
+                    " saving will now be disabled."
+                )
+                self.save_enabled = False
+                return
+
+    def back_off(self) -> None:
+        """Score less often, called when a cycle didn't change the results. Cycles
+        of a single category don't count on their own, periods are only doubled
+        once a full scoring interval has passed without any change."""
+
+        if not self.adaptive:
+            return
+
+        now = time.monotonic()
+
+        if self.backoff_since is None:
+            self.backoff_since = now
+        elif now - self.backoff_since >= self.scoring_interval:
+            self.backoff = min(self.backoff * 2, self.backoff_limit)
+            self.backoff_since = now
+
+    def reset_backoff(self) -> None:
+        """Return to the normal periods, called when something changed."""
+
+        self.backoff_since = time.monotonic()
+
+        if self.backoff != 1:
+            logging.debug("Change detected, returning to normal scoring periods.")
+            self.backoff = 1
+            self.schedule.tighten()
+
+    def results_digest(self) -> str:
+        """Hash everything shown in the scoring report, except for the timestamp."""
+
+        digest = hashlib.sha256(str(self.current_score).encode("utf-8"))
+
+        for messages in (
+            self.scoring_messages,
+            self.scoring_engine_messages,
+            self.generator_messages,
+        ):
+            # Separate the lists, and each message, so moving a message from one
+            # list to the next changes the digest.
+            digest.update(b"\1")
+
+            for message in messages:
+                digest.update(b"\0")
+                digest.update(message.encode("utf-8"))
+
+        return digest.hexdigest()
 
     def award_points(self, item: ScorableItem, message=None):
         """Award points for the given ScorableItem, add scoring message and
         queue a notification."""
 
-        # Want to determine if we should use the message
-        # from the scoring or from the object itself.
-        # Often they may both be present, and might be identical,
-        # in this case item.positive_message is preferred.
-        if (
-            (message is None and item.positive_message is not None)
-            or (message is not None and item.positive_message is not None)
-            and item.positive_message != ""
-        ):
-            scoring_message = "[+{}] {}".format(
-                item.positive_points, item.positive_message
-            )
-        elif message is not None and (
-            item.positive_message is None or item.positive_message == ""
-        ):
-            scoring_message = "[+{}] {}".format(item.positive_points, message)
-        else:  # Failed case, no messages were given.
-            scoring_message = "[+{}] Unspecified message.".format(item.positive_points)
+        # The item's own message is preferred over the one from the scoring
+        # function, see ScorableItem.scoring_result().
+        result = item.scoring_result(positive=True, message=message)
 
         # Add some debugging output as well. This greatly reduces the number
         # of debugging statements inline.
-        logging.debug("AWARD POINTS: {}".format(scoring_message))
+        logging.debug("AWARD POINTS: {}".format(result[1]))
 
-        # Set new score.
-        self.current_score += item.positive_points
-        self.scoring_messages.append(scoring_message)
+        # Record the result, the score itself is tallied at the end of the cycle.
+        self.item_results.setdefault(item.entry_id, []).append(result)
 
         # Queue a notification. This method is overwritten by the OS specific engine.
         self.queue_notification(item=item, positive=True)
@@ -163,35 +683,29 @@ class ScoringEngine:
         queue a notification."""
 
         # Same as award points, item.negative_message is preferred.
-        if (
-            (message is None and item.negative_message is not None)
-            or (message is not None and item.negative_message is not None)
-            and item.negative_message != ""
-        ):
-            scoring_message = "[-{}] {}".format(
-                item.negative_points, item.negative_message
-            )
-        elif message is not None and (
-            item.negative_message is None or item.negative_message == ""
-        ):
-            scoring_message = "[-{}] {}".format(item.negative_points, message)
-        else:  # No messages given.
-            scoring_message = "[-{}] Unspecified message.".format(item.negative_points)
+        result = item.scoring_result(positive=False, message=message)
 
-        logging.debug("REMOVE POINTS: {}".format(scoring_message))
+        logging.debug("REMOVE POINTS: {}".format(result[1]))
 
-        # Set score.
-        self.current_score -= item.negative_points
-        self.scoring_messages.append(scoring_message)
+        self.item_results.setdefault(item.entry_id, []).append(result)
 
         self.queue_notification(item=item, positive=False)
 
     def register_config_message(self, message: str):
         """Adds a message for the configuration list in the scoring report,
-        used for scoring engine errors."""
-        self.scoring_engine_messages.append(message)
+        used for scoring engine errors. Errors that repeat every cycle are only
+        listed once."""
+        if message not in self.scoring_engine_messages:
+            self.scoring_engine_messages.append(message)
         logging.critical(message)
 
+    def clear_config_message(self, message: str):
+        """Removes a message from the configuration list once the error it reported
+        no longer occurs."""
+        if message in self.scoring_engine_messages:
+            self.scoring_engine_messages.remove(message)
+            logging.info("Resolved: {}".format(message))
+
     def register_generator_message(self, message: str):
         """Adds a message to the generator error list, which persists through each score.
         Used for errors that occurred during image generation."""
@@ -203,125 +717,528 @@ class ScoringEngine:
         self.scoring_id += 1
         return self.scoring_id
 
-    def generate_report(
-        self, retry: bool = False, dev: bool = False, dev_path: str = None
-    ):
-        """Edit the scoring report HTML file on the desktop to reflect
+    def generate_report(self, dev: bool = False, dev_path: str = None):
+        """Render the scoring report HTML file on the desktop to reflect
         current score and scoring messages."""
 
         logging.debug("Attempting to generate scoring report...")
 
+        # The template is only loaded and split once, then reused every cycle.
+        if self.report_template is None:
+            self.load_report_template(dev=dev, dev_path=dev_path)
+
+            if self.report_template is None:
+                return
+
+        now = datetime.now()
+        current_time = now.strftime("%H:%M:%S")
+        template = self.report_template
+
+        report = template.render(
+            values={
+                "score": template.render_text(
+                    "Score: {}/{}".format(self.current_score, self.total_score)
+                ),
+                "timestamp": template.render_text(
+                    "Last scored: {}".format(current_time)
+                ),
+                "scoring_messages": template.render_list(
+                    messages=self.scoring_messages,
+                    negative=self.negative_messages,
+                ),
+                "configuration_messages": template.render_list(
+                    messages=self.scoring_engine_messages,
+                    negative=[True] * len(self.scoring_engine_messages),
+                ),
+                "generator_messages": template.render_list(
+                    messages=self.generator_messages,
+                    negative=[True] * len(self.generator_messages),
+                ),
+            }
+        )
+
+        try:
+            with open(self.scoring_report_path, "w", encoding="utf-8") as outfile:
+                outfile.write(report)
+
+            self.report_time = time.time()
+        except IOError as e:
+            logging.critical("Could not write scoring report. Error: {}".format(e))
+
+    def load_report_template(self, dev: bool = False, dev_path: str = None):
+        # Separate pathway used for dev, because sys._MEIPASS won't be
+        # usable since it's not a compiled binary.
+        if dev:
+            if dev_path is None:
+                logging.critical(
+                    "No filepath was supplied to the template file in dev mode."
+                )
+                return
+
+            file_path = dev_path
+        else:
+            try:
+                base_path = sys._MEIPASS
+            except Exception:
+                base_path = os.path.abspath(".")
+            file_path = os.path.join(base_path, "scoringreport_template.html")
+
         try:
-            # Attempt to open the scoring report file.
-            outfile = open(self.scoring_report_path, "rb")
-
-            # Get the contents of the file.
-            soup = BeautifulSoup(outfile, features="html.parser")
-            encoding = (
-                soup.original_encoding or "utf-8"
-            )  # Save the file encoding in case it's needed.
-
-            # Look for the scoring messages, then reset them.
-            scoring_list = soup.find(id="scoring_messages")
-            scoring_list.string = ""
-
-            # Find the actual tag that gives the score and set the current score.
-            scoring_tag = soup.find(id="score")
-            scoring_tag.string = "Score: {}/{}".format(
-                self.current_score, self.total_score
+            self.report_template = ReportTemplate.load(path=file_path)
+        except (IOError, ValueError) as e:
+            logging.critical(
+                "Could not load scoring report template at '{}'. Error: {}".format(
+                    file_path, e
+                )
             )
 
-            # Find scoring engine configuration messages and reset them.
-            configuration_list = soup.find(id="configuration_messages")
-            configuration_list.string = ""
+    @abstractmethod
+    def collect_snapshot(self, categories: set = None) -> "SystemSnapshot":
+        ...
+
+    @abstractmethod
+    def scoring_categories(self) -> list:
+        ...
+
+    @abstractmethod
+    def queue_notification(self, item: ScorableItem, positive: bool):
+        ...
 
-            generator_list = soup.find(id="generator_messages")
-            generator_list.string = ""
+    @abstractmethod
+    def debug_configuration(self):
+        ...
 
-            # Populate the list of scoring messages.
-            for message in self.scoring_messages:
-                tag = soup.new_tag("li")
-                tag.string = message
 
-                if message[1] == "-":
-                    tag["style"] = "color: red;"
+class SystemSnapshot:
+    """Observed system state, collected once per scoring cycle.
 
-                scoring_list.append(tag)
+    Scoring functions read from the snapshot instead of querying the system
+    themselves, so every category sees the same view of the system and a
+    snapshot can be built by hand to replay a cycle in a unit test."""
 
-            # Populate the list of scoring engine errors.
-            for message in self.scoring_engine_messages:
-                tag = soup.new_tag("li")
-                tag.string = message
-                tag["style"] = "color: red;"
-                configuration_list.append(tag)
+    def __init__(self, files: dict = None, question_responses: dict = None) -> None:
+        # Maps a filepath to its FileState, or None if it doesn't exist.
+        self.files = files if files is not None else {}
 
-            for message in self.generator_messages:
-                tag = soup.new_tag("li")
-                tag.string = message
-                tag["style"] = "color: red;"
-                generator_list.append(tag)
+        # Maps a challenge question filepath to its lowercased contents, or None
+        # if the file could not be read.
+        self.question_responses = (
+            question_responses if question_responses is not None else {}
+        )
 
-            # Update the scoring timestamp.
-            timestamp = soup.find(id="timestamp")
-            now = datetime.now()
-            current_time = now.strftime("%H:%M:%S")
-            timestamp.string = "Last scored: {}".format(current_time)
+        # Maps the index_key of each FilePattern to the paths of the files matching
+        # it, or None if its root could not be read.
+        self.file_patterns = {}
 
-            # Write the new contents to the file after removing them.
-            # outfile.truncate(0) -- Caused an issue where the scoring report
-            # would grow in size exponentially with garbage characters at the front.
-            outfile.close()
-            outfile = open(self.scoring_report_path, "wb")
+        # Maps filepaths checked by FileHash items to the hex SHA-256 digest of their
+        # contents, or None if they don't exist. Unreadable files are left out.
+        self.file_hashes = {}
 
-            outfile.write(soup.encode(encoding=encoding))
-            outfile.close()
+        # Maps the scoring ID of each BlocklistScan to the paths of the blocklisted
+        # files it found, or None if none of its roots could be read.
+        self.blocklist_scans = {}
 
-        except IOError:  # Something went wrong.
-            if retry:
-                # If we still have problems after a retry, something is wrong.
-                logging.critical("Could not open scoring report after retry.")
+        # Maps category names to a cheap fingerprint of the state collected for
+        # them. Categories without a fingerprint are always rescored.
+        self.fingerprints = {}
+
+        # Names of the categories whose collectors didn't finish in time. These
+        # keep their previous results instead of being scored.
+        self.timed_out = set()
+
+    def __str__(self) -> str:
+        s = """
+        Class: SystemSnapshot
+        files:              {}
+        question_responses: {}""".format(
+            len(self.files), len(self.question_responses)
+        )
+        return s
+
+    def collect(
+        self, scoring_engine: ScoringEngine, categories: set = None
+    ) -> "SystemSnapshot":
+        """Collect all state needed to score the given scoring engine in one pass.
+        Collectors are independent and each fill in their own fields, so they are
+        run concurrently, up to scoring_engine.collector_threads at a time.
+
+        Each collector has to finish within its time budget, counted from when it
+        starts running. Collectors that don't are abandoned, their categories keep
+        their previous results and the next collector starts in their place.
+        Collectors run on daemon threads, so an abandoned one never keeps the
+        process from exiting. Only the named categories are collected, unless
+        categories is None."""
+
+        waiting = collections.deque()
+
+        for name, collector in self.collectors(scoring_engine=scoring_engine):
+            if categories is not None and name not in categories:
+                continue
+
+            if name in scoring_engine.busy_collectors:
+                # Still stuck from an earlier cycle, don't start another one.
+                self.timed_out.add(name)
+                continue
+
+            waiting.append((name, collector))
+
+        # Collectors put their name and any exception they raised here once they
+        # return.
+        finished = queue.Queue()
+
+        # Maps the names of running collectors to their deadlines.
+        deadlines = {}
+
+        limit = max(1, scoring_engine.collector_threads)
+
+        while len(waiting) > 0 or len(deadlines) > 0:
+            while len(waiting) > 0 and len(deadlines) < limit:
+                name, collector = waiting.popleft()
+                budget = scoring_engine.collector_budget(name)
+                deadlines[name] = time.monotonic() + budget
+
+                threading.Thread(
+                    target=self.run_reporting,
+                    kwargs={
+                        "busy": scoring_engine.busy_collectors,
+                        "name": name,
+                        "collector": collector,
+                        "report": finished.put,
+                    },
+                    name="collector-{}".format(name),
+                    daemon=True,
+                ).start()
+
+            try:
+                name, error = finished.get(
+                    timeout=max(min(deadlines.values()) - time.monotonic(), 0)
+                )
+            except queue.Empty:
+                now = time.monotonic()
+
+                for name, deadline in list(deadlines.items()):
+                    if deadline <= now:
+                        del deadlines[name]
+                        self.timed_out.add(name)
+
+                continue
+
+            # A collector abandoned earlier in this cycle may still return.
+            if deadlines.pop(name, None) is None:
+                continue
+
+            # Raise anything a collector didn't handle, as if it ran on its own.
+            if error is not None:
+                raise error
+
+        return self
+
+    async def collect_async(
+        self, scoring_engine: ScoringEngine, categories: set = None
+    ) -> "SystemSnapshot":
+        """Collect all state needed to score the given scoring engine as asyncio
+        tasks, with the same time budgets and categories as collect()."""
+
+        collectors = [
+            (name, collector)
+            for name, collector in self.async_collectors(scoring_engine=scoring_engine)
+            if categories is None or name in categories
+        ]
+
+        finished = await asyncio.gather(
+            *(
+                self.run_collector(
+                    scoring_engine=scoring_engine, name=name, collector=collector
+                )
+                for name, collector in collectors
+            )
+        )
+
+        for (name, _), done in zip(collectors, finished):
+            if not done:
+                self.timed_out.add(name)
+
+        return self
+
+    async def run_collector(
+        self, scoring_engine: ScoringEngine, name: str, collector
+    ) -> bool:
+        """Run a collector on the event loop if it is a coroutine function, or on a
+        daemon thread otherwise, as collect() does. Returns False if it went over
+        its time budget."""
+
+        if asyncio.iscoroutinefunction(collector):
+            coroutine = collector()
+        elif name in scoring_engine.busy_collectors:
+            return False
+        else:
+            loop = asyncio.get_running_loop()
+            coroutine = loop.create_future()
+
+            # Not asyncio.to_thread(), asyncio.run() joins the default executor's
+            # threads and would wait for an abandoned collector.
+            threading.Thread(
+                target=self.run_reporting,
+                kwargs={
+                    "busy": scoring_engine.busy_collectors,
+                    "name": name,
+                    "collector": collector,
+                    "report": partial(
+                        self.report_threadsafe, loop=loop, future=coroutine
+                    ),
+                },
+                name="collector-{}".format(name),
+                daemon=True,
+            ).start()
+
+        try:
+            await asyncio.wait_for(
+                coroutine, timeout=scoring_engine.collector_budget(name)
+            )
+        except asyncio.TimeoutError:
+            return False
+
+        return True
+
+    @staticmethod
+    def run_guarded(busy: set, name: str, collector) -> None:
+        """Run a collector, marking it as busy until it returns."""
+
+        busy.add(name)
+
+        try:
+            collector()
+        finally:
+            busy.discard(name)
+
+    @classmethod
+    def run_reporting(cls, busy: set, name: str, collector, report: Callable) -> None:
+        """Run a collector, then call report with its name and the exception it
+        raised, if any."""
+
+        try:
+            cls.run_guarded(busy=busy, name=name, collector=collector)
+        except Exception as e:
+            report((name, e))
+        else:
+            report((name, None))
+
+    @staticmethod
+    def report_threadsafe(
+        result: tuple, loop: asyncio.AbstractEventLoop, future: asyncio.Future
+    ) -> None:
+        """Settle future with the result of a collector run on another thread."""
+
+        def settle() -> None:
+            # The collector was abandoned if the wait for it was cancelled.
+            if future.done():
                 return
 
-            # Separate pathway used for dev, because sys._MEIPASS won't be
-            # usable since it's not a compiled binary.
-            if dev:
-                if dev_path is not None:
-                    # Try to find and copy the template file, then retry.
-                    copyfile(dev_path, self.scoring_report_path)
-                    self.generate_report(retry=True, dev=dev, dev_path=dev_path)
-                else:
-                    logging.critical(
-                        "No filepath was supplied to the template file in dev mode."
-                    )
-                    return
+            _, error = result
+
+            if error is not None:
+                future.set_exception(error)
             else:
-                # Try to find and copy the template file, then retry.
-                try:
-                    base_path = sys._MEIPASS
-                except Exception:
-                    base_path = os.path.abspath(".")
-                file_path = os.path.join(base_path, "scoringreport_template.html")
-                copyfile(file_path, self.scoring_report_path)
-                self.generate_report(retry=True)
+                future.set_result(None)
 
-    @abstractmethod
-    def score(self):
-        ...
+        try:
+            loop.call_soon_threadsafe(settle)
+        except RuntimeError:
+            # The event loop was closed while the collector ran.
+            pass
+
+    def async_collectors(self, scoring_engine: ScoringEngine) -> list:
+        """The collectors used by collect_async(), overridden by snapshots with
+        collectors that can run as coroutines instead of on a thread."""
+        return self.collectors(scoring_engine=scoring_engine)
+
+    def collectors(self, scoring_engine: ScoringEngine) -> list:
+        """The (category name, collector) pairs needed to score the given scoring
+        engine, overridden by the OS specific snapshots to add their own."""
+
+        return [
+            (
+                "files",
+                partial(
+                    self.collect_files,
+                    paths=[file.filepath for file in scoring_engine.files],
+                    listings=scoring_engine.directory_listings,
+                ),
+            ),
+            (
+                "file_patterns",
+                partial(
+                    self.collect_file_patterns,
+                    items=scoring_engine.file_patterns,
+                    indexes=scoring_engine.tree_indexes,
+                    threads=scoring_engine.collector_threads,
+                ),
+            ),
+            (
+                "file_hashes",
+                partial(
+                    self.collect_file_hashes,
+                    paths=[item.filepath for item in scoring_engine.file_hashes],
+                    cache=scoring_engine.hash_cache,
+                ),
+            ),
+            (
+                "blocklist_scans",
+                partial(
+                    self.collect_blocklist_scans,
+                    items=scoring_engine.blocklist_scans,
+                    indexes=scoring_engine.tree_indexes,
+                    cache=scoring_engine.hash_cache,
+                    threads=scoring_engine.collector_threads,
+                ),
+            ),
+            (
+                "challenge_questions",
+                partial(
+                    self.collect_challenge_questions,
+                    paths=[
+                        question.filepath
+                        for question in scoring_engine.challenge_questions
+                    ],
+                ),
+            ),
+        ]
+
+    def collect_files(self, paths: list, listings: DirectoryListings) -> None:
+        self.files.update(listings.stat_paths(paths=paths))
+
+        self.fingerprints["files"] = self.files
+
+    def collect_file_patterns(self, items: list, indexes: dict, threads: int) -> None:
+        """Walk the tree searched by each item, through the index kept for it
+        between cycles."""
+
+        item: FilePattern
+        for item in items:
+            key = item.index_key
+
+            # Items searching the same tree for the same files share a walk.
+            if key in self.file_patterns:
+                continue
+
+            index = indexes.get(key)
+
+            if index is None:
+                index = TreeIndex(
+                    root=item.root,
+                    patterns=item.patterns,
+                    exclude=item.exclude,
+                    threads=threads,
+                )
+                indexes[key] = index
 
-    @abstractmethod
-    def queue_notification(self, item: ScorableItem, positive: bool):
-        ...
+            self.file_patterns[key] = index.walk()
 
-    @abstractmethod
-    def debug_configuration(self):
-        ...
+            if self.file_patterns[key] is None:
+                logging.warning(
+                    "Could not search '{}' for files matching {}.".format(
+                        item.root, ", ".join(item.patterns)
+                    )
+                )
 
-    @abstractmethod
-    def save(self):
-        ...
+        self.fingerprints["file_patterns"] = self.file_patterns
+
+    def collect_file_hashes(self, paths: list, cache: HashCache) -> None:
+        for path in paths:
+            if path in self.file_hashes:
+                continue
+
+            try:
+                self.file_hashes[path] = cache.digest(path=path)
+            except OSError as e:
+                logging.warning("Could not read '{}'. Error: {}".format(path, e))
+
+        self.fingerprints["file_hashes"] = self.file_hashes
+
+    def collect_blocklist_scans(
+        self, items: list, indexes: dict, cache: HashCache, threads: int
+    ) -> None:
+        """Hash every file under the roots of each item that could be on its
+        blocklist by size, through the digests cached between cycles."""
+
+        item: BlocklistScan
+        for item in items:
+            found = None
+
+            for root in item.roots:
+                # Every file in the tree is a candidate.
+                key = (root, ("*",), ())
+                index = indexes.get(key)
+
+                if index is None:
+                    index = TreeIndex(root=root, patterns=("*",), threads=threads)
+                    indexes[key] = index
+
+                paths = index.walk()
+
+                # Directories on the PATH often don't exist, so this isn't a warning.
+                if paths is None:
+                    logging.debug(
+                        "Could not scan '{}' for blocklisted files.".format(root)
+                    )
+                    continue
+
+                if found is None:
+                    found = set()
+
+                for path in paths:
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+
+                    if not item.blocklist.may_match_size(stat.st_size):
+                        continue
+
+                    try:
+                        digest = cache.digest(path=path, stat=stat)
+                    except OSError:
+                        continue
+
+                    if digest is not None and digest in item.blocklist:
+                        found.add(path)
+
+            self.blocklist_scans[item.entry_id] = (
+                tuple(sorted(found)) if found is not None else None
+            )
+
+        self.fingerprints["blocklist_scans"] = self.blocklist_scans
+
+    def collect_challenge_questions(self, paths: list) -> None:
+        for path in paths:
+            if path in self.question_responses:
+                continue
+
+            response = None
+
+            try:
+                with open(path, "r") as in_file:
+                    response = in_file.read().strip().lower()
+            except FileNotFoundError:
+                logging.warning("Could not find file at {}".format(path))
+            except IOError:
+                logging.warning("IOError occurred when reading file at {}".format(path))
+            except Exception as e:
+                logging.warning(
+                    "Unspecified exception occurred when reading file at {}".format(
+                        path
+                    )
+                )
+                logging.warning(e)
+
+            self.question_responses[path] = response
+
+        self.fingerprints["challenge_questions"] = self.question_responses
 
 
 class ChallengeQuestion(ScorableItem):
+    __slots__ = ("name", "filepath", "answer")
+
     def __init__(
         self,
         name: str,
@@ -331,8 +1248,8 @@ class ChallengeQuestion(ScorableItem):
         positive_points: int,
         positive_message: str = None,
     ):
-        self.name = name
-        self.filepath = filepath
+        self.name = intern_string(name)
+        self.filepath = intern_string(filepath)
         self.answer = answer
 
         ScorableItem.__init__(
@@ -359,6 +1276,8 @@ class ChallengeQuestion(ScorableItem):
 
 
 class File(ScorableItem):
+    __slots__ = ("filepath", "exist")
+
     def __init__(
         self,
         filepath: str,
@@ -369,7 +1288,7 @@ class File(ScorableItem):
         positive_message: str = None,
         negative_message: str = None,
     ):
-        self.filepath = filepath
+        self.filepath = intern_string(filepath)
         self.exist = exist
 
         ScorableItem.__init__(
@@ -395,50 +1314,269 @@ class File(ScorableItem):
 
 
 def score_challenge_questions(
-    scoring_engine: ScoringEngine, unit_test=False, test_response=None
-):
+    scoring_engine: ScoringEngine, snapshot: SystemSnapshot, items: list = None
+) -> None:
+    answer_regex = re.compile(r"(answer:\s*)(.+)")
+
+    # Only the given questions are scored if a subset is specified.
+    if items is None:
+        items = scoring_engine.challenge_questions
+
     file: ChallengeQuestion
-    for file in scoring_engine.challenge_questions:
+    for file in items:
         logging.debug("Expected answer: {}".format(file.answer))
-        try:
-            # Skip reading response data if we're running the unit test.
-            if unit_test is False:
-                f = open(file.filepath, "r")
-                line = f.read().strip().lower()
-            else:
-                line = test_response
 
-            answer_regex = re.compile(r"(answer:\s*)(.+)")
-            result = re.findall(answer_regex, line)
+        # Missing or unreadable question files were already logged by the snapshot.
+        line = snapshot.question_responses.get(file.filepath)
 
-            for response in result:
-                answer = response[1]
+        if line is None:
+            continue
 
-                if answer == file.answer.lower():
-                    scoring_engine.award_points(
-                        item=file,
-                        message="Question {} was answered correctly.".format(file.name),
-                    )
-        except IOError:
-            logging.warning(
-                "IOError occurred when reading file at {}".format(file.filepath)
+        result = re.findall(answer_regex, line)
+
+        for response in result:
+            answer = response[1]
+
+            if answer == file.answer.lower():
+                scoring_engine.award_points(
+                    item=file,
+                    message="Question {} was answered correctly.".format(file.name),
+                )
+
+
+class FilePattern(ScorableItem):
+    """Files that have to be removed from anywhere under root, such as unauthorized
+    media files. Patterns are globs or bare extensions matched against file names,
+    and subdirectories matching exclude are not searched, see TreeIndex."""
+
+    __slots__ = ("root", "patterns", "exclude")
+
+    def __init__(
+        self,
+        root: str,
+        patterns: list,
+        entry_id: int,
+        positive_points: int,
+        exclude: list = None,
+        positive_message: str = None,
+    ):
+        self.root = intern_string(os.path.abspath(root))
+        self.patterns = tuple(intern_string(pattern) for pattern in patterns)
+        self.exclude = tuple(intern_string(pattern) for pattern in exclude or ())
+
+        ScorableItem.__init__(
+            self,
+            entry_id=entry_id,
+            positive_points=positive_points,
+            negative_points=0,
+            positive_message=positive_message,
+            negative_message="",
+        )
+
+    def __str__(self) -> str:
+        s = """
+        Class: FilePattern
+        root:     {}
+        patterns: {}
+        exclude:  {}
+        {}
+        """.format(
+            self.root, self.patterns, self.exclude, super().__str__()
+        )
+
+        return s
+
+    @property
+    def index_key(self) -> tuple:
+        return (self.root, self.patterns, self.exclude)
+
+
+def score_file_patterns(
+    scoring_engine: ScoringEngine, snapshot: SystemSnapshot, items: list = None
+) -> None:
+
+    if items is None:
+        items = scoring_engine.file_patterns
+
+    item: FilePattern
+    for item in items:
+        matches = snapshot.file_patterns.get(item.index_key)
+
+        # Roots that couldn't be read were already logged by the snapshot.
+        if matches is None:
+            continue
+
+        if len(matches) == 0:
+            scoring_engine.award_points(
+                item=item,
+                message="No files matching {} remain in {}.".format(
+                    ", ".join(item.patterns), item.root
+                ),
             )
-        except FileNotFoundError:
-            logging.warning("Could not find file at {}".format(file.filepath))
-        except Exception as e:
-            logging.warning(
-                "Unspecified exception occurred when reading file at {}".format(
-                    file.filepath
+        else:
+            logging.debug(
+                "{} files matching {} remain in {}, such as {}".format(
+                    len(matches), ", ".join(item.patterns), item.root, matches[0]
                 )
             )
-            logging.warning(e)
 
 
-def score_files(scoring_engine: ScoringEngine):
+class FileHash(ScorableItem):
+    """A file whose contents should, or should no longer, match a SHA-256 digest,
+    such as a tampered binary that has to be restored or a backdoor that has to be
+    removed. A missing file doesn't match.
+
+    match is whether the contents should match the digest, initial is whether they
+    matched when the image was generated."""
+
+    __slots__ = ("filepath", "sha256", "match", "initial")
+
+    # Keyed by whether the contents match the digest.
+    transitions = TransitionTable(
+        attributes=("match", "initial"),
+        rules={
+            (True, True, False): (AWARD, "{item.filepath} was restored."),
+            (False, True, True): (REMOVE, "{item.filepath} was modified."),
+            (False, False, True): (AWARD, "{item.filepath} was modified."),
+            (True, False, False): (REMOVE, "{item.filepath} was restored."),
+        },
+    )
+
+    def __init__(
+        self,
+        filepath: str,
+        sha256: str,
+        match: bool,
+        initial: bool,
+        entry_id: int,
+        positive_points: int,
+        negative_points: int,
+        positive_message: str = None,
+        negative_message: str = None,
+    ):
+        self.filepath = intern_string(filepath)
+        self.sha256 = sha256.lower()
+        self.match = match
+        self.initial = initial
+
+        ScorableItem.__init__(
+            self,
+            entry_id=entry_id,
+            positive_points=positive_points,
+            negative_points=negative_points,
+            positive_message=positive_message,
+            negative_message=negative_message,
+        )
+
+    def __str__(self) -> str:
+        s = """
+        Class: FileHash
+        filepath: {}
+        sha256:   {}
+        match:    {}
+        initial:  {}
+        {}
+        """.format(
+            self.filepath, self.sha256, self.match, self.initial, super().__str__()
+        )
+
+        return s
+
+
+def score_file_hashes(
+    scoring_engine: ScoringEngine, snapshot: SystemSnapshot, items: list = None
+) -> None:
+
+    if items is None:
+        items = scoring_engine.file_hashes
+
+    # Files that couldn't be read aren't scored.
+    items = [item for item in items if item.filepath in snapshot.file_hashes]
+
+    FileHash.transitions.score(
+        scoring_engine,
+        items=items,
+        observed=[snapshot.file_hashes[item.filepath] == item.sha256 for item in items],
+    )
+
+
+class BlocklistScan(ScorableItem):
+    """Files on a blocklist of known bad digests, such as planted hacking tools,
+    that have to be removed from anywhere under roots. See Blocklist."""
+
+    __slots__ = ("name", "roots", "blocklist")
+
+    def __init__(
+        self,
+        name: str,
+        roots: list,
+        blocklist: Blocklist,
+        entry_id: int,
+        positive_points: int,
+        positive_message: str = None,
+    ):
+        self.name = intern_string(name)
+        self.roots = tuple(intern_string(os.path.abspath(root)) for root in roots)
+        self.blocklist = blocklist
+
+        ScorableItem.__init__(
+            self,
+            entry_id=entry_id,
+            positive_points=positive_points,
+            negative_points=0,
+            positive_message=positive_message,
+            negative_message="",
+        )
+
+    def __str__(self) -> str:
+        s = """
+        Class: BlocklistScan
+        name:      {}
+        roots:     {}
+        blocklist: {}
+        {}
+        """.format(
+            self.name, self.roots, len(self.blocklist), super().__str__()
+        )
+
+        return s
+
+
+def score_blocklist_scans(
+    scoring_engine: ScoringEngine, snapshot: SystemSnapshot, items: list = None
+) -> None:
+
+    if items is None:
+        items = scoring_engine.blocklist_scans
+
+    item: BlocklistScan
+    for item in items:
+        found = snapshot.blocklist_scans.get(item.entry_id)
+
+        if found is None:
+            continue
+
+        if len(found) == 0:
+            scoring_engine.award_points(
+                item=item,
+                message="Files on the '{}' blocklist were removed.".format(item.name),
+            )
+        else:
+            logging.debug(
+                "Files on the '{}' blocklist remain: {}".format(item.name, found)
+            )
+
+
+def score_files(
+    scoring_engine: ScoringEngine, snapshot: SystemSnapshot, items: list = None
+) -> None:
+
+    if items is None:
+        items = scoring_engine.files
 
     file: File
-    for file in scoring_engine.files:
-        if os.path.exists(file.filepath):
+    for file in items:
+        if snapshot.files.get(file.filepath) is not None:
             logging.debug("File exists: {}".format(file.filepath))
 
         else:
@@ -14,13 +14,19 @@
 # this program. If not, see <https://www.gnu.org/licenses/>.
 
 import os
-import pickle
-import logging
 from plyer import notification
+from utils.scoring_engine.windows.snapshot_windows import SystemSnapshot
 from utils.scoring_engine.shared.shared_util import (
+    AWARD,
+    REMOVE,
     ScorableItem,
     ScoringEngine,
+    ScoringCategory,
+    TransitionTable,
+    intern_string,
 )
+from utils.scoring_engine.shared.shared_async import AsyncScoringEngine
+from utils.scoring_engine.shared.shared_notifications import NotificationQueue
 
 
 class ScoringEngine(ScoringEngine):
@@ -31,6 +37,10 @@ class ScoringEngine(ScoringEngine):
         notifications: bool = False,
         debug: bool = False,
         debug_config: bool = False,
+        event_driven: bool = False,
+        fsync_interval: int = 10,
+        collector_threads: int = 4,
+        adaptive: bool = False,
     ) -> None:
 
         # OS specific data lists:
@@ -51,6 +61,10 @@ class ScoringEngine(ScoringEngine):
             notifications=notifications,
             debug=debug,
             debug_config=debug_config,
+            event_driven=event_driven,
+            fsync_interval=fsync_interval,
+            collector_threads=collector_threads,
+            adaptive=adaptive,
         )
 
     def __str__(self) -> str:
@@ -62,11 +76,7 @@ class ScoringEngine(ScoringEngine):
         )
         return s
 
-    def score(self):
-        """Score the virtual machine image."""
-
-        print("Scoring...")
-
+    def scoring_categories(self) -> list:
         # Imported here to resolve circular import issue.
         from utils.scoring_engine.windows.util_windows import (
             score_users,
@@ -79,78 +89,57 @@ class ScoringEngine(ScoringEngine):
         from utils.scoring_engine.shared.shared_util import (
             score_challenge_questions,
             score_files,
+            score_file_patterns,
+            score_file_hashes,
+            score_blocklist_scans,
         )
 
-        self.current_score = 0
-        self.scoring_messages = []
-        self.configuration_messages = []
-
-        score_users(self)
-        score_programs(self)
-        score_firewall(self)
-        score_registry_entries(self)
-        score_services(self)
-
-        score_challenge_questions(self)
-        score_files(self)
-
-        if self.save_enabled:
-            self.save()
-        elif not self.save_enabled:
-            msg = """An error occurred saving scoring engine to disk.
-             Saving has been disabled and the scoring
-             engine CANNOT be resumed if terminated or the virtual machine
-             is powered down or restarted."""
-            self.register_config_message(message=msg)
-
-        self.generate_report()
-
-    def save(self, retry=False):
-        """Save an image of the scoring engine to disk."""
-        logging.debug("Attempting to save scoring engine image to disk.")
-
-        path = os.path.join(self.dark_blue_save_path, "dark_blue_scoring_engine.dat")
-
-        try:
-            with open(path, "wb") as outfile:
-                pickle.dump(self, outfile, pickle.HIGHEST_PROTOCOL)
-        except pickle.PickleError:
-            logging.critical("PickleError occurred when saving scoring engine to disk.")
-        except FileNotFoundError:
-
-            if retry:
-                logging.fatal(
-                    "Could not locate directory {} during retried saving"
-                    " attempt. Saving will be disabled.".format(
-                        self.dark_blue_save_path
-                    )
-                )
-                self.save_enabled = False
-                return
-
-            logging.warning("Could not locate Dark Blue directory in Appdata Local.")
-            logging.debug(
-                "Attempting to create path: {}".format(self.dark_blue_save_path)
-            )
-            os.makedirs(self.dark_blue_save_path)
-            logging.debug("Attemptign to retry saving...")
-            self.save(retry=True)
-        except Exception:
-            if retry:
-                logging.fatal(
-                    "Could not save scoring engine after retry."
-                    " Saving will be disabled."
-                )
-                self.save_enabled = False
-                return
-            else:
-                logging.fatal(
-                    "An unknown exception has occurred while saving scoring"
-                    " engine to disk. This error was not caught and"
-                    " saving will now be disabled."
-                )
-                self.save_enabled = False
-                return
+        # Registry values, files, file hashes and challenge questions are cheap to
+        # check, walking the installed programs, running netsh and searching trees
+        # for file patterns or blocklisted files are the most expensive.
+        return [
+            ScoringCategory("users", self.users, score_users, self.scoring_interval),
+            ScoringCategory(
+                "programs", self.programs, score_programs, self.slow_period
+            ),
+            ScoringCategory(
+                "firewall", self.firewall, score_firewall, self.slow_period
+            ),
+            ScoringCategory(
+                "registry_entries",
+                self.registry_entries,
+                score_registry_entries,
+                self.fast_period,
+            ),
+            ScoringCategory(
+                "services", self.services, score_services, self.scoring_interval
+            ),
+            ScoringCategory(
+                "challenge_questions",
+                self.challenge_questions,
+                score_challenge_questions,
+                self.fast_period,
+            ),
+            ScoringCategory("files", self.files, score_files, self.fast_period),
+            ScoringCategory(
+                "file_patterns",
+                self.file_patterns,
+                score_file_patterns,
+                self.slow_period,
+            ),
+            ScoringCategory(
+                "file_hashes", self.file_hashes, score_file_hashes, self.fast_period
+            ),
+            ScoringCategory(
+                "blocklist_scans",
+                self.blocklist_scans,
+                score_blocklist_scans,
+                self.slow_period,
+            ),
+        ]
+
+    def collect_snapshot(self, categories: set = None) -> SystemSnapshot:
+        return SystemSnapshot().collect(scoring_engine=self, categories=categories)
 
     def debug_configuration(self):
         """Calls the string methods on all classes in order to ensure all
@@ -163,56 +152,58 @@ class ScoringEngine(ScoringEngine):
             self.notification_queue.issue_notification(item=item, positive=positive)
 
 
-class NotificationQueue:
-    def __init__(self, timeout: int = 2):
-        self.timeout = timeout
-
-        self.positive_notifications = []
-        self.negative_notifications = []
-
-    def issue_notification(self, item: ScorableItem, positive: bool):
-        if positive:
-            # Check to make sure a notification hasn't already been issued.
-            if item.entry_id not in self.positive_notifications:
-                self.positive_notifications.append(item.entry_id)
-
-                # If there was previously a negative notification, remove it so it can
-                # be reissued if needed.
-                if item.entry_id in self.negative_notifications:
-                    self.negative_notifications.remove(item.entry_id)
-
-                logging.debug(
-                    "Displaying notification for scoring ID: {}".format(item.entry_id)
-                )
-
-                self.display_notification(positive=True)
-
-        else:  # Notification is negative.
-            if item.entry_id not in self.negative_notifications:
-                self.negative_notifications.append(item.entry_id)
-
-                if item.entry_id in self.positive_notifications:
-                    self.positive_notifications.remove(item.entry_id)
-
-                logging.debug(
-                    "Displaying notification for scoring ID: {}".format(item.entry_id)
-                )
-
-                self.display_notification(positive=False)
-
-    def display_notification(self, positive: bool = True):
+class AsyncScoringEngine(AsyncScoringEngine, ScoringEngine):
+    """Windows scoring engine driven by an asyncio event loop, netsh runs as an
+    asyncio subprocess alongside the other collectors."""
 
-        message = ""
+    async def collect_snapshot_async(self, categories: set = None) -> SystemSnapshot:
+        return await SystemSnapshot().collect_async(
+            scoring_engine=self, categories=categories
+        )
 
-        if positive:
-            message = "You have gained points!"
-        else:
-            message = "You have lost points."
 
+class NotificationQueue(NotificationQueue):
+    def display_notification(self, message: str) -> None:
         notification.notify(title="Dark Blue", message=message, timeout=self.timeout)
 
 
 class User(ScorableItem):
+    __slots__ = ("name", "allowed", "is_admin", "admin_initial_state", "user_id")
+
+    # Keyed by whether the user is "missing", has a different SID or is "present".
+    transitions = TransitionTable(
+        attributes=("allowed",),
+        rules={
+            ("missing", True): (REMOVE, "User '{item.name}' has been removed."),
+            ("missing", False): (AWARD, "User '{item.name}' has been removed."),
+            ("different", True): (REMOVE, "User '{item.name}' has been removed."),
+            ("different", False): (REMOVE, "User '{item.name}' has been created."),
+        },
+    )
+
+    # Keyed by whether the user is an administrator.
+    admin_transitions = TransitionTable(
+        attributes=("allowed", "is_admin", "admin_initial_state"),
+        rules={
+            (True, True, True, False): (
+                AWARD,
+                "User '{item.name}' is now an administrator.",
+            ),
+            (True, True, False, False): (
+                REMOVE,
+                "User '{item.name}' is now an administrator.",
+            ),
+            (False, True, False, True): (
+                AWARD,
+                "User '{item.name}' is not an administrator.",
+            ),
+            (False, True, True, True): (
+                REMOVE,
+                "User '{item.name}' is not an administrator.",
+            ),
+        },
+    )
+
     def __init__(
         self,
         name: str,
@@ -226,7 +217,7 @@ class User(ScorableItem):
         positive_message: str = None,
         negative_message: str = None,
     ):
-        self.name = name
+        self.name = intern_string(name)
         self.allowed = allowed
         self.is_admin = is_admin
         self.admin_initial_state = admin_initial_state
@@ -262,12 +253,45 @@ class User(ScorableItem):
 
 
 class Service(ScorableItem):
+    __slots__ = (
+        "name",
+        "common_name",
+        "default_state",
+        "desired_state",
+        "startup_state",
+        "desired_startup_state",
+    )
+
+    # Keyed by the status of the service, states are "running" or "stopped".
+    transitions = TransitionTable(
+        attributes=("default_state", "desired_state"),
+        rules={
+            ("stopped", "running", "stopped"): (
+                AWARD,
+                "Service '{item.name}' is stopped.",
+            ),
+            ("stopped", "running", "running"): (
+                REMOVE,
+                "Service '{item.name}' is stopped.",
+            ),
+            ("running", "stopped", "running"): (
+                AWARD,
+                "Service '{item.name}' is running.",
+            ),
+            ("running", "stopped", "stopped"): (
+                REMOVE,
+                "Service '{item.name}' is running.",
+            ),
+        },
+        convert=lambda state: str(state).lower(),
+    )
+
     def __init__(
         self,
         name: str,
         common_name: str,
-        default_state: bool,
-        desired_state: bool,
+        default_state: str,
+        desired_state: str,
         startup_state: str,
         desired_startup_state: str,
         entry_id: int,
@@ -277,8 +301,8 @@ class Service(ScorableItem):
         negative_message: str = None,
     ):
 
-        self.name = name
-        self.common_name = common_name
+        self.name = intern_string(name)
+        self.common_name = intern_string(common_name)
         self.default_state = default_state
         self.desired_state = desired_state
         self.startup_state = startup_state
@@ -316,6 +340,15 @@ class Service(ScorableItem):
 
 
 class RegistryEntry(ScorableItem):
+    __slots__ = (
+        "key",
+        "key_path",
+        "entry_name",
+        "default_value",
+        "positive_value",
+        "negative_value",
+    )
+
     def __init__(
         self,
         key: str,
@@ -331,9 +364,9 @@ class RegistryEntry(ScorableItem):
         negative_message: str = None,
     ):
 
-        self.key = key
-        self.key_path = key_path
-        self.entry_name = entry_name
+        self.key = intern_string(key)
+        self.key_path = intern_string(key_path)
+        self.entry_name = intern_string(entry_name)
         self.default_value = default_value
         self.positive_value = positive_value
         self.negative_value = negative_value
@@ -343,15 +376,10 @@ class RegistryEntry(ScorableItem):
             entry_id=entry_id,
             positive_points=positive_points,
             negative_points=negative_points,
-            positive_message=positive_message,
-            negative_message=negative_message,
+            positive_message=positive_message or None,
+            negative_message=negative_message or None,
         )
 
-        if self.positive_message == "":
-            self.positive_message = None
-        if self.negative_message == "":
-            self.negative_message = None
-
     def __str__(self) -> str:
         s = """
         Class: RegistryEntry
@@ -376,6 +404,23 @@ class RegistryEntry(ScorableItem):
 
 
 class Firewall(ScorableItem):
+    __slots__ = ("name", "desired_state", "starting_state")
+
+    # Keyed by whether the profile is enabled.
+    transitions = TransitionTable(
+        attributes=("starting_state", "desired_state"),
+        rules={
+            (True, False, True): (
+                AWARD,
+                "{item.profile_name} firewall profile is now enabled.",
+            ),
+            (False, True, True): (
+                REMOVE,
+                "{item.profile_name} firewall profile is now disabled.",
+            ),
+        },
+    )
+
     def __init__(
         self,
         name: str,
@@ -387,7 +432,7 @@ class Firewall(ScorableItem):
         positive_message: str = None,
         negative_message: str = None,
     ):
-        self.name = name
+        self.name = intern_string(name)
         self.desired_state = desired_state
         self.starting_state = starting_state
 
@@ -412,8 +457,24 @@ class Firewall(ScorableItem):
         )
         return s
 
+    @property
+    def profile_name(self) -> str:
+        return self.name.capitalize()
+
 
 class Program(ScorableItem):
+    __slots__ = ("name", "installed", "desired")
+
+    # Keyed by whether the program is installed.
+    transitions = TransitionTable(
+        attributes=("installed", "desired"),
+        rules={
+            (True, False, True): (AWARD, "'{item.name}' is now installed."),
+            (False, True, False): (AWARD, "'{item.name}' is not installed."),
+            (False, True, True): (REMOVE, "'{item.name}' is not installed."),
+        },
+    )
+
     def __init__(
         self,
         name: str,
@@ -425,7 +486,7 @@ class Program(ScorableItem):
         positive_message: str = None,
         negative_message: str = None,
     ):
-        self.name = name
+        self.name = intern_string(name)
         self.installed = installed
         self.desired = desired
 
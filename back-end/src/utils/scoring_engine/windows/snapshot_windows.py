@@ -0,0 +1,317 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+import psutil
+import winreg
+import logging
+import win32net
+import subprocess
+import win32security
+from functools import partial
+from utils.scoring_engine.shared.shared_util import ScoringEngine, SystemSnapshot
+from utils.scoring_engine.shared.shared_async import run_subprocess
+
+
+FIREWALL_COMMAND = ("netsh", "advfirewall", "show", "allprofiles", "state")
+
+
+class SystemSnapshot(SystemSnapshot):
+    """Windows system state for a single scoring cycle. Any collector that fails
+    leaves its field as None so the matching category is skipped instead of
+    being scored against an empty view of the system."""
+
+    def __init__(
+        self,
+        users: dict = None,
+        administrators: list = None,
+        programs: list = None,
+        firewall: dict = None,
+        services: dict = None,
+        registry: dict = None,
+        files: dict = None,
+        question_responses: dict = None,
+    ) -> None:
+        # Maps user names to their SID, and the names of admin users.
+        self.users = users
+        self.administrators = administrators
+
+        # Display names of installed programs.
+        self.programs = programs
+
+        # Maps firewall profile names to whether or not they are enabled.
+        self.firewall = firewall
+
+        # Maps service names to their status, or None if the service doesn't exist.
+        self.services = services
+
+        # Maps (key, key_path, entry_name) to the value of that registry entry, or
+        # None if the key exists but the entry doesn't.
+        self.registry = registry
+
+        super().__init__(files=files, question_responses=question_responses)
+
+    def __str__(self) -> str:
+        s = """
+        Class: SystemSnapshot OS: Windows
+        users:          {}
+        administrators: {}
+        programs:       {}
+        firewall:       {}
+        services:       {}
+        registry:       {}
+        {}
+        """.format(
+            self.users,
+            self.administrators,
+            None if self.programs is None else len(self.programs),
+            self.firewall,
+            self.services,
+            None if self.registry is None else len(self.registry),
+            super().__str__(),
+        )
+        return s
+
+    def collectors(self, scoring_engine: ScoringEngine) -> list:
+        """Categories without any items are not collected."""
+
+        collectors = []
+
+        if len(scoring_engine.users) > 0:
+            collectors.append(("users", self.collect_users))
+
+        if len(scoring_engine.programs) > 0:
+            collectors.append(("programs", self.collect_programs))
+
+        if len(scoring_engine.firewall) > 0:
+            collectors.append(
+                (
+                    "firewall",
+                    partial(
+                        self.collect_firewall,
+                        timeout=scoring_engine.collector_budget("firewall"),
+                    ),
+                )
+            )
+
+        if len(scoring_engine.services) > 0:
+            collectors.append(
+                (
+                    "services",
+                    partial(
+                        self.collect_services,
+                        names=[service.name for service in scoring_engine.services],
+                    ),
+                )
+            )
+
+        if len(scoring_engine.registry_entries) > 0:
+            collectors.append(
+                (
+                    "registry_entries",
+                    partial(
+                        self.collect_registry, entries=scoring_engine.registry_entries
+                    ),
+                )
+            )
+
+        return collectors + super().collectors(scoring_engine=scoring_engine)
+
+    def async_collectors(self, scoring_engine: ScoringEngine) -> list:
+        """netsh is run as an asyncio subprocess instead of blocking a thread."""
+
+        return [
+            (name, self.collect_firewall_async if name == "firewall" else collector)
+            for name, collector in self.collectors(scoring_engine=scoring_engine)
+        ]
+
+    def collect_users(self) -> None:
+        try:
+            self.users, self.administrators = get_users()
+        except Exception as e:
+            logging.critical("Could not enumerate users. Error: {}".format(e))
+
+    def collect_programs(self) -> None:
+        try:
+            self.programs = get_programs()
+        except OSError as e:
+            logging.critical(
+                "Could not enumerate installed programs. Error: {}".format(e)
+            )
+
+    def collect_firewall(self, timeout: float) -> None:
+        try:
+            self.firewall = get_firewall_profiles(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            # netsh was killed, keep the previous results like any other collector
+            # that runs out of time.
+            self.timed_out.add("firewall")
+
+    async def collect_firewall_async(self) -> None:
+        result = await run_subprocess(*FIREWALL_COMMAND)
+        self.firewall = parse_firewall_profiles(result=result)
+
+    def collect_services(self, names: list) -> None:
+        services = {}
+
+        for name in names:
+            try:
+                services[name] = psutil.win_service_get(name).status()
+            except psutil.NoSuchProcess:
+                logging.warning("Service {} was not found.".format(name))
+                services[name] = None
+
+        self.services = services
+
+    def collect_registry(self, entries: list) -> None:
+        try:
+            registry_hklm = winreg.ConnectRegistry(None, winreg.HKEY_LOCAL_MACHINE)
+            registry_hkcu = winreg.ConnectRegistry(None, winreg.HKEY_CURRENT_USER)
+        except OSError:
+            logging.critical(
+                "Could not connect to registry. Registry scoring will be skipped."
+            )
+            return
+
+        registries = {
+            "HKEY_LOCAL_MACHINE": registry_hklm,
+            "HKEY_CURRENT_USER": registry_hkcu,
+        }
+
+        # Entries whose key path doesn't exist are left out and are not scored.
+        registry = {}
+        checked = set()
+
+        for entry in entries:
+            location = (entry.key, entry.key_path, entry.entry_name)
+
+            if location in checked or entry.key not in registries:
+                continue
+
+            checked.add(location)
+
+            try:
+                key = winreg.OpenKey(registries[entry.key], entry.key_path)
+            except FileNotFoundError:
+                logging.error(
+                    "Could not locate keypath: {} in {}.".format(
+                        entry.key_path, entry.key
+                    )
+                )
+                continue
+
+            registry[location] = None
+
+            try:
+                registry[location] = winreg.QueryValueEx(key, entry.entry_name)[0]
+            except FileNotFoundError:
+                logging.error(
+                    "Could not find registry key {} in {}\\{}".format(
+                        entry.entry_name, entry.key, entry.key_path
+                    )
+                )
+
+        self.registry = registry
+
+
+def get_users() -> tuple[dict, list]:
+    user_dict = {}
+    administrators = []
+
+    group_list = ["Users", "Administrators"]
+
+    for group in group_list:
+        member_data, _, _ = win32net.NetLocalGroupGetMembers(None, group, 2, 0)
+
+        for user in member_data:
+            t_sid = win32security.ConvertSidToStringSid(user["sid"])
+
+            name, _, _ = win32security.LookupAccountSid(None, user["sid"])
+
+            user_dict[name] = t_sid
+
+            if group == "Administrators":
+                administrators.append(name)
+
+    return user_dict, administrators
+
+
+def get_programs() -> list:
+
+    installed_programs = []
+    names = []
+
+    keypath = r"Software\Microsoft\Windows\CurrentVersion\Uninstall"
+    registry = winreg.ConnectRegistry(None, winreg.HKEY_LOCAL_MACHINE)
+
+    key = winreg.OpenKey(registry, keypath)
+    i = 0
+
+    while True:
+        try:
+            subkey = winreg.EnumKey(key, i)
+            names.append(subkey)
+            i += 1
+        except OSError:
+            break
+
+    for entry in names:
+        try:
+            key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, keypath + "\\" + entry)
+            try:
+                value = winreg.QueryValueEx(key, "DisplayName")
+                installed_programs.append(value[0])
+            except FileNotFoundError:
+                pass
+        except FileNotFoundError:
+            pass
+
+    return installed_programs
+
+
+def get_firewall_profiles(timeout: float = None) -> dict:
+    """Raises subprocess.TimeoutExpired if netsh doesn't finish within timeout
+    seconds."""
+
+    result = subprocess.run(
+        FIREWALL_COMMAND,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+        timeout=timeout,
+    ).stdout
+
+    return parse_firewall_profiles(result=result)
+
+
+def parse_firewall_profiles(result: str) -> dict:
+    firewall_dict = {}
+    firewall_status_list = []
+    firewall_list = ["domain", "private", "public"]
+
+    split_result = result.split()
+
+    for entry in split_result[5::6]:
+        firewall_status_list.append(entry)
+
+    for index, item in enumerate(firewall_status_list):
+        status = None
+        if item == "ON":
+            status = True
+        elif item == "OFF":
+            status = False
+
+        firewall_dict[firewall_list[index]] = status
+
+    return firewall_dict
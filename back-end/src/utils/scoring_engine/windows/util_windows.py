@@ -13,12 +13,8 @@
 # You should have received a copy of the GNU General Public License along with
 # this program. If not, see <https://www.gnu.org/licenses/>.
 
-import psutil
-import winreg
 import logging
-import win32net
-import subprocess
-import win32security
+from utils.scoring_engine.windows.snapshot_windows import SystemSnapshot
 from utils.scoring_engine.windows.scoring_engine_windows import (
     Firewall,
     RegistryEntry,
@@ -29,9 +25,7 @@ from utils.scoring_engine.windows.scoring_engine_windows import (
 )
 
 
-def score_users(
-    scoring_engine: ScoringEngine, unit_test=False, users_test=None, admins_test=None
-) -> None:
+def score_users(scoring_engine: ScoringEngine, snapshot: SystemSnapshot) -> None:
     logging.debug("Scoring users...")
 
     # Check to make sure we have some users in the list.
@@ -39,19 +33,14 @@ def score_users(
         logging.critical("User list is empty. Could not score users.")
         return
 
-    # Get a list of all of the users on the system.
-    user_dict = {}  # Dictionary which maps the user name to their SID.
+    if snapshot.users is None:
+        return
+
+    # Dictionary which maps the user name to their SID.
+    user_dict = snapshot.users
 
     # List which will just contain the names of admin users.
-    administrators = []
-
-    if not unit_test:
-        user_dict, administrators = get_users()
-    if unit_test and users_test is not None and admins_test is not None:
-        user_dict = users_test
-        administrators = admins_test
-    elif unit_test and (users_test is None or admins_test is None):
-        return
+    administrators = snapshot.administrators
 
     logging.debug("User dict: {}".format(user_dict))
     logging.debug("Administrators: {}".format(administrators))
@@ -66,210 +55,87 @@ def score_users(
             "                none or an error occurred."
         )
 
-    user_list = list(user_dict.keys())
+    users = scoring_engine.users
+    presence = []
+    admin = []
 
-    logging.debug("User list: {}".format(user_list))
-
-    # Iterate over every user in the user list.
     user: User
+    for user in users:
+        # Admin status isn't scored for users that no longer exist.
+        if user.name not in user_dict:
+            presence.append("missing")
+            admin.append(None)
+            continue
+
+        if user.user_id != user_dict[user.name]:
+            presence.append("different")
+        else:
+            presence.append("present")
 
-    for user in scoring_engine.users:
-
-        # User is not in list.
-        if user.name not in user_list:
-            # User is allowed, remove points.
-            m = "User '{}' has been removed.".format(user.name)
-            if user.allowed:
-                scoring_engine.remove_points(item=user, message=m)
-                continue  # We probably don't need to score admin status.
-
-            # User is not allowed, award points.
-            elif not user.allowed:
-                scoring_engine.award_points(item=user, message=m)
-                continue
-
-        # Else user is in the list.
-        elif user.name in user_list:
-            # User is allowed, but they've been deleted and re-added and therefore have
-            # a different SID.
-            if user.allowed and user.user_id != user_dict[user.name]:
-                m = "User '{}' has been removed.".format(user.name)
-                scoring_engine.remove_points(item=user, message=m)
-
-            # User is not allowed, check to see if the user has created them.
-            if not user.allowed and user.user_id != user_dict[user.name]:
-                m = "User '{}' has been created.".format(user.name)
-                scoring_engine.remove_points(item=user, message=m)
-
-        #   Check admin status.
-        if user.name in administrators:
-            # Award - User needed to be given admin permissions.
-            if user.allowed and user.is_admin and not user.admin_initial_state:
-                m = "User '{}' is now an administrator.".format(user.name)
-                scoring_engine.award_points(item=user, message=m)
-
-            # Remove - User has been given admin permissions.
-            if user.allowed and not user.is_admin and not user.admin_initial_state:
-                m = "User '{}' is now an administrator.".format(user.name)
-                scoring_engine.remove_points(item=user, message=m)
-
-        elif user.name not in administrators:
-            # Award - User's admin permissions removed.
-            if user.allowed and not user.is_admin and user.admin_initial_state:
-                m = "User '{}' is not an administrator.".format(user.name)
-                scoring_engine.award_points(item=user, message=m)
-
-            # Remove - User's admin permissions removed.
-            if user.allowed and user.is_admin and user.admin_initial_state:
-                m = "User '{}' is not an administrator.".format(user.name)
-                scoring_engine.remove_points(item=user, message=m)
-
-
-def get_users() -> tuple[dict, list]:
-    user_dict = {}
-    administrators = []
-
-    group_list = ["Users", "Administrators"]
-
-    for group in group_list:
-        member_data, _, _ = win32net.NetLocalGroupGetMembers(None, group, 2, 0)
-
-        for user in member_data:
-            t_sid = win32security.ConvertSidToStringSid(user["sid"])
-
-            name, _, _ = win32security.LookupAccountSid(None, user["sid"])
-
-            user_dict[name] = t_sid
-
-            if group == "Administrators":
-                administrators.append(name)
+        admin.append(user.name in administrators)
 
-    return user_dict, administrators
+    User.transitions.score(scoring_engine, items=users, observed=presence)
+    User.admin_transitions.score(scoring_engine, items=users, observed=admin)
 
 
-def score_programs(scoring_engine: ScoringEngine) -> None:
+def score_programs(scoring_engine: ScoringEngine, snapshot: SystemSnapshot) -> None:
 
     logging.debug("Scoring installed programs...")
 
-    installed_programs = get_programs()
-
-    logging.debug("Installed programs: {}".format(installed_programs))
-
-    program: Program
-    for program in scoring_engine.programs:
-
-        if program.name in installed_programs:
-            # User must install program.
-            m = "'{}' is now installed.".format(program.name)
-            if not program.installed and program.desired:
-                scoring_engine.award_points(item=program, message=m)
-
-        else:
-            m = "'{}' is not installed.".format(program.name)
-            # User must uninstall program.
-            if program.installed and not program.desired:
-                scoring_engine.award_points(item=program, message=m)
-
-            # User has falsely uninstalled program.
-            if program.installed and program.desired:
-                scoring_engine.remove_points(item=program, message=m)
+    if snapshot.programs is None:
+        return
 
+    installed_programs = snapshot.programs
 
-def get_programs() -> list:
+    logging.debug("Installed programs: {}".format(installed_programs))
 
-    installed_programs = []
-    names = []
+    programs = scoring_engine.programs
 
-    keypath = r"Software\Microsoft\Windows\CurrentVersion\Uninstall"
-    registry = winreg.ConnectRegistry(None, winreg.HKEY_LOCAL_MACHINE)
+    Program.transitions.score(
+        scoring_engine,
+        items=programs,
+        observed=[program.name in installed_programs for program in programs],
+    )
 
-    key = winreg.OpenKey(registry, keypath)
-    i = 0
 
-    while True:
-        try:
-            subkey = winreg.EnumKey(key, i)
-            names.append(subkey)
-            i += 1
-        except OSError:
-            break
+def score_services(scoring_engine: ScoringEngine, snapshot: SystemSnapshot) -> None:
 
-    for entry in names:
-        try:
-            key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, keypath + "\\" + entry)
-            try:
-                value = winreg.QueryValueEx(key, "DisplayName")
-                installed_programs.append(value[0])
-            except FileNotFoundError:
-                pass
-        except FileNotFoundError:
-            pass
+    logging.debug("Scoring services...")
 
-    return installed_programs
+    if snapshot.services is None:
+        return
 
+    services = scoring_engine.services
+    statuses = []
 
-def score_services(scoring_engine: ScoringEngine) -> None:
+    service: Service
+    for service in services:
+        status = snapshot.services.get(service.name)
 
-    logging.debug("Scoring services...")
+        if status is not None:
+            status = status.lower()
 
-    service: Service
-    for service in scoring_engine.services:
-        try:
-            result = psutil.win_service_get(service.name)
-        except psutil.NoSuchProcess:
-            logging.warning("Service {} was not found.".format(service.name))
-
-        if result is not None:
-
-            # Service is not running.
-            if result.status() == "stopped":
-                logging.debug("Service {} is stopped.".format(service.name))
-
-                m = "Service '{}' is stopped.".format(service.name)
-
-                # Service must be stopped.
-                if (
-                    service.desired_state == "stopped"
-                    and service.default_state == "running"
-                ):
-                    scoring_engine.award_points(item=service, message=m)
-
-                # Service is falsely stopped.
-                if (
-                    service.desired_state == "running"
-                    and service.default_state == "running"
-                ):
-                    scoring_engine.remove_points(item=service, message=m)
-
-            # Service is running.
-            elif result.status() == "running":
-                m = "Service '{}' is running.".format(service.name)
-                # Service must be started.
-                if service.desired_state and not service.startup_state:
-                    scoring_engine.award_points(item=service, message=m)
-
-                # Service is falsely started.
-                if not service.desired_state and not service.startup_state:
-                    scoring_engine.remove_points(item=service, message=m)
-
-            # Else service is ???.
-            else:
+            if status not in ("running", "stopped"):
                 logging.warning(
                     "Service '{}' is in an unknown state.".format(service.name)
                 )
 
+        statuses.append(status)
+
+    Service.transitions.score(scoring_engine, items=services, observed=statuses)
 
-def score_registry_entries(scoring_engine: ScoringEngine) -> None:
+
+def score_registry_entries(
+    scoring_engine: ScoringEngine, snapshot: SystemSnapshot
+) -> None:
 
     logging.debug("Scoring registry entries...")
 
-    try:
-        registry_hklm = winreg.ConnectRegistry(None, winreg.HKEY_LOCAL_MACHINE)
-        registry_hkcu = winreg.ConnectRegistry(None, winreg.HKEY_CURRENT_USER)
-    except OSError:
-        logging.critical(
-            "Could not connect to registry. Registry scoring will be skipped."
-        )
+    # Nothing was collected if there is nothing to score.
+    if len(scoring_engine.registry_entries) == 0:
+        return
+
+    if snapshot.registry is None:
         scoring_engine.register_config_message(
             message="Could not connect to registry. Registry was not scored."
         )
@@ -277,39 +143,11 @@ def score_registry_entries(scoring_engine: ScoringEngine) -> None:
 
     entry: RegistryEntry
     for entry in scoring_engine.registry_entries:
-        key = None
+        location = (entry.key, entry.key_path, entry.entry_name)
 
-        if entry.key == "HKEY_LOCAL_MACHINE":
-            try:
-                key = winreg.OpenKey(registry_hklm, entry.key_path)
-            except FileNotFoundError:
-                logging.error(
-                    "Could not locate keypath: {} in HKEY_LOCAL_MACHINE.".format(
-                        entry.key_path
-                    )
-                )
-
-        elif entry.key == "HKEY_CURRENT_USER":
-            try:
-                key = winreg.OpenKey(registry_hkcu, entry.key_path)
-            except FileNotFoundError:
-                logging.error(
-                    "Could not locate keypath: {} in HKEY_LOCAL_MACHINE.".format(
-                        entry.key_path
-                    )
-                )
-
-        if key is not None:
-            value = None
-
-            try:
-                value = winreg.QueryValueEx(key, entry.entry_name)[0]
-            except FileNotFoundError:
-                logging.error(
-                    "Could not find registry key {} in {}\\{}".format(
-                        entry.entry_name, entry.key, entry.key_path
-                    )
-                )
+        # Entries whose key path could not be opened are skipped.
+        if location in snapshot.registry:
+            value = snapshot.registry[location]
 
             dec_value = hex_value = None
 
@@ -384,59 +222,20 @@ def score_registry_entries(scoring_engine: ScoringEngine) -> None:
                 )
 
 
-def score_firewall(
-    scoring_engine: ScoringEngine, unit_test: bool = False, test_dict: dict = None
-) -> None:
+def score_firewall(scoring_engine: ScoringEngine, snapshot: SystemSnapshot) -> None:
 
     logging.debug("Scoring firewall profiles...")
 
-    firewall_dict = {}
-    firewall_status_list = []
-    firewall_list = ["domain", "private", "public"]
-
-    result = subprocess.getoutput("netsh advfirewall show allprofiles state")
-    split_result = result.split()
-
-    for entry in split_result[5::6]:
-        firewall_status_list.append(entry)
-
-    for index, item in enumerate(firewall_status_list):
-        status = None
-        if item == "ON":
-            status = True
-        elif item == "OFF":
-            status = False
-
-        firewall_dict[firewall_list[index]] = status
-
-    if unit_test:
-        firewall_dict = test_dict
-
-    firewall: Firewall
-    for firewall in scoring_engine.firewall:
-
-        # Gain points -- Firewall is enabled.
-        if (
-            firewall_dict[firewall.name]
-            and not firewall.starting_state
-            and firewall.desired_state
-        ):
-            scoring_engine.award_points(
-                item=firewall,
-                message="{} firewall profile is now enabled.".format(
-                    firewall.name.capitalize()
-                ),
-            )
-
-        # Lose points -- Firewall is disabled.
-        elif (
-            not firewall_dict[firewall.name]
-            and firewall.starting_state
-            and firewall.desired_state
-        ):
-            scoring_engine.remove_points(
-                item=firewall,
-                message="{} firewall profile is now disabled.".format(
-                    firewall.name.capitalize()
-                ),
-            )
+    if snapshot.firewall is None:
+        return
+
+    firewall_dict = snapshot.firewall
+
+    profiles = scoring_engine.firewall
+
+    # Profiles whose state couldn't be read aren't scored.
+    Firewall.transitions.score(
+        scoring_engine,
+        items=profiles,
+        observed=[firewall_dict.get(firewall.name) for firewall in profiles],
+    )
@@ -0,0 +1,63 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+import unittest
+from utils.scoring_engine.shared.shared_util import ScoringCategory
+from utils.scoring_engine.linux.scoring_engine_linux import ScoringEngine
+
+
+class ChangingWatcher:
+    """Reports a change on the first read, then stops the scoring engine."""
+
+    def __init__(self, scoring_engine: ScoringEngine) -> None:
+        self.fd = 0
+        self.scoring_engine = scoring_engine
+        self.timeouts = []
+
+    def read_changes(self, timeout: float) -> set:
+        self.timeouts.append(timeout)
+
+        if len(self.timeouts) == 1:
+            return {"/etc/ssh/sshd_config"}
+
+        self.scoring_engine.run = False
+        return set()
+
+
+class TestEventDrivenWait(unittest.TestCase):
+    def test_change_brings_next_cycle_forward(self) -> None:
+        scoring_engine = ScoringEngine(
+            total_score=100, event_driven=True, adaptive=True
+        )
+        scoring_engine.watcher = ChangingWatcher(scoring_engine=scoring_engine)
+        scoring_engine.rescore_paths = lambda paths: scoring_engine.reset_backoff()
+
+        # Backed off to eight times the ten second period.
+        scoring_engine.backoff = 8
+        scoring_engine.schedule.sync(
+            categories=[ScoringCategory("config_files", [], None, 10)]
+        )
+        scoring_engine.schedule.pop_due(scale=scoring_engine.backoff)
+
+        scoring_engine.wait(timeout=scoring_engine.schedule.time_until_next())
+
+        first, second = scoring_engine.watcher.timeouts
+        self.assertGreater(first, 70)
+        self.assertLessEqual(second, 10)
+        self.assertEqual(scoring_engine.backoff, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
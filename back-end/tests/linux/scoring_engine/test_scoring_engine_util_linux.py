@@ -0,0 +1,295 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+import unittest
+from utils.scoring_engine.linux.snapshot_linux import SystemSnapshot
+from utils.scoring_engine.linux.scoring_engine_linux import (
+    ScoringEngine,
+    User,
+    Process,
+    Package,
+    ConfigFile,
+)
+from utils.scoring_engine.linux.scoring_engine_util_linux import (
+    score_users,
+    score_processes,
+    score_packages,
+    score_config_files,
+)
+
+
+class ScoringTestCase(unittest.TestCase):
+    """Scores hand built snapshots, the way a scoring cycle scores collected ones."""
+
+    def setUp(self) -> None:
+        self.scoring_engine = ScoringEngine(total_score=100)
+
+    def score(self, score_function, items: list, snapshot: SystemSnapshot) -> list:
+        """Score items against snapshot, replacing their previous results, and
+        return the scoring messages."""
+
+        self.scoring_engine.clear_results(items=items)
+        score_function(self.scoring_engine, snapshot)
+        self.scoring_engine.tally_results()
+
+        return self.scoring_engine.scoring_messages
+
+
+class TestScoreUsers(ScoringTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        users = self.scoring_engine.users
+        self.admin = User("admin", True, True, False, 1000, 1, 2, 3)
+        self.intruder = User("intruder", False, False, False, 1001, 2, 4, 5)
+        self.demoted = User("demoted", True, False, True, 1002, 3, 6, 7)
+        users.extend([self.admin, self.intruder, self.demoted])
+
+        self.passwd = {"admin": 1000, "intruder": 1001, "demoted": 1002}
+
+    def test_initial_state_scores_nothing(self) -> None:
+        snapshot = SystemSnapshot(users=self.passwd, sudoers=frozenset(["demoted"]))
+
+        messages = self.score(score_users, self.scoring_engine.users, snapshot)
+
+        self.assertEqual(messages, [])
+        self.assertEqual(self.scoring_engine.current_score, 0)
+
+    def test_award(self) -> None:
+        users = {"admin": 1000, "demoted": 1002}
+        snapshot = SystemSnapshot(users=users, sudoers=frozenset(["admin"]))
+
+        messages = self.score(score_users, self.scoring_engine.users, snapshot)
+
+        self.assertEqual(
+            messages,
+            [
+                "[+2] User 'admin' is in the sudoers group.",
+                "[+4] User 'intruder' has been removed.",
+                "[+6] User 'demoted' is not in the sudoers group.",
+            ],
+        )
+        self.assertEqual(self.scoring_engine.current_score, 12)
+
+    def test_remove(self) -> None:
+        users = {"intruder": 1001, "demoted": 4242}
+        snapshot = SystemSnapshot(users=users, sudoers=frozenset(["demoted"]))
+
+        messages = self.score(score_users, self.scoring_engine.users, snapshot)
+
+        self.assertEqual(
+            messages,
+            [
+                "[-3] User 'admin' has been removed.",
+                "[-7] User 'demoted' has been removed.",
+            ],
+        )
+        self.assertEqual(self.scoring_engine.current_score, -10)
+
+    def test_revert(self) -> None:
+        users = self.scoring_engine.users
+        fixed = SystemSnapshot(users={"admin": 1000}, sudoers=frozenset(["admin"]))
+        reverted = SystemSnapshot(users=self.passwd, sudoers=frozenset(["demoted"]))
+
+        self.score(score_users, users, fixed)
+        messages = self.score(score_users, users, reverted)
+
+        self.assertEqual(messages, [])
+        self.assertEqual(self.scoring_engine.current_score, 0)
+
+    def test_unreadable_users_are_not_scored(self) -> None:
+        messages = self.score(score_users, self.scoring_engine.users, SystemSnapshot())
+
+        self.assertEqual(messages, [])
+
+
+class TestScoreProcesses(ScoringTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.scoring_engine.processes.extend(
+            [
+                Process("nginx", False, True, 1, 2, 3),
+                Process("nc", True, False, 2, 4, 5),
+            ]
+        )
+
+    def test_award(self) -> None:
+        snapshot = SystemSnapshot(processes={"nginx": 1, "bash": 3})
+
+        messages = self.score(score_processes, self.scoring_engine.processes, snapshot)
+
+        self.assertEqual(
+            messages,
+            [
+                "[+2] Process 'nginx' has been started.",
+                "[+4] Process 'nc' has been stopped.",
+            ],
+        )
+
+    def test_remove(self) -> None:
+        # Stopping a process that has to keep running.
+        self.scoring_engine.processes.append(Process("sshd", True, True, 3, 6, 7))
+        snapshot = SystemSnapshot(processes={"nc": 1})
+
+        messages = self.score(score_processes, self.scoring_engine.processes, snapshot)
+
+        self.assertEqual(messages, ["[-7] Process 'sshd' has been stopped."])
+
+    def test_revert(self) -> None:
+        processes = self.scoring_engine.processes
+
+        self.score(score_processes, processes, SystemSnapshot(processes={"nginx": 1}))
+        messages = self.score(
+            score_processes, processes, SystemSnapshot(processes={"nc": 1})
+        )
+
+        self.assertEqual(messages, [])
+        self.assertEqual(self.scoring_engine.current_score, 0)
+
+
+class TestScorePackages(ScoringTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.scoring_engine.packages.extend(
+            [
+                Package("ufw", True, False, 1, 2, 3),
+                Package("telnetd", False, True, 2, 4, 5),
+                Package("openssh-server", True, True, 3, 6, 7),
+            ]
+        )
+
+    def test_award(self) -> None:
+        snapshot = SystemSnapshot(packages=frozenset(["ufw", "openssh-server"]))
+
+        messages = self.score(score_packages, self.scoring_engine.packages, snapshot)
+
+        self.assertEqual(
+            messages,
+            [
+                "[+2] Package 'ufw' is installed.",
+                "[+4] Package 'telnetd' was uninstalled.",
+            ],
+        )
+
+    def test_remove(self) -> None:
+        snapshot = SystemSnapshot(packages=frozenset(["telnetd"]))
+
+        messages = self.score(score_packages, self.scoring_engine.packages, snapshot)
+
+        self.assertEqual(messages, ["[-7] Package 'openssh-server' was uninstalled."])
+
+    def test_revert(self) -> None:
+        packages = self.scoring_engine.packages
+        fixed = SystemSnapshot(packages=frozenset(["ufw", "openssh-server"]))
+        reverted = SystemSnapshot(packages=frozenset(["telnetd", "openssh-server"]))
+
+        self.score(score_packages, packages, fixed)
+        messages = self.score(score_packages, packages, reverted)
+
+        self.assertEqual(messages, [])
+        self.assertEqual(self.scoring_engine.current_score, 0)
+
+
+class TestScoreConfigFiles(ScoringTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.scoring_engine.config_files.append(
+            ConfigFile(
+                "/etc/example.conf", "default", "secure", "insecure", False, 1, 2, 3
+            )
+        )
+
+    def score_content(self, content) -> list:
+        snapshot = SystemSnapshot(config_files={"/etc/example.conf": content})
+        return self.score(
+            score_config_files, self.scoring_engine.config_files, snapshot
+        )
+
+    def test_award(self) -> None:
+        self.assertEqual(
+            self.score_content("secure"),
+            ["[+2] '/etc/example.conf' matches positive value: secure"],
+        )
+
+    def test_remove(self) -> None:
+        self.assertEqual(
+            self.score_content("insecure"),
+            ["[-3] '/etc/example.conf' matches negative value: insecure"],
+        )
+
+    def test_revert(self) -> None:
+        self.score_content("secure")
+
+        self.assertEqual(self.score_content("default"), [])
+        self.assertEqual(self.scoring_engine.current_score, 0)
+
+    def test_unreadable_file_is_not_scored(self) -> None:
+        self.assertEqual(self.score_content(None), [])
+
+
+class TestScoreConfigSettings(ScoringTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.scoring_engine.config_files.append(
+            ConfigFile(
+                "/etc/ssh/sshd_config",
+                "",
+                "No",
+                "yes",
+                False,
+                1,
+                2,
+                3,
+                key="PermitRootLogin",
+            )
+        )
+
+    def score_settings(self, settings: dict) -> list:
+        path = "/etc/ssh/sshd_config"
+        snapshot = SystemSnapshot(
+            config_files={path: "..."}, config_values={path: settings}
+        )
+        return self.score(
+            score_config_files, self.scoring_engine.config_files, snapshot
+        )
+
+    def test_award(self) -> None:
+        self.assertEqual(
+            self.score_settings({"permitrootlogin": "no"}),
+            [
+                "[+2] '/etc/ssh/sshd_config' PermitRootLogin matches positive "
+                "value: No"
+            ],
+        )
+
+    def test_remove(self) -> None:
+        self.assertEqual(
+            self.score_settings({"permitrootlogin": "Yes"}),
+            [
+                "[-3] '/etc/ssh/sshd_config' PermitRootLogin matches negative "
+                "value: yes"
+            ],
+        )
+
+    def test_unset_key(self) -> None:
+        self.assertEqual(self.score_settings({"port": "22"}), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,461 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import pickle
+import tempfile
+import unittest
+from utils.scoring_engine.linux.snapshot_linux import (
+    ConfigIndex,
+    ConfigContents,
+    DpkgStatusIndex,
+    ProcessTable,
+    AccountDatabase,
+    SystemSnapshot,
+)
+
+SSHD_CONFIG = """# Comments and blank lines are skipped.
+Port 22
+PermitRootLogin no
+
+PasswordAuthentication   yes
+permitrootlogin yes
+X11Forwarding=no
+Ciphers = aes256-ctr, aes128-ctr
+UsePAM
+
+Match User backup
+    PermitRootLogin yes
+    AllowTcpForwarding yes
+"""
+
+
+class TestConfigContents(unittest.TestCase):
+    def test_sshd_uses_first_value_until_match(self) -> None:
+        contents = ConfigContents(path="/etc/ssh/sshd_config", content=SSHD_CONFIG)
+
+        self.assertEqual(
+            contents.settings(),
+            {
+                "port": "22",
+                "permitrootlogin": "no",
+                "passwordauthentication": "yes",
+                "x11forwarding": "no",
+                "ciphers": "aes256-ctr, aes128-ctr",
+                "usepam": "",
+            },
+        )
+
+    def test_other_files_use_last_value(self) -> None:
+        contents = ConfigContents(path="/etc/example.conf", content=SSHD_CONFIG)
+        settings = contents.settings()
+
+        self.assertEqual(settings["permitrootlogin"], "yes")
+        self.assertEqual(settings["allowtcpforwarding"], "yes")
+        self.assertEqual(settings["match"], "User backup")
+
+    def test_key_value_syntax(self) -> None:
+        content = "; INI comment\nmax_execution_time = 30\nexpose_php=Off\nmode  0600"
+        contents = ConfigContents(path="/etc/php/php.ini", content=content)
+
+        self.assertEqual(
+            contents.settings(),
+            {"max_execution_time": "30", "expose_php": "Off", "mode": "0600"},
+        )
+
+    def test_settings_are_parsed_once(self) -> None:
+        contents = ConfigContents(path="/etc/example.conf", content="a 1")
+
+        self.assertIs(contents.settings(), contents.settings())
+
+
+class TestConfigIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.path = os.path.join(directory.name, "sshd_config")
+        self.write("PermitRootLogin no\n")
+
+    def write(self, data: str, mtime: int = 10**18) -> None:
+        with open(self.path, "w") as out_file:
+            out_file.write(data)
+
+        os.utime(self.path, ns=(mtime, mtime))
+
+    def test_unchanged_file_is_shared(self) -> None:
+        config_index = ConfigIndex(racy_window=0)
+
+        self.assertIs(
+            config_index.read(path=self.path), config_index.read(path=self.path)
+        )
+
+    def test_changed_file_is_read_again(self) -> None:
+        config_index = ConfigIndex(racy_window=0)
+        config_index.read(path=self.path)
+
+        self.write("PermitRootLogin on\n", mtime=2 * 10**18)
+
+        self.assertEqual(
+            config_index.read(path=self.path).content, "PermitRootLogin on"
+        )
+
+    def test_recent_file_is_read_again(self) -> None:
+        config_index = ConfigIndex(racy_window=60)
+        os.utime(self.path)
+        first = config_index.read(path=self.path)
+
+        self.assertIsNot(config_index.read(path=self.path), first)
+
+
+DPKG_STATUS = """Package: openssh-server
+Status: install ok installed
+Priority: optional
+Architecture: amd64
+Version: 1:8.9p1-3
+
+Package: telnetd
+Status: deinstall ok config-files
+Architecture: amd64
+
+Package: libc6
+Status: install ok installed
+Architecture: amd64
+Description: GNU C Library: Shared libraries
+ Contains the standard libraries that are used by nearly all programs on
+ the system.
+
+Package: libc6
+Status: install ok unpacked
+Architecture: i386
+
+Package: zlib1g
+Status: purge ok not-installed
+Architecture: i386
+
+Package: zlib1g
+Status: install ok installed
+Architecture: amd64
+"""
+
+
+class TestDpkgStatusIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.path = os.path.join(directory.name, "status")
+        self.write(DPKG_STATUS)
+
+    def write(self, data: str) -> None:
+        with open(self.path, "w") as out_file:
+            out_file.write(data)
+
+    def test_unchanged_database_is_not_parsed_again(self) -> None:
+        os.utime(self.path, ns=(10**18, 10**18))
+        package_index = DpkgStatusIndex(path=self.path)
+        package_index.refresh()
+
+        package_index.packages["telnetd"] = "cached"
+        package_index.refresh()
+
+        self.assertEqual(package_index.packages["telnetd"], "cached")
+
+    def test_recent_database_is_parsed_again(self) -> None:
+        package_index = DpkgStatusIndex(path=self.path, racy_window=60)
+        package_index.refresh()
+
+        # A write within the same clock tick, which doesn't change the signature.
+        stat = os.stat(self.path)
+        self.write(DPKG_STATUS.replace("telnetd", "telnetx"))
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        package_index.refresh()
+
+        self.assertIn("telnetx", package_index.packages)
+
+    def test_installed_packages(self) -> None:
+        installed = DpkgStatusIndex(path=self.path).refresh()
+
+        self.assertEqual(
+            installed,
+            {
+                "openssh-server",
+                "openssh-server:amd64",
+                "libc6",
+                "libc6:amd64",
+                "libc6:i386",
+                "zlib1g",
+                "zlib1g:amd64",
+            },
+        )
+
+    def test_installed_architecture_wins(self) -> None:
+        package_index = DpkgStatusIndex(path=self.path)
+        package_index.refresh()
+
+        self.assertEqual(package_index.packages["zlib1g"], "install ok installed")
+        self.assertEqual(
+            package_index.packages["zlib1g:i386"], "purge ok not-installed"
+        )
+        self.assertEqual(package_index.packages["telnetd"], "deinstall ok config-files")
+
+    def test_refresh_after_change(self) -> None:
+        package_index = DpkgStatusIndex(path=self.path)
+        package_index.refresh()
+
+        self.write(
+            DPKG_STATUS.replace("deinstall ok config-files", "install ok installed")
+        )
+
+        self.assertIn("telnetd", package_index.refresh())
+
+    def test_index_is_not_pickled(self) -> None:
+        package_index = DpkgStatusIndex(path=self.path)
+        package_index.refresh()
+
+        resumed = pickle.loads(pickle.dumps(package_index))
+
+        self.assertEqual(resumed.path, self.path)
+        self.assertEqual(resumed.racy_window, package_index.racy_window)
+        self.assertIsNone(resumed.signature)
+        self.assertEqual(resumed.refresh(), package_index.installed)
+
+
+class TestProcessTable(unittest.TestCase):
+    """Reads a fake /proc built in a temporary directory."""
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.proc_path = directory.name
+        os.mkdir(os.path.join(self.proc_path, "self"))
+
+    def start(self, pid: int, name: str, start_time: int, cmdline: str = "") -> None:
+        process_path = os.path.join(self.proc_path, str(pid))
+        os.makedirs(process_path, exist_ok=True)
+
+        # The start time is the 22nd field.
+        fields = [pid, "({})".format(name), "S", 1, pid] + [0] * 16 + [start_time]
+
+        with open(os.path.join(process_path, "stat"), "w") as out_file:
+            out_file.write(" ".join(str(field) for field in fields) + "\n")
+
+        with open(os.path.join(process_path, "cmdline"), "w") as out_file:
+            out_file.write(cmdline.replace(" ", "\0"))
+
+    def stop(self, pid: int) -> None:
+        process_path = os.path.join(self.proc_path, str(pid))
+
+        for name in os.listdir(process_path):
+            os.remove(os.path.join(process_path, name))
+
+        os.rmdir(process_path)
+
+    def test_counts_processes_by_name(self) -> None:
+        self.start(pid=1, name="systemd", start_time=10)
+        self.start(pid=20, name="sshd", start_time=30)
+        self.start(pid=21, name="sshd", start_time=31)
+        self.start(pid=22, name="tmux: server (1)", start_time=32)
+
+        counts = ProcessTable(proc_path=self.proc_path).refresh()
+
+        self.assertEqual(counts, {"systemd": 1, "sshd": 2, "tmux: server (1)": 1})
+
+    def test_truncated_names_are_extended(self) -> None:
+        self.start(
+            pid=5,
+            name="unattended-upgr",
+            start_time=10,
+            cmdline="/usr/bin/unattended-upgrade-shutdown --wait-for-signal",
+        )
+        self.start(pid=6, name="kworker/0:1-eve", start_time=11)
+
+        counts = ProcessTable(proc_path=self.proc_path).refresh()
+
+        self.assertEqual(
+            counts, {"unattended-upgrade-shutdown": 1, "kworker/0:1-eve": 1}
+        )
+
+    def test_exited_processes_are_dropped(self) -> None:
+        process_table = ProcessTable(proc_path=self.proc_path)
+        self.start(pid=40, name="nc", start_time=100)
+        process_table.refresh()
+        generation = process_table.generation
+
+        self.stop(pid=40)
+
+        self.assertEqual(process_table.refresh(), {})
+        self.assertGreater(process_table.generation, generation)
+
+    def test_reused_pid_is_a_new_process(self) -> None:
+        process_table = ProcessTable(proc_path=self.proc_path)
+        self.start(pid=40, name="nc", start_time=100)
+        process_table.refresh()
+
+        self.start(pid=40, name="bash", start_time=200)
+
+        self.assertEqual(process_table.refresh(), {"bash": 1})
+
+    def test_unchanged_table_keeps_generation(self) -> None:
+        process_table = ProcessTable(proc_path=self.proc_path)
+        self.start(pid=40, name="nc", start_time=100)
+        process_table.refresh()
+        generation = process_table.generation
+
+        process_table.refresh()
+
+        self.assertEqual(process_table.generation, generation)
+
+    def test_unreadable_processes_are_skipped(self) -> None:
+        self.start(pid=1, name="systemd", start_time=10)
+
+        # A process that exited between listing /proc and reading it, and one
+        # whose entries are replaced by something that can't be read as a file.
+        os.mkdir(os.path.join(self.proc_path, "2"))
+        os.makedirs(os.path.join(self.proc_path, "3", "stat"))
+
+        counts = ProcessTable(proc_path=self.proc_path).refresh()
+
+        self.assertEqual(counts, {"systemd": 1})
+
+    def test_unreadable_command_line_keeps_short_name(self) -> None:
+        self.start(pid=5, name="unattended-upgr", start_time=10)
+        cmdline_path = os.path.join(self.proc_path, "5", "cmdline")
+        os.remove(cmdline_path)
+        os.mkdir(cmdline_path)
+
+        counts = ProcessTable(proc_path=self.proc_path).refresh()
+
+        self.assertEqual(counts, {"unattended-upgr": 1})
+
+
+PASSWD = """root:x:0:0:root:/root:/bin/bash
+# Comment lines and NIS compat entries are skipped.
++::::::
+daemon:x:1:1:daemon:/usr/sbin:/usr/sbin/nologin
+
+alice:x:1000:1000:Alice,,,:/home/alice:/bin/bash
+bob:x:1001:27::/home/bob:/bin/bash
+carol:x:1002:1002::/home/carol:/bin/bash
+mallory:x:notanid:1003::/home/mallory:/bin/bash
+short:x:1004
+"""
+
+GROUP = """root:x:0:
+sudo:x:27:alice, carol
+wheel:x:10:
+adm:x:4:syslog,alice
+alice:x:1000:
+"""
+
+
+class TestAccountDatabase(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.passwd_path = os.path.join(directory.name, "passwd")
+        self.group_path = os.path.join(directory.name, "group")
+        self.write(self.passwd_path, PASSWD)
+        self.write(self.group_path, GROUP)
+
+        self.account_database = AccountDatabase(
+            passwd_path=self.passwd_path, group_path=self.group_path
+        )
+
+    @staticmethod
+    def write(path: str, data: str) -> None:
+        with open(path, "w") as out_file:
+            out_file.write(data)
+
+    def test_users(self) -> None:
+        self.account_database.refresh()
+
+        self.assertEqual(
+            self.account_database.users,
+            {"root": 0, "daemon": 1, "alice": 1000, "bob": 1001, "carol": 1002},
+        )
+
+    def test_groups(self) -> None:
+        self.account_database.refresh()
+
+        self.assertEqual(self.account_database.group_ids["sudo"], 27)
+        self.assertEqual(self.account_database.groups["sudo"], {"alice", "carol"})
+        self.assertEqual(self.account_database.groups["wheel"], frozenset())
+
+    def test_admins_include_primary_group_members(self) -> None:
+        self.account_database.refresh()
+
+        self.assertEqual(self.account_database.admins, {"alice", "bob", "carol"})
+
+    def test_refresh_after_change(self) -> None:
+        self.account_database.refresh()
+
+        self.write(self.group_path, GROUP.replace("alice, carol", "carol"))
+        self.account_database.refresh()
+
+        self.assertEqual(self.account_database.admins, {"bob", "carol"})
+
+    def test_unchanged_databases_are_not_parsed_again(self) -> None:
+        for path in (self.passwd_path, self.group_path):
+            os.utime(path, ns=(10**18, 10**18))
+
+        self.account_database.refresh()
+        self.account_database.users["cached"] = 0
+        self.account_database.refresh()
+
+        self.assertIn("cached", self.account_database.users)
+
+    def test_recent_databases_are_parsed_again(self) -> None:
+        self.account_database.racy_window = 60
+        self.account_database.refresh()
+
+        # A write within the same clock tick, which doesn't change the signature.
+        stat = os.stat(self.group_path)
+        self.write(self.group_path, GROUP.replace("alice, carol", "bobby, carol"))
+        os.utime(self.group_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        self.account_database.refresh()
+
+        self.assertEqual(self.account_database.groups["sudo"], {"bobby", "carol"})
+
+    def test_users_fingerprint(self) -> None:
+        for path in (self.passwd_path, self.group_path):
+            os.utime(path, ns=(10**18, 10**18))
+
+        snapshot = SystemSnapshot()
+        snapshot.collect_users(account_database=self.account_database)
+
+        self.assertIsNotNone(snapshot.fingerprints["users"])
+
+    def test_recent_databases_have_no_users_fingerprint(self) -> None:
+        os.utime(self.group_path, ns=(10**18, 10**18))
+
+        snapshot = SystemSnapshot()
+        snapshot.collect_users(account_database=self.account_database)
+
+        self.assertIsNone(snapshot.fingerprints["users"])
+
+    def test_missing_database_raises(self) -> None:
+        os.remove(self.passwd_path)
+
+        with self.assertRaises(OSError):
+            self.account_database.refresh()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,340 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+import pickle
+import hashlib
+import tempfile
+import unittest
+from unittest import mock
+from utils.scoring_engine.shared import shared_files
+from utils.scoring_engine.shared.shared_files import (
+    Blocklist,
+    HashCache,
+    TreeIndex,
+    compile_patterns,
+    modified_recently,
+)
+
+
+class TestModifiedRecently(unittest.TestCase):
+    def test_modified_recently(self) -> None:
+        now = time.time_ns()
+
+        self.assertTrue(modified_recently(mtime_ns=now, window=2))
+        self.assertTrue(modified_recently(mtime_ns=now + 10**9, window=2))
+        self.assertFalse(modified_recently(mtime_ns=now - 3 * 10**9, window=2))
+
+    def test_no_window(self) -> None:
+        self.assertFalse(modified_recently(mtime_ns=time.time_ns() - 1, window=0))
+
+
+class TestCompilePatterns(unittest.TestCase):
+    def matches(self, patterns: tuple, names: list, extensions: bool = True) -> list:
+        matcher = compile_patterns(patterns=patterns, extensions=extensions)
+        return [name for name in names if matcher.match(name)]
+
+    def test_no_patterns(self) -> None:
+        self.assertIsNone(compile_patterns(patterns=()))
+        self.assertIsNone(compile_patterns(patterns=("", "  ")))
+
+    def test_bare_extensions(self) -> None:
+        names = ["song.mp3", "song.mp3.txt", "mp3", ".mp3", "clip.mp4"]
+
+        self.assertEqual(self.matches(("mp3",), names), ["song.mp3", ".mp3"])
+        self.assertEqual(self.matches((".mp3",), names), ["song.mp3", ".mp3"])
+
+    def test_multi_dot_extensions(self) -> None:
+        names = ["backup.tar.gz", "tar.gz", "notes.gz", "backup.tar.gz.part"]
+
+        self.assertEqual(self.matches(("tar.gz",), names), ["backup.tar.gz", "tar.gz"])
+        self.assertEqual(self.matches((".tar.gz",), names), ["backup.tar.gz"])
+
+    def test_globs_are_not_expanded(self) -> None:
+        names = ["holiday.jpg", "jpg", "holiday.jpeg", "photo_1.png"]
+
+        self.assertEqual(
+            self.matches(("*.JPG", "photo_?.png"), names),
+            ["holiday.jpg", "photo_1.png"],
+        )
+
+    def test_names_without_extensions(self) -> None:
+        names = [".git", "git", "node_modules", "a.git"]
+
+        self.assertEqual(
+            self.matches((".git", "node_modules"), names, extensions=False),
+            [".git", "node_modules"],
+        )
+
+
+class TestTreeIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.root = directory.name
+        self.create("music/song.MP3")
+        self.create("music/cover.png")
+        self.create("music/.cache/song.mp3")
+        self.create("backups/home.tar.gz")
+        self.create("notes.txt")
+
+    def create(self, path: str) -> str:
+        path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, "w"):
+            pass
+
+        return path
+
+    def relative(self, paths: tuple) -> list:
+        return [os.path.relpath(path, self.root) for path in paths]
+
+    def test_walk(self) -> None:
+        tree_index = TreeIndex(root=self.root, patterns=("mp3", "tar.gz"))
+
+        self.assertEqual(
+            self.relative(tree_index.walk()),
+            ["backups/home.tar.gz", "music/.cache/song.mp3", "music/song.MP3"],
+        )
+
+    def test_excluded_directories_are_pruned(self) -> None:
+        tree_index = TreeIndex(root=self.root, patterns=("mp3",), exclude=(".cache",))
+
+        self.assertEqual(self.relative(tree_index.walk()), ["music/song.MP3"])
+        self.assertNotIn(
+            os.path.join(self.root, "music", ".cache"), tree_index.directories
+        )
+
+    def test_symlinked_directories_are_not_followed(self) -> None:
+        os.symlink(os.path.join(self.root, "music"), os.path.join(self.root, "link"))
+        os.symlink(self.root, os.path.join(self.root, "music", "loop"))
+
+        tree_index = TreeIndex(root=self.root, patterns=("png",))
+
+        self.assertEqual(self.relative(tree_index.walk()), ["music/cover.png"])
+
+    def test_missing_root(self) -> None:
+        tree_index = TreeIndex(
+            root=os.path.join(self.root, "missing"), patterns=("mp3",)
+        )
+
+        self.assertIsNone(tree_index.walk())
+
+    def test_unchanged_directories_are_cached(self) -> None:
+        tree_index = TreeIndex(root=self.root, patterns=("png",), racy_window=0)
+        tree_index.walk()
+
+        # A file that appears without changing its directory's modification time
+        # isn't seen, so the cached listing was used.
+        music = os.path.join(self.root, "music")
+        mtime = os.stat(music).st_mtime_ns
+        self.create("music/back.png")
+        os.utime(music, ns=(mtime, mtime))
+
+        self.assertEqual(self.relative(tree_index.walk()), ["music/cover.png"])
+
+        os.utime(music, ns=(mtime + 10**9, mtime + 10**9))
+
+        self.assertEqual(
+            self.relative(tree_index.walk()), ["music/back.png", "music/cover.png"]
+        )
+
+    def test_recent_directories_are_read_again(self) -> None:
+        tree_index = TreeIndex(root=self.root, patterns=("png",), racy_window=60)
+        tree_index.walk()
+
+        music = os.path.join(self.root, "music")
+        mtime = os.stat(music).st_mtime_ns
+        self.create("music/back.png")
+        os.utime(music, ns=(mtime, mtime))
+
+        self.assertEqual(
+            self.relative(tree_index.walk()), ["music/back.png", "music/cover.png"]
+        )
+
+    def test_removed_directories_are_dropped(self) -> None:
+        tree_index = TreeIndex(root=self.root, patterns=("gz",))
+        tree_index.walk()
+
+        os.remove(os.path.join(self.root, "backups", "home.tar.gz"))
+        os.rmdir(os.path.join(self.root, "backups"))
+
+        self.assertEqual(tree_index.walk(), ())
+        self.assertNotIn(os.path.join(self.root, "backups"), tree_index.directories)
+
+
+class TestHashCache(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.path = os.path.join(directory.name, "binary")
+        self.write(b"original")
+
+        self.hash_cache = HashCache(chunk_size=4, racy_window=0)
+
+    def write(self, data: bytes, mtime: int = 10**18) -> None:
+        with open(self.path, "wb") as out_file:
+            out_file.write(data)
+
+        # A fixed modification time, so only the other keys can tell writes apart.
+        os.utime(self.path, ns=(mtime, mtime))
+
+    def digest(self) -> tuple:
+        """The digest of the file and how many times it was read."""
+
+        with mock.patch.object(
+            shared_files, "hash_file", wraps=shared_files.hash_file
+        ) as hash_file:
+            digest = self.hash_cache.digest(path=self.path)
+
+        return digest, hash_file.call_count
+
+    def test_digest(self) -> None:
+        self.assertEqual(
+            self.hash_cache.digest(path=self.path),
+            hashlib.sha256(b"original").hexdigest(),
+        )
+
+    def test_unchanged_file_is_not_read_again(self) -> None:
+        first, _ = self.digest()
+
+        self.assertEqual(self.digest(), (first, 0))
+
+    def test_modified_file_is_read_again(self) -> None:
+        self.digest()
+        self.write(b"original", mtime=2 * 10**18)
+
+        self.assertEqual(self.digest()[1], 1)
+
+    def test_resized_file_is_read_again(self) -> None:
+        self.digest()
+        self.write(b"tampered!")
+
+        self.assertEqual(self.digest(), (hashlib.sha256(b"tampered!").hexdigest(), 1))
+
+    def test_replaced_file_is_read_again(self) -> None:
+        self.digest()
+
+        # Same contents, size and modification time, in a new inode.
+        replacement = self.path + ".new"
+        os.rename(self.path, replacement)
+        with open(replacement, "rb") as in_file, open(self.path, "wb") as out_file:
+            out_file.write(in_file.read())
+        os.utime(self.path, ns=(10**18, 10**18))
+
+        self.assertEqual(self.digest()[1], 1)
+
+    def test_missing_file_is_dropped(self) -> None:
+        self.digest()
+        os.remove(self.path)
+
+        self.assertIsNone(self.hash_cache.digest(path=self.path))
+        self.assertNotIn(self.path, self.hash_cache.digests)
+
+    def test_recent_file_is_not_kept(self) -> None:
+        self.hash_cache.racy_window = 60
+        os.utime(self.path)
+
+        self.digest()
+
+        self.assertEqual(self.digest()[1], 1)
+
+    def test_given_stat_is_used(self) -> None:
+        stat = os.stat(self.path)
+        digest, _ = self.digest()
+
+        with mock.patch.object(shared_files.os, "stat") as os_stat:
+            self.assertEqual(self.hash_cache.digest(path=self.path, stat=stat), digest)
+
+        os_stat.assert_not_called()
+
+    def test_pickled_cache_keeps_digests(self) -> None:
+        digest, _ = self.digest()
+        self.hash_cache = pickle.loads(pickle.dumps(self.hash_cache))
+
+        self.assertEqual(self.digest(), (digest, 0))
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class TestBlocklist(unittest.TestCase):
+    def setUp(self) -> None:
+        self.listed = [sha256(str(number).encode()) for number in range(1000)]
+
+    def test_membership(self) -> None:
+        blocklist = Blocklist(digests=self.listed)
+
+        self.assertEqual(len(blocklist), 1000)
+        self.assertTrue(all(digest in blocklist for digest in self.listed))
+        self.assertFalse(
+            any(sha256(str(-number).encode()) in blocklist for number in range(1, 1000))
+        )
+
+    def test_prefix_collisions_share_an_entry(self) -> None:
+        # Only the first 64 bits are kept.
+        digest = self.listed[0]
+        blocklist = Blocklist(digests=[digest, digest[:16] + "0" * 48])
+
+        self.assertEqual(len(blocklist), 1)
+
+    def test_parse(self) -> None:
+        lines = [
+            "# Known bad files",
+            "",
+            "{} 1024".format(self.listed[0].upper()),
+            "{} 2048 nc.exe".format(self.listed[1]),
+        ]
+
+        blocklist = Blocklist.parse(lines=lines)
+
+        self.assertIn(self.listed[0], blocklist)
+        self.assertIn(self.listed[1], blocklist)
+        self.assertEqual(list(blocklist.sizes), [1024, 2048])
+
+    def test_parse_rejects_bad_digests(self) -> None:
+        with self.assertRaises(ValueError):
+            Blocklist.parse(lines=["not a digest"])
+
+        with self.assertRaises(ValueError):
+            Blocklist.parse(lines=["z" * 64])
+
+    def test_sizes(self) -> None:
+        blocklist = Blocklist(
+            digests=self.listed[:2], sizes=[1024, 2048], max_size=4096
+        )
+
+        self.assertTrue(blocklist.may_match_size(1024))
+        self.assertTrue(blocklist.may_match_size(2048))
+        self.assertFalse(blocklist.may_match_size(1025))
+        self.assertFalse(blocklist.may_match_size(0))
+
+    def test_sizes_are_only_used_if_every_line_has_one(self) -> None:
+        lines = ["{} 1024".format(self.listed[0]), self.listed[1]]
+
+        blocklist = Blocklist.parse(lines=lines, max_size=4096)
+
+        self.assertIsNone(blocklist.sizes)
+        self.assertTrue(blocklist.may_match_size(3000))
+        self.assertFalse(blocklist.may_match_size(4097))
+
+
+if __name__ == "__main__":
+    unittest.main()
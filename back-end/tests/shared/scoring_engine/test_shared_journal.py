@@ -0,0 +1,175 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import pickle
+import tempfile
+import unittest
+from utils.scoring_engine.shared.shared_journal import ScoringJournal
+
+
+class JournaledEngine:
+    """The parts of a scoring engine the journal saves and replays."""
+
+    def __init__(self) -> None:
+        self.item_results = {}
+        self.current_score = 0
+        self.scoring_engine_messages = []
+        self.generator_messages = []
+        self.journal_generation = 0
+        self.tallied = False
+
+    def tally_results(self) -> None:
+        self.tallied = True
+
+    def set_result(self, entry_id: int, points: int) -> None:
+        if points is None:
+            self.item_results.pop(entry_id, None)
+        else:
+            message = "[{:+}] Item {}".format(points, entry_id)
+            self.item_results[entry_id] = [(points, message, points < 0)]
+
+        self.current_score = sum(
+            results[0][0] for results in self.item_results.values()
+        )
+
+
+class TestScoringJournal(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.directory = directory.name
+        self.journal = ScoringJournal(
+            directory=self.directory, compact_interval=3, fsync_interval=1
+        )
+        self.scoring_engine = JournaledEngine()
+
+    def load(self) -> JournaledEngine:
+        return ScoringJournal.load(directory=self.directory)
+
+    def test_first_save_writes_image(self) -> None:
+        self.scoring_engine.set_result(entry_id=1, points=5)
+        self.journal.save(scoring_engine=self.scoring_engine)
+
+        resumed = self.load()
+
+        self.assertEqual(resumed.item_results, {1: [(5, "[+5] Item 1", False)]})
+        self.assertEqual(resumed.current_score, 5)
+        self.assertEqual(resumed.journal_generation, 1)
+
+    def test_later_saves_are_replayed(self) -> None:
+        self.scoring_engine.set_result(entry_id=1, points=5)
+        self.scoring_engine.set_result(entry_id=2, points=-3)
+        self.journal.save(scoring_engine=self.scoring_engine)
+        image_size = os.path.getsize(self.journal.image_path)
+
+        self.scoring_engine.set_result(entry_id=1, points=None)
+        self.scoring_engine.set_result(entry_id=3, points=4)
+        self.scoring_engine.scoring_engine_messages.append("Collector failed.")
+        self.journal.save(scoring_engine=self.scoring_engine)
+
+        resumed = self.load()
+
+        self.assertEqual(os.path.getsize(self.journal.image_path), image_size)
+        self.assertEqual(self.journal.records, 1)
+        self.assertEqual(resumed.item_results, self.scoring_engine.item_results)
+        self.assertEqual(resumed.current_score, 1)
+        self.assertEqual(resumed.scoring_engine_messages, ["Collector failed."])
+        self.assertTrue(resumed.tallied)
+
+    def test_unchanged_results_append_nothing(self) -> None:
+        self.scoring_engine.set_result(entry_id=1, points=5)
+        self.journal.save(scoring_engine=self.scoring_engine)
+        journal_size = os.path.getsize(self.journal.journal_path)
+
+        self.journal.save(scoring_engine=self.scoring_engine)
+
+        self.assertEqual(os.path.getsize(self.journal.journal_path), journal_size)
+        self.assertEqual(self.journal.records, 0)
+
+    def test_compaction_starts_a_new_generation(self) -> None:
+        for points in range(1, 6):
+            self.scoring_engine.set_result(entry_id=1, points=points)
+            self.journal.save(scoring_engine=self.scoring_engine)
+
+        resumed = self.load()
+
+        # One image and three records, then a new image.
+        self.assertEqual(self.scoring_engine.journal_generation, 2)
+        self.assertEqual(self.journal.records, 0)
+        self.assertEqual(resumed.current_score, 5)
+
+    def test_stale_journal_is_not_replayed(self) -> None:
+        self.scoring_engine.set_result(entry_id=1, points=5)
+        self.journal.save(scoring_engine=self.scoring_engine)
+
+        # A journal left behind by an older image.
+        with open(self.journal.journal_path, "wb") as out_file:
+            pickle.dump({"generation": 0}, out_file)
+            pickle.dump({"current_score": 100}, out_file)
+
+        self.assertEqual(self.load().current_score, 5)
+
+    def test_truncated_record_ends_journal(self) -> None:
+        self.scoring_engine.set_result(entry_id=1, points=5)
+        self.journal.save(scoring_engine=self.scoring_engine)
+        self.scoring_engine.set_result(entry_id=1, points=6)
+        self.journal.save(scoring_engine=self.scoring_engine)
+        self.scoring_engine.set_result(entry_id=1, points=7)
+        self.journal.save(scoring_engine=self.scoring_engine)
+
+        with open(self.journal.journal_path, "r+b") as out_file:
+            out_file.truncate(os.path.getsize(self.journal.journal_path) - 1)
+
+        self.assertEqual(self.load().current_score, 6)
+
+    def test_falls_back_to_backup_image(self) -> None:
+        self.scoring_engine.set_result(entry_id=1, points=5)
+        self.journal.compact(scoring_engine=self.scoring_engine)
+        self.scoring_engine.set_result(entry_id=1, points=6)
+        self.journal.compact(scoring_engine=self.scoring_engine)
+
+        with open(self.journal.image_path, "r+b") as out_file:
+            out_file.truncate(len(ScoringJournal.image_header) + 10)
+
+        self.assertEqual(self.load().current_score, 5)
+
+    def test_image_without_header_is_incompatible(self) -> None:
+        # Earlier versions pickled the scoring engine directly.
+        with open(self.journal.image_path, "wb") as out_file:
+            pickle.dump(self.scoring_engine, out_file)
+
+        with self.assertRaisesRegex(ValueError, "Incompatible saved image"):
+            self.load()
+
+    def test_error_from_current_image_is_raised(self) -> None:
+        self.scoring_engine.set_result(entry_id=1, points=5)
+        self.journal.save(scoring_engine=self.scoring_engine)
+
+        with open(self.journal.image_path, "r+b") as out_file:
+            out_file.truncate(len(ScoringJournal.image_header) + 10)
+
+        # Not the FileNotFoundError for the missing backup image.
+        with self.assertRaises((pickle.UnpicklingError, EOFError)):
+            self.load()
+
+    def test_missing_images_raise(self) -> None:
+        with self.assertRaises(FileNotFoundError):
+            self.load()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+import unittest
+from utils.scoring_engine.shared.shared_report import ReportTemplate
+
+TEMPLATE = """<!DOCTYPE html>
+<html>
+<body>
+<div id="score">Score: 0/0</div>
+<p
+  id="timestamp"
+  class="muted">Last scored: never</p>
+<ul id="scoring_messages"><li>Example</li><ul><li>Nested</li></ul></ul>
+<ul id="configuration_messages"></ul>
+<br/>
+<ul id="generator_messages">
+</ul>
+</body>
+</html>
+"""
+
+VALUES = {
+    "score": "S",
+    "timestamp": "T",
+    "scoring_messages": "M",
+    "configuration_messages": "C",
+    "generator_messages": "G",
+}
+
+
+class TestReportTemplate(unittest.TestCase):
+    def test_render_replaces_slot_contents(self) -> None:
+        report = ReportTemplate(source=TEMPLATE).render(values=VALUES)
+
+        self.assertEqual(
+            report,
+            """<!DOCTYPE html>
+<html>
+<body>
+<div id="score">S</div>
+<p
+  id="timestamp"
+  class="muted">T</p>
+<ul id="scoring_messages">M</ul>
+<ul id="configuration_messages">C</ul>
+<br/>
+<ul id="generator_messages">G</ul>
+</body>
+</html>
+""",
+        )
+
+    def test_render_is_repeatable(self) -> None:
+        template = ReportTemplate(source=TEMPLATE)
+        template.render(values=dict(VALUES, score="First"))
+
+        report = template.render(values=VALUES)
+
+        self.assertIn('<div id="score">S</div>', report)
+        self.assertNotIn("First", report)
+
+    def test_missing_slot_raises(self) -> None:
+        source = TEMPLATE.replace('id="timestamp"', 'id="time"')
+
+        with self.assertRaisesRegex(ValueError, "timestamp"):
+            ReportTemplate(source=source)
+
+    def test_render_text_escapes(self) -> None:
+        self.assertEqual(
+            ReportTemplate.render_text("Score: <b>1</b> & 2"),
+            "Score: &lt;b&gt;1&lt;/b&gt; &amp; 2",
+        )
+
+    def test_render_list_marks_negative_messages(self) -> None:
+        html = ReportTemplate.render_list(
+            messages=["[+2] 'a' <b>", "[-3] 'b'"], negative=[False, True]
+        )
+
+        self.assertEqual(
+            html,
+            "<li>[+2] 'a' &lt;b&gt;</li>" "<li style=\"color: red;\">[-3] 'b'</li>",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
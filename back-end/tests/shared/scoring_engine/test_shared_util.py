@@ -0,0 +1,410 @@
+# The Dark Blue CyberPatriot Training Tool
+# Copyright (C) 2021 Scott Semian <darkbluedev@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import time
+import pickle
+import asyncio
+import hashlib
+import tempfile
+import threading
+import unittest
+from functools import partial
+from utils.scoring_engine.shared.shared_files import Blocklist, HashCache
+from utils.scoring_engine.shared.shared_util import (
+    AWARD,
+    REMOVE,
+    BlocklistScan,
+    ScorableItem,
+    ScoringEngine,
+    ScoringCategory,
+    SystemSnapshot,
+    TransitionTable,
+)
+
+
+class UnpublishedEngine(ScoringEngine):
+    """A scoring engine with a single category, that never saves or reports."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.scored = 0
+
+    def scoring_categories(self) -> list:
+        return [ScoringCategory("a", [], self.score_category, 30)]
+
+    def score_category(self, scoring_engine: ScoringEngine, snapshot) -> None:
+        self.scored += 1
+
+    def publish_results(self) -> None:
+        pass
+
+
+class SleepingSnapshot(SystemSnapshot):
+    """A snapshot whose collectors sleep for the given number of seconds."""
+
+    def __init__(self, durations: dict) -> None:
+        super().__init__()
+        self.durations = durations
+        self.collected = set()
+
+    def collectors(self, scoring_engine: ScoringEngine) -> list:
+        return [
+            (name, partial(self.sleep, name=name, duration=duration))
+            for name, duration in self.durations.items()
+        ]
+
+    def sleep(self, name: str, duration: float) -> None:
+        if duration is None:
+            raise RuntimeError("Collector for '{}' failed.".format(name))
+
+        time.sleep(duration)
+        self.collected.add(name)
+
+
+class TestSystemSnapshotCollect(unittest.TestCase):
+    def setUp(self) -> None:
+        self.scoring_engine = ScoringEngine(total_score=100, collector_threads=1)
+        self.scoring_engine.collector_timeout = 0.2
+
+    def test_collects_named_categories(self) -> None:
+        snapshot = SleepingSnapshot(durations={"a": 0, "b": 0, "c": 0})
+        snapshot.collect(scoring_engine=self.scoring_engine, categories={"a", "c"})
+
+        self.assertEqual(snapshot.collected, {"a", "c"})
+        self.assertEqual(snapshot.timed_out, set())
+
+    def test_budget_starts_when_collector_runs(self) -> None:
+        # With a single thread, "fast" waits for "slow" to be abandoned first.
+        snapshot = SleepingSnapshot(durations={"slow": 2, "fast": 0.1})
+        snapshot.collect(scoring_engine=self.scoring_engine)
+
+        self.assertEqual(snapshot.timed_out, {"slow"})
+        self.assertEqual(snapshot.collected, {"fast"})
+        self.assertIn("slow", self.scoring_engine.busy_collectors)
+
+    def test_abandoned_collectors_run_on_daemon_threads(self) -> None:
+        snapshot = SleepingSnapshot(durations={"stuck": 2})
+        snapshot.collect(scoring_engine=self.scoring_engine)
+
+        threads = [
+            thread
+            for thread in threading.enumerate()
+            if thread.name == "collector-stuck"
+        ]
+
+        self.assertGreater(len(threads), 0)
+        self.assertTrue(all(thread.daemon for thread in threads))
+
+    def test_busy_collector_is_not_started_again(self) -> None:
+        self.scoring_engine.busy_collectors.add("a")
+
+        snapshot = SleepingSnapshot(durations={"a": 0, "b": 0})
+        snapshot.collect(scoring_engine=self.scoring_engine)
+
+        self.assertEqual(snapshot.timed_out, {"a"})
+        self.assertEqual(snapshot.collected, {"b"})
+
+    def test_collector_errors_are_raised(self) -> None:
+        snapshot = SleepingSnapshot(durations={"broken": None})
+
+        with self.assertRaisesRegex(RuntimeError, "broken"):
+            snapshot.collect(scoring_engine=self.scoring_engine)
+
+        self.assertEqual(self.scoring_engine.busy_collectors, set())
+
+
+class TestSystemSnapshotCollectAsync(unittest.TestCase):
+    def setUp(self) -> None:
+        self.scoring_engine = ScoringEngine(total_score=100)
+        self.scoring_engine.collector_timeout = 0.2
+
+    def collect(self, snapshot: SystemSnapshot, categories: set = None) -> None:
+        asyncio.run(
+            snapshot.collect_async(
+                scoring_engine=self.scoring_engine, categories=categories
+            )
+        )
+
+    def test_collects_named_categories(self) -> None:
+        snapshot = SleepingSnapshot(durations={"a": 0, "b": 0, "c": 0})
+        self.collect(snapshot, categories={"a", "c"})
+
+        self.assertEqual(snapshot.collected, {"a", "c"})
+        self.assertEqual(snapshot.timed_out, set())
+
+    def test_abandoned_collectors_dont_delay_shutdown(self) -> None:
+        snapshot = SleepingSnapshot(durations={"stuck": 10, "fast": 0})
+
+        started = time.monotonic()
+        self.collect(snapshot)
+
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(snapshot.timed_out, {"stuck"})
+        self.assertEqual(snapshot.collected, {"fast"})
+        self.assertIn("stuck", self.scoring_engine.busy_collectors)
+
+    def test_collector_errors_are_raised(self) -> None:
+        snapshot = SleepingSnapshot(durations={"broken": None})
+
+        with self.assertRaisesRegex(RuntimeError, "broken"):
+            self.collect(snapshot)
+
+        self.assertEqual(self.scoring_engine.busy_collectors, set())
+
+
+class TestCollectorWarnings(unittest.TestCase):
+    def setUp(self) -> None:
+        self.scoring_engine = UnpublishedEngine(total_score=100)
+        self.warning = self.scoring_engine.collector_warning(name="a")
+
+    def test_timed_out_category_keeps_results(self) -> None:
+        snapshot = SystemSnapshot()
+        snapshot.timed_out.add("a")
+
+        self.scoring_engine.score_snapshot(snapshot=snapshot)
+
+        self.assertEqual(self.scoring_engine.scored, 0)
+        self.assertEqual(self.scoring_engine.scoring_engine_messages, [self.warning])
+
+    def test_warning_is_listed_once(self) -> None:
+        snapshot = SystemSnapshot()
+        snapshot.timed_out.add("a")
+
+        self.scoring_engine.score_snapshot(snapshot=snapshot)
+        self.scoring_engine.score_snapshot(snapshot=snapshot)
+
+        self.assertEqual(self.scoring_engine.scoring_engine_messages, [self.warning])
+
+    def test_warning_is_cleared_once_collector_recovers(self) -> None:
+        snapshot = SystemSnapshot()
+        snapshot.timed_out.add("a")
+        self.scoring_engine.register_config_message(message="Saving failed.")
+
+        self.scoring_engine.score_snapshot(snapshot=snapshot)
+        self.scoring_engine.score_snapshot(snapshot=SystemSnapshot())
+
+        self.assertEqual(self.scoring_engine.scored, 1)
+        self.assertEqual(
+            self.scoring_engine.scoring_engine_messages, ["Saving failed."]
+        )
+
+
+class TestBackoff(unittest.TestCase):
+    def setUp(self) -> None:
+        self.scoring_engine = UnpublishedEngine(
+            total_score=100, scoring_interval=30, adaptive=True
+        )
+        self.scoring_engine.reset_backoff()
+
+    def test_unchanged_cycles_within_an_interval_back_off_once(self) -> None:
+        for _ in range(10):
+            self.scoring_engine.back_off()
+
+        self.assertEqual(self.scoring_engine.backoff, 1)
+
+        self.scoring_engine.backoff_since -= 30
+
+        for _ in range(10):
+            self.scoring_engine.back_off()
+
+        self.assertEqual(self.scoring_engine.backoff, 2)
+
+    def test_backoff_is_limited(self) -> None:
+        for _ in range(10):
+            self.scoring_engine.backoff_since -= 30
+            self.scoring_engine.back_off()
+
+        self.assertEqual(self.scoring_engine.backoff, self.scoring_engine.backoff_limit)
+
+    def test_change_resets_backoff(self) -> None:
+        self.scoring_engine.backoff_since -= 30
+        self.scoring_engine.back_off()
+
+        self.scoring_engine.reset_backoff()
+        self.scoring_engine.back_off()
+
+        self.assertEqual(self.scoring_engine.backoff, 1)
+
+    def test_disabled_without_adaptive_mode(self) -> None:
+        self.scoring_engine.adaptive = False
+        self.scoring_engine.backoff_since -= 30
+        self.scoring_engine.back_off()
+
+        self.assertEqual(self.scoring_engine.backoff, 1)
+
+
+class Setting(ScorableItem):
+    __slots__ = ("name", "wanted")
+
+    def __init__(self, name: str, wanted, entry_id: int) -> None:
+        self.name = name
+        self.wanted = wanted
+
+        ScorableItem.__init__(
+            self, entry_id=entry_id, positive_points=2, negative_points=3
+        )
+
+
+class TestScorableItem(unittest.TestCase):
+    def test_pickles_every_slot(self) -> None:
+        item = Setting("a", True, 1)
+        item.scoring_result(positive=True, message="'a' is enabled.")
+
+        resumed = pickle.loads(pickle.dumps(item))
+
+        self.assertEqual(resumed.name, "a")
+        self.assertEqual(resumed.entry_id, 1)
+        self.assertEqual(resumed.positive_result, item.positive_result)
+        self.assertIsNone(resumed.negative_result)
+        self.assertFalse(hasattr(resumed, "__dict__"))
+
+    def test_scoring_result_is_rendered_once(self) -> None:
+        item = Setting("a", True, 1)
+
+        first = item.scoring_result(positive=False, message="'a' is enabled.")
+        second = item.scoring_result(positive=False, message="'a' is enabled.")
+
+        self.assertEqual(first, (-3, "[-3] 'a' is enabled.", True))
+        self.assertIs(first, second)
+
+
+class TestTransitionTable(unittest.TestCase):
+    def setUp(self) -> None:
+        self.scoring_engine = UnpublishedEngine(total_score=100)
+        self.transitions = TransitionTable(
+            attributes=("wanted",),
+            rules={
+                (True, True): (AWARD, "'{item.name}' is enabled."),
+                (True, False): (REMOVE, "'{item.name}' is enabled."),
+            },
+        )
+
+    def score(self, items: list, observed: list) -> dict:
+        self.transitions.score(self.scoring_engine, items=items, observed=observed)
+        return self.scoring_engine.item_results
+
+    def test_award_and_remove(self) -> None:
+        items = [Setting("a", True, 1), Setting("b", False, 2)]
+
+        self.assertEqual(
+            self.score(items=items, observed=[True, True]),
+            {
+                1: [(2, "[+2] 'a' is enabled.", False)],
+                2: [(-3, "[-3] 'b' is enabled.", True)],
+            },
+        )
+
+    def test_states_without_rule_score_nothing(self) -> None:
+        items = [Setting("a", True, 1), Setting("b", False, 2)]
+
+        self.assertEqual(self.score(items=items, observed=[False, False]), {})
+
+    def test_attributes_are_converted(self) -> None:
+        # Any truthy value matches True with the default conversion.
+        items = [Setting("a", "yes", 1), Setting("b", 0, 2)]
+
+        results = self.score(items=items, observed=[True, True])
+
+        self.assertEqual(results[1][0][0], 2)
+        self.assertEqual(results[2][0][0], -3)
+
+    def test_custom_conversion(self) -> None:
+        self.transitions = TransitionTable(
+            attributes=("wanted",),
+            rules={("running", "running"): (AWARD, "'{item.name}' is running.")},
+            convert=lambda value: str(value).lower(),
+        )
+
+        results = self.score(items=[Setting("a", "Running", 1)], observed=["running"])
+
+        self.assertEqual(results, {1: [(2, "[+2] 'a' is running.", False)]})
+
+    def test_own_message_is_preferred(self) -> None:
+        item = Setting("a", True, 1)
+        item.positive_message = "Custom message."
+
+        results = self.score(items=[item], observed=[True])
+
+        self.assertEqual(results, {1: [(2, "[+2] Custom message.", False)]})
+
+
+class TestSavedState(unittest.TestCase):
+    def test_hash_cache_is_not_saved(self) -> None:
+        scoring_engine = UnpublishedEngine(total_score=100)
+        scoring_engine.hash_cache.racy_window = 5
+        scoring_engine.hash_cache.digests["/bin/ls"] = ((1, 2, 3, 4), "00")
+
+        resumed = pickle.loads(pickle.dumps(scoring_engine))
+
+        self.assertEqual(resumed.hash_cache.digests, {})
+        self.assertEqual(resumed.hash_cache.racy_window, 5)
+        self.assertEqual(len(scoring_engine.hash_cache.digests), 1)
+
+
+class TestCollectBlocklistScans(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.root = directory.name
+        self.bad = self.create("bin/nc", b"listen")
+        self.create("bin/ls", b"list")
+        self.create("home/notes", b"listen, not bad")
+
+        blocklist = Blocklist(digests=[hashlib.sha256(b"listen").hexdigest()])
+        self.scan = BlocklistScan("tools", [self.root], blocklist, 1, 5)
+
+    def create(self, path: str, data: bytes) -> str:
+        path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, "wb") as out_file:
+            out_file.write(data)
+
+        return path
+
+    def collect(self, cache: HashCache) -> SystemSnapshot:
+        snapshot = SystemSnapshot()
+        snapshot.collect_blocklist_scans(
+            items=[self.scan], indexes={}, cache=cache, threads=2
+        )
+        return snapshot
+
+    def test_finds_blocklisted_files(self) -> None:
+        snapshot = self.collect(cache=HashCache())
+
+        self.assertEqual(snapshot.blocklist_scans, {1: (self.bad,)})
+
+    def test_files_of_other_sizes_are_not_hashed(self) -> None:
+        self.scan.blocklist = Blocklist(
+            digests=[hashlib.sha256(b"listen").hexdigest()], sizes=[len(b"listen")]
+        )
+        cache = HashCache(racy_window=0)
+
+        self.collect(cache=cache)
+
+        self.assertEqual(list(cache.digests), [self.bad])
+
+    def test_missing_root_is_not_scanned(self) -> None:
+        self.scan.roots = (os.path.join(self.root, "missing"),)
+
+        snapshot = self.collect(cache=HashCache())
+
+        self.assertEqual(snapshot.blocklist_scans, {1: None})
+
+
+if __name__ == "__main__":
+    unittest.main()